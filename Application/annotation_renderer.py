@@ -0,0 +1,155 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Optional
+import cv2
+import numpy as np
+import PIL.Image
+import PIL.ImageDraw
+import PIL.ImageFont
+
+
+class AnnotationRenderer:
+    """
+    Draws bounding boxes and labels directly into NumPy frames. Font is loaded once and rendered labels are cached as
+    sprites, so text rasterization is done only for labels not seen recently. Distances in labels are rounded to
+    buckets, so moving objects reuse sprites instead of rendering a new label on every frame.
+
+        Parameters
+        ----------
+            class_names : mapping between class ids and names
+            font_size : height of label font in pixels
+            line_width : width of bounding box lines in pixels
+            font_path : TrueType font used for labels, cv2 Hershey font is used if it can not be loaded
+            cache_size : maximal number of cached label sprites
+            distance_step : size of distance buckets in meters
+            far_distance : distance in meters from which far_step buckets are used
+            far_step : size of distance buckets of far objects in meters
+
+        Attributes
+        ----------
+            class_names : mapping between class ids and names
+            font_size : height of label font in pixels
+            line_width : width of bounding box lines in pixels
+            font : loaded PIL font, None if Hershey font is used
+            cache_size : maximal number of cached label sprites
+            sprites : least recently used cache (class, distance bucket, colour) -> rendered label
+    """
+    def __init__(self, class_names: dict[int, str], font_size: int = 8, line_width: int = 2,
+                 font_path: str = "arial.ttf", cache_size: int = 256, distance_step: float = 0.5,
+                 far_distance: float = 20.0, far_step: float = 2.0) -> None:
+        self.class_names = class_names
+        self.font_size = max(font_size, 1)
+        self.line_width = max(line_width, 1)
+        self.cache_size = cache_size
+        self.distance_step = distance_step
+        self.far_distance = far_distance
+        self.far_step = far_step
+        self.sprites = OrderedDict()
+
+        try:
+            self.font = PIL.ImageFont.truetype(font_path, self.font_size)
+        except OSError:  # font not installed, e.g. on headless linux servers
+            self.font = None
+
+        self._hershey = cv2.FONT_HERSHEY_SIMPLEX
+        self._hershey_scale = cv2.getFontScaleFromHeight(self._hershey, self.font_size, 1)
+
+    def __render_label(self, text: str, color: tuple[int, int, int]) -> np.ndarray:
+        """
+        Rasterizes black text on a background of given colour
+
+            :param text: label text
+            :param color: background colour, in channel order of annotated frames
+
+            :return: label sprite
+        """
+        if self.font is not None:
+            left, top, right, bottom = self.font.getbbox(text)
+            sprite = PIL.Image.new("RGB", (max(right, 1), max(bottom, 1)), color)
+            PIL.ImageDraw.Draw(sprite).text((0, 0), text, fill=(0, 0, 0), font=self.font)
+            return np.asarray(sprite)
+
+        (text_w, text_h), baseline = cv2.getTextSize(text, self._hershey, self._hershey_scale, 1)
+        sprite = np.empty((text_h + baseline, text_w, 3), np.uint8)
+        sprite[:] = color
+        cv2.putText(sprite, text, (0, text_h), self._hershey, self._hershey_scale, (0, 0, 0), 1, cv2.LINE_AA)
+        return sprite
+
+    def distance_bucket(self, distance: float) -> float:
+        """
+        Rounds distance to the nearest bucket, buckets are coarser for far objects
+
+            :param distance: estimated distance to object in meters
+
+            :return: distance shown in the label
+        """
+        step = self.distance_step if distance < self.far_distance else self.far_step
+        return round(distance / step) * step
+
+    def label(self, class_detected: int, distance: Optional[float], color: tuple[int, int, int]) -> np.ndarray:
+        """
+        Returns label sprite from the cache, rendering it if necessary
+
+            :param class_detected: class id from object detection model
+            :param distance: estimated distance to object, None if not estimated
+            :param color: background colour of the label
+
+            :return: label sprite
+        """
+        bucket = self.distance_bucket(float(distance)) if distance else None
+
+        key = (class_detected, bucket, color)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            if bucket is None:
+                text = self.class_names[class_detected]
+            else:
+                text = f"{self.class_names[class_detected]} at {bucket:.1f} m"
+            sprite = self.sprites[key] = self.__render_label(text, color)
+            if len(self.sprites) > self.cache_size:
+                self.sprites.popitem(last=False)
+        else:
+            self.sprites.move_to_end(key)
+
+        return sprite
+
+    @staticmethod
+    def blit(frame: np.ndarray, sprite: np.ndarray, x: int, y: int) -> None:
+        """
+        Copies sprite into the frame with its top left corner at (x, y), parts outside the frame are clipped
+
+            :param frame: frame modified in place
+            :param sprite: image to be copied
+            :param x: column of the top left corner
+            :param y: row of the top left corner
+        """
+        h, w = frame.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sprite.shape[1], w), min(y + sprite.shape[0], h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        frame[y0:y1, x0:x1] = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
+
+    def draw(self, frame: np.ndarray, boxes: np.ndarray, classes: np.ndarray, distances: np.ndarray,
+             colors: list[tuple[int, int, int]], text: str = "", text_color: tuple[int, int, int] = (0, 0, 255)) -> None:
+        """
+        Annotates frame in place
+
+            :param frame: frame in display resolution
+            :param boxes: bounding boxes in frame coordinates as [ymin, xmin, ymax, xmax]
+            :param classes: classes ids from object detection model
+            :param distances: estimated distances to objects
+            :param colors: colour of every box
+            :param text: text written in top left corner, may contain multiple lines
+            :param text_color: colour of the text
+        """
+        for box, class_detected, distance, color in zip(boxes, classes, distances, colors):
+            ymin, xmin, ymax, xmax = (int(v) for v in box)
+            cv2.rectangle(frame, (xmin, ymin), (xmax, ymax), color, self.line_width)
+            self.blit(frame, self.label(class_detected, distance, color), xmin, ymin)
+
+        line_h = self.font_size + 2
+        for i, line in enumerate(text.split("\n")):
+            if line:
+                cv2.putText(frame, line, (0, (i + 1) * line_h), self._hershey, self._hershey_scale, text_color, 1,
+                            cv2.LINE_AA)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+from collections import deque
+import threading
+import cv2
+import numpy as np
+
+
+class AsyncVideoWriter:
+    """
+    Encodes frames in a background thread. Frames are copied into a pool of reusable arrays, when all of them wait
+    for encoding the caller is blocked until encoder frees one (backpressure), so memory use is bounded.
+
+        Parameters
+        ----------
+            out : opened video writer object
+            resolution : resolution of the encoded video, frames of other size are resized by the encoder thread
+            size : number of frames waiting for encoding
+
+        Attributes
+        ----------
+            out : video writer object used by the encoder thread
+            waits : number of writes blocked because encoder fell behind
+    """
+    def __init__(self, out: cv2.VideoWriter, resolution: tuple[int, int], size: int = 4) -> None:
+        self.out = out
+        self.resolution = resolution
+        self.size = max(size, 1)
+        self.waits = 0
+
+        self._buffers = [None] * self.size  # allocated on first write, reallocated if frame shape changes
+        self._free = list(range(self.size))
+        self._ready = deque()
+        self._error = None
+        self._stopped = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self.__run, daemon=True)
+
+    def start(self) -> AsyncVideoWriter:
+        self._thread.start()
+        return self
+
+    def write(self, frame: np.ndarray) -> None:
+        """
+        Queues frame for encoding, frame can be modified by the caller right after the call
+
+            :param frame: frame to be encoded
+        """
+        with self._condition:
+            if not self._free and self._error is None:
+                self.waits += 1
+                while not self._free and self._error is None:
+                    self._condition.wait()
+            if self._error is not None:
+                raise self._error
+            slot = self._free.pop()
+
+        buffer = self._buffers[slot]
+        if buffer is None or buffer.shape != frame.shape or buffer.dtype != frame.dtype:
+            buffer = self._buffers[slot] = np.empty_like(frame)
+        np.copyto(buffer, frame)
+
+        with self._condition:
+            self._ready.append(slot)
+            self._condition.notify_all()
+
+    def __run(self) -> None:
+        resized = None
+        try:
+            while True:
+                with self._condition:
+                    while not self._ready and not self._stopped:
+                        self._condition.wait()
+                    if not self._ready:  # stopped and everything is encoded
+                        return
+                    slot = self._ready[0]
+
+                frame = self._buffers[slot]
+                if frame.shape[1] != self.resolution[0] or frame.shape[0] != self.resolution[1]:
+                    if resized is None or resized.shape[2:] != frame.shape[2:]:
+                        resized = np.empty((*self.resolution[::-1], *frame.shape[2:]), frame.dtype)
+                    frame = cv2.resize(frame, self.resolution, dst=resized)
+                self.out.write(frame)
+
+                with self._condition:
+                    self._free.append(self._ready.popleft())
+                    self._condition.notify_all()
+        except Exception as e:  # re-raised in the caller thread
+            with self._condition:
+                self._error = e
+                self._condition.notify_all()
+
+    def close(self, raise_error: bool = True) -> None:
+        """
+        Encodes all queued frames, stops the encoder thread and releases the video writer
+
+            :param raise_error: re-raise error of the encoder thread, e.g. False when another exception is handled
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.out.release()
+
+        if raise_error and self._error is not None:
+            raise self._error
+
+
+def open_video_writer(path: str, resolution: tuple[int, int], codec: str = "MJPG", fps: float = 30) -> cv2.VideoWriter:
+    """
+    Opens video writer with codec given by its four character code
+
+        :param path: path of the video file, its extension selects the container
+        :param resolution: resolution of the video
+        :param codec: four character code of the codec, e.g. "MJPG", "mp4v", "avc1", "XVID"
+        :param fps: frame rate of the video
+
+        :return: video writer object
+    """
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, resolution)
+    if not out.isOpened():
+        print(f"Could not open video writer for {path} with codec {codec}")
+    return out
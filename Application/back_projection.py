@@ -0,0 +1,117 @@
+from __future__ import annotations
+import cv2
+import numpy as np
+
+
+class BackProjector:
+    """
+    Converts depth frames to colored points. Ray direction of every pixel is computed once per frame shape, with
+    the flip of y and z axes (camera to open3d view coordinates) folded in, so every frame needs one multiply of
+    the ray grid by depth. Output arrays are preallocated and reused between frames.
+
+    Gives the same points as open3d create_from_rgbd_image with depth_scale=1 followed by the flip transform.
+
+        Parameters
+        ----------
+            params : width, height, focal_h, focal_v, center_x, center_y of the camera
+            max_depth : points farther than max_depth are dropped, as depth_trunc in open3d
+
+        Attributes
+        ----------
+            rays : direction of every pixel ray in row-major order, scaled so z component is -1
+            points : preallocated point coordinates, valid up to number of points of the last frame
+            colors : preallocated point colors in 0-1 range, RGB
+            max_depth : points farther than max_depth are dropped
+    """
+    def __init__(self, params: list[int, int, float, float, float, float], max_depth: float = 1000.0) -> None:
+        self.focal = (float(params[2]), float(params[3]))
+        self.center = (float(params[4]), float(params[5]))
+        self.max_depth = max_depth
+
+        self.shape = None
+        self.rays = None
+        self.points = None
+        self.colors = None
+        self._depth = None
+        self._valid = None
+        self._in_range = None
+        self._rgb = None
+        self._colors = None
+
+    def __prepare(self, shape: tuple[int, int]) -> None:
+        """
+        Computes ray grid and allocates buffers for frames of given shape
+        """
+        height, width = shape
+        u = (np.arange(width, dtype=np.float64) - self.center[0]) / self.focal[0]
+        v = (np.arange(height, dtype=np.float64) - self.center[1]) / self.focal[1]
+
+        rays = np.empty((height, width, 3), np.float64)
+        rays[..., 0] = u[None, :]
+        rays[..., 1] = -v[:, None]  # flipped y
+        rays[..., 2] = -1.0  # flipped z
+        self.rays = rays.reshape(-1, 3)
+
+        n = height * width
+        self.points = np.empty((n, 3), np.float64)
+        self.colors = np.empty((n, 3), np.float64)
+        self._depth = np.empty(n, np.float64)
+        self._valid = np.empty(n, bool)
+        self._in_range = np.empty(n, bool)
+        self._rgb = np.empty((height, width, 3), np.uint8)
+        self._colors = np.empty((n, 3), np.uint8)
+        self.shape = shape
+
+    def project(self, depth: np.ndarray, bgr: np.ndarray, coe: float = 1.0, intercept: float = 0.0,
+                byte_colors: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Back-projects a frame
+
+            :param depth: depth frame, single channel or the first channel is used, e.g. alpha_record frame
+            :param bgr: color frame in BGR order, same resolution as depth
+            :param coe: coefficient converting depth to meters
+            :param intercept: intercept converting depth to meters
+            :param byte_colors: return colors as uint8 instead of 0-1 floats, e.g. for writing to files
+
+            :return[0]: points of pixels with depth in (0, max_depth], view of preallocated array valid until
+                the next call
+            :return[1]: colors of the points, RGB in 0-1 range (0-255 if byte_colors), view of preallocated array
+                valid until the next call
+        """
+        if depth.ndim == 3:
+            depth = depth[..., 0]
+        if depth.shape != self.shape:
+            self.__prepare(depth.shape)
+
+        z = self._depth
+        np.multiply(depth.reshape(-1), coe, out=z, casting="unsafe")
+        z += intercept
+        np.greater(z, 0, out=self._valid)
+        np.less_equal(z, self.max_depth, out=self._in_range)
+        self._valid &= self._in_range
+        n = np.count_nonzero(self._valid)
+
+        # converting channels in place is faster than scaling a channel-reversed view, which is not contiguous
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=self._rgb).reshape(-1, 3)
+        points, colors = self.points[:n], self.colors[:n]
+
+        if n == len(z):  # every pixel is valid, no gathering
+            np.multiply(self.rays, z[:, None], out=points)
+            if byte_colors:
+                return points, rgb
+            np.multiply(rgb, 1 / 255, out=colors)
+            return points, colors
+
+        valid = np.flatnonzero(self._valid)
+        np.take(self.rays, valid, axis=0, out=points)
+        points *= np.take(z, valid)[:, None]
+
+        # pixels are gathered as 3 byte items, much faster than gathering rows of uint8 array
+        pixels = rgb.view(np.dtype((np.void, 3))).reshape(-1)
+        gathered = self._colors[:n]
+        np.take(pixels, valid, out=gathered.view(np.dtype((np.void, 3))).reshape(-1))
+        if byte_colors:
+            return points, gathered
+        np.multiply(gathered, 1 / 255, out=colors)
+
+        return points, colors
@@ -0,0 +1,252 @@
+"""
+Headless batch processing of many videos with a pool of worker processes.
+
+Every worker loads models once and processes videos one by one with SystemHandler.process_video, writing
+the output video and log next to each other in the output directory. Run from the Application directory:
+    python batch_process.py videos/ --config batch_config.json --output-dir output/ --workers 4
+
+Videos are given as a directory (all video files in it) or a manifest - text file with one path per line,
+relative paths are resolved against the manifest directory and lines starting with # are ignored.
+
+Config is a JSON file:
+    {
+        "loader": {...},  # arguments of ModelLoader
+        "stand_ins": false,  # use stand-in models from benchmarks instead of loading models from disk
+        "handler": {...},  # max_cosine_distance, max_age and disnet_engine of SystemHandler
+        "system": {...},  # values overriding SystemHandler.config
+        "use_midas": true, "use_disnet": true, "use_deepsort": true, "od_threshold": 0.6,
+        "disp_res": 800
+    }
+"""
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import pandas as pd
+from log_writer import log_complete
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".mpg", ".mpeg", ".wmv")
+HANDLER_FLAGS = ("use_midas", "use_disnet", "use_deepsort", "od_threshold")
+
+_handler = None  # SystemHandler of the worker process, created once by _init_worker
+_disp_res = None
+
+
+def find_videos(source: str) -> list[str]:
+    """
+    Lists videos to be processed
+
+        :param source: directory with videos or manifest file with one video path per line
+
+        :return: paths to videos
+    """
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name) for name in os.listdir(source)
+                      if name.lower().endswith(VIDEO_EXTENSIONS))
+
+    root = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        lines = [line.strip() for line in f]
+    return [os.path.join(root, line) for line in lines if line and not line.startswith("#")]
+
+
+def output_paths(videos: list[str], out_dir: str) -> list[str]:
+    """
+    Creates output path (without extension) for every video, videos with the same name get numbered suffix
+
+        :param videos: paths to videos
+        :param out_dir: directory for outputs
+
+        :return: output paths passed to SystemHandler.process_video
+    """
+    paths, used = [], set()
+    for video in videos:
+        stem = os.path.splitext(os.path.basename(video))[0]
+        name, i = stem, 1
+        while name in used:
+            name, i = f"{stem}_{i}", i + 1
+        used.add(name)
+        paths.append(os.path.join(out_dir, name))
+    return paths
+
+
+@contextmanager
+def _worker_environment(intra_op: int, inter_op: int) -> Iterator[None]:
+    """
+    Sets thread limits of numerical libraries for spawned workers. Workers import numpy while re-importing this
+    module, before their initializer runs, so BLAS and OpenMP read the limits only from inherited environment.
+    """
+    variables = {"OMP_NUM_THREADS": intra_op, "OPENBLAS_NUM_THREADS": intra_op, "MKL_NUM_THREADS": intra_op,
+                 "TF_NUM_INTRAOP_THREADS": intra_op, "TF_NUM_INTEROP_THREADS": inter_op}
+    previous = {variable: os.environ.get(variable) for variable in variables}
+    os.environ.update({variable: str(value) for variable, value in variables.items()})
+    try:
+        yield
+    finally:
+        for variable, value in previous.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+
+def _limit_threads(intra_op: int, inter_op: int) -> None:
+    """
+    Limits threads used by opencv and tensorflow of the worker, must be called before tensorflow is initialised
+    """
+    import cv2
+    import tensorflow as tf
+
+    cv2.setNumThreads(intra_op)
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+
+
+def create_handler(config: dict):
+    """
+    Loads models and creates handler configured for headless processing
+
+        :param config: batch config, see module docstring
+
+        :return: SystemHandler
+    """
+    from system_handler import SystemHandler  # imports tensorflow
+
+    if config.get("stand_ins", False):
+        from benchmarks.stand_ins import StandInModelLoader
+        loader = StandInModelLoader(**config.get("loader", {}))
+    else:
+        from models.model_loader import ModelLoader
+        loader = ModelLoader(**config["loader"])
+
+    handler = SystemHandler(loader, **config.get("handler", {}))
+    for key, value in config.get("system", {}).items():
+        if key not in handler.config:
+            print(f"Unknown config key {key}, ignoring it")
+            continue
+        handler.config[key] = value
+    handler.config["display_image"] = False  # no display on batch nodes
+
+    for flag in HANDLER_FLAGS:
+        if flag in config:
+            setattr(handler, flag, config[flag])
+
+    return handler
+
+
+def _init_worker(config: dict, intra_op: int, inter_op: int) -> None:
+    global _handler, _disp_res
+
+    _limit_threads(intra_op, inter_op)
+    _handler = create_handler(config)
+    _disp_res = config.get("disp_res", 800)
+
+
+def _process(path: str, out_path: str) -> dict:
+    """
+    Processes one video in a worker process, errors are reported in the result instead of stopping the batch
+    """
+    result = {"video": path, "output": out_path, "frames": 0, "seconds": 0.0, "fps": 0.0, "status": "ok",
+              "error": ""}
+    start = time.perf_counter()
+    try:
+        frames = _handler.process_video(path, out_path, _disp_res)
+        if frames is None:
+            result.update(status="failed", error="could not open video")
+        else:
+            result["frames"] = frames
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    result["seconds"] = time.perf_counter() - start
+    result["fps"] = result["frames"] / max(result["seconds"], 1e-9)
+
+    return result
+
+
+def process_batch(videos: list[str], out_dir: str, config: dict, workers: int = 1,
+                  intra_op: Optional[int] = None, inter_op: int = 1, skip_existing: bool = False) -> pd.DataFrame:
+    """
+    Processes videos with a pool of worker processes, each of them loads models once
+
+        :param videos: paths to videos
+        :param out_dir: directory for output videos and logs
+        :param config: batch config, see module docstring
+        :param workers: number of worker processes
+        :param intra_op: threads used inside one operation by every worker, by default cores are split evenly
+        :param inter_op: operations run in parallel by every worker
+        :param skip_existing: skip videos whose log was already completed, e.g. when resuming interrupted batch
+
+        :return: summary with one row per video
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    columns = ["video", "output", "frames", "seconds", "fps", "status", "error"]
+
+    jobs = [(video, out_path) for video, out_path in zip(videos, output_paths(videos, out_dir))
+            if not (skip_existing and log_complete(out_path))]
+    if not jobs:
+        return pd.DataFrame(columns=columns)
+
+    # threads are split only between workers which get a job
+    workers = max(1, min(workers, len(jobs)))
+    if intra_op is None:
+        intra_op = max(1, (os.cpu_count() or 1) // workers)
+
+    results = []
+    # spawn gives workers a clean interpreter, tensorflow state is not safe to fork
+    context = multiprocessing.get_context("spawn")
+    with _worker_environment(intra_op, inter_op), \
+            ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                initargs=(config, intra_op, inter_op)) as pool:
+        futures = [pool.submit(_process, video, out_path) for video, out_path in jobs]
+        for i, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            print(f"[{i}/{len(futures)}] {result['video']}: {result['status']}, {result['frames']} frames, "
+                  f"{result['fps']:.2f} fps {result['error']}")
+
+    return pd.DataFrame(results, columns=columns).sort_values("video", ignore_index=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Headless batch processing of videos")
+    parser.add_argument("source", help="Directory with videos or manifest file with one video path per line.")
+    parser.add_argument("--config", required=True, help="JSON file with models and system config.")
+    parser.add_argument("--output-dir", default="output", help="Directory for output videos and logs.")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, each loads its own models.")
+    parser.add_argument("--intra-op-threads", type=int, default=None,
+                        help="Threads per operation in every worker, cores split between workers by default.")
+    parser.add_argument("--inter-op-threads", type=int, default=1, help="Parallel operations in every worker.")
+    parser.add_argument("--skip-existing", action="store_true", help="Skip videos with completed output log.")
+    parser.add_argument("--summary", default=None, help="Path of CSV summary, output-dir/summary.csv by default.")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+
+    videos = find_videos(args.source)
+    if not videos:
+        print(f"No videos found in {args.source}")
+        return
+
+    start = time.perf_counter()
+    summary = process_batch(videos, args.output_dir, config, args.workers, args.intra_op_threads,
+                            args.inter_op_threads, args.skip_existing)
+    elapsed = time.perf_counter() - start
+
+    summary_path = args.summary or os.path.join(args.output_dir, "summary.csv")
+    summary.to_csv(summary_path, index=False)
+
+    frames = summary["frames"].sum()
+    failed = (summary["status"] != "ok").sum()
+    print(summary[["video", "frames", "seconds", "fps", "status"]].to_string(index=False))
+    print(f"{len(summary)} videos, {failed} failed, {frames} frames in {elapsed:.1f} s, "
+          f"{frames / max(elapsed, 1e-9):.2f} fps overall, summary saved to {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
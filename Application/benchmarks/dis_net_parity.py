@@ -0,0 +1,72 @@
+"""
+Parity check of DisNet NumPy engine against the keras model, on random boxes of every class with reference size.
+Exits with error when engines differ by more than the tolerance.
+
+Run from the Application directory:
+    python -m benchmarks.dis_net_parity --model models/dis_net/DisNet.keras --samples 1000
+"""
+import argparse
+import sys
+import timeit
+import numpy as np
+from models.dis_net.dis_net import DisNet
+
+
+def _random_inputs(rng: np.random.Generator, classes: list[int], n: int,
+                   resolution: int = 320) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Random boxes in [ymin, xmin, ymax, xmax] format covering sizes seen during inference
+    """
+    top_left = rng.uniform(0, 0.9 * resolution, (n, 2))
+    boxes = np.concatenate([top_left, top_left + rng.uniform(1, resolution, (n, 2))], axis=1)
+    return boxes, rng.choice(classes, n)
+
+
+def run(model, samples: int = 1000, resolution: int = 320, repeats: int = 20, seed: int = 0) -> dict:
+    """
+    Compares distances predicted by keras and NumPy engines for the same inputs
+
+        :param model: loaded keras distance estimation model
+        :param samples: number of random boxes
+        :param resolution: resolution of images in which boxes are given
+        :param repeats: number of timed calls of every engine
+        :param seed: random generator seed
+
+        :return: maximal absolute difference in meters and times in milliseconds per call
+    """
+    keras_net = DisNet(model, "keras", resolution)
+    numpy_net = DisNet(model, "numpy", resolution)
+    boxes, classes = _random_inputs(np.random.default_rng(seed), list(keras_net.class_sizes.keys()), samples,
+                                    resolution)
+
+    keras_distances = keras_net.predict_batch(boxes, classes)
+    numpy_distances = numpy_net.predict_batch(boxes, classes)
+
+    t_keras = timeit.timeit(lambda: keras_net.predict_batch(boxes, classes), number=repeats)
+    t_numpy = timeit.timeit(lambda: numpy_net.predict_batch(boxes, classes), number=repeats)
+
+    return {"samples": samples, "max_error": float(np.abs(keras_distances - numpy_distances).max()),
+            "keras_ms": 1000 * t_keras / repeats, "numpy_ms": 1000 * t_numpy / repeats}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="DisNet keras and NumPy engine parity check")
+    parser.add_argument("--model", default="models/dis_net/DisNet.keras", help="Path to keras distance model.")
+    parser.add_argument("--samples", type=int, default=1000, help="Number of random boxes.")
+    parser.add_argument("--resolution", type=int, default=320, help="Resolution of detector images.")
+    parser.add_argument("--atol", type=float, default=1e-4, help="Maximal allowed difference in meters.")
+    args = parser.parse_args()
+
+    import tensorflow as tf  # only needed for loading the keras model
+    model = tf.keras.models.load_model(args.model)
+
+    result = run(model, args.samples, args.resolution)
+    print(f"{result['samples']} boxes  max error {result['max_error']:.2e} m  keras {result['keras_ms']:8.3f} ms  "
+          f"numpy {result['numpy_ms']:8.3f} ms")
+
+    if result["max_error"] > args.atol:
+        sys.exit(f"NumPy engine differs from keras model by {result['max_error']:.2e} m, tolerance {args.atol}")
+
+
+if __name__ == "__main__":
+    main()
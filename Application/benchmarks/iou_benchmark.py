@@ -0,0 +1,96 @@
+"""
+Micro-benchmark of iou_matching.iou_cost for growing numbers of tracks and detections.
+
+Run from the Application directory:
+    python -m benchmarks.iou_benchmark --sizes 10 50 100 200 400
+"""
+import argparse
+import json
+import timeit
+import numpy as np
+from models.deep_sort import iou_matching
+from models.deep_sort.detection import Detection
+
+
+class _BenchmarkTrack:
+    """
+    Minimal stand-in for deep_sort Track with interface used by iou_cost
+    """
+    def __init__(self, tlwh: np.ndarray, time_since_update: int) -> None:
+        self.tlwh = tlwh
+        self.time_since_update = time_since_update
+
+    def to_tlwh(self) -> np.ndarray:
+        return self.tlwh.copy()
+
+
+def _random_boxes(rng: np.random.Generator, n: int, resolution: int = 320) -> np.ndarray:
+    top_left = rng.uniform(0, resolution, (n, 2))
+    size = rng.uniform(10, resolution / 4, (n, 2))
+    return np.concatenate([top_left, size], axis=1)
+
+
+def _looped_iou_cost(tracks, detections) -> np.ndarray:
+    """
+    Reference row by row implementation, used for checking results and comparing speed
+    """
+    cost_matrix = np.zeros((len(tracks), len(detections)))
+    for row, track in enumerate(tracks):
+        if track.time_since_update > 1:
+            cost_matrix[row, :] = iou_matching.linear_assignment.INFTY_COST
+            continue
+        candidates = np.asarray([d.tlwh for d in detections])
+        cost_matrix[row, :] = 1. - iou_matching.iou(track.to_tlwh(), candidates)
+    return cost_matrix
+
+
+def run(sizes: list[int], repeats: int = 20, seed: int = 0) -> list[dict]:
+    """
+    Measures iou_cost for every combination of number of tracks and detections
+
+        :param sizes: tested numbers of tracks and detections
+        :param repeats: number of timed calls per combination
+        :param seed: random generator seed
+
+        :return: list of results, times in milliseconds per call
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for n_tracks in sizes:
+        for n_detections in sizes:
+            tracks = [_BenchmarkTrack(box, int(rng.integers(1, 3))) for box in _random_boxes(rng, n_tracks)]
+            detections = [Detection(box, 0.9, 1, np.zeros(128)) for box in _random_boxes(rng, n_detections)]
+
+            vectorized = iou_matching.iou_cost(tracks, detections)
+            looped = _looped_iou_cost(tracks, detections)
+            assert np.allclose(vectorized, looped), "vectorized iou_cost differs from reference"
+
+            t_vectorized = timeit.timeit(lambda: iou_matching.iou_cost(tracks, detections), number=repeats)
+            t_looped = timeit.timeit(lambda: _looped_iou_cost(tracks, detections), number=repeats)
+
+            results.append({"tracks": n_tracks, "detections": n_detections,
+                            "vectorized_ms": 1000 * t_vectorized / repeats,
+                            "looped_ms": 1000 * t_looped / repeats})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="iou_cost micro-benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 200, 400],
+                        help="Numbers of tracks and detections to sweep.")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed calls per combination.")
+    parser.add_argument("--output", default=None, help="Optional path of JSON file with results.")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeats)
+    for r in results:
+        print(f"T={r['tracks']:4d} D={r['detections']:4d}  vectorized {r['vectorized_ms']:8.3f} ms  "
+              f"looped {r['looped_ms']:8.3f} ms  speedup {r['looped_ms'] / r['vectorized_ms']:6.1f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
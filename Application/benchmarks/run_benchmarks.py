@@ -0,0 +1,218 @@
+"""
+Reproducible benchmark suite running the system with stand-in models on a synthetic video.
+
+Run from the Application directory:
+    python -m benchmarks.run_benchmarks --output results.json
+
+Results are saved as JSON, so runs from different commits can be diffed.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from typing import Callable
+import numpy as np
+from benchmarks.stand_ins import StandInModelLoader, StandInDetectionModel, create_stand_in_box_encoder
+from benchmarks.synthetic_video import generate_video
+
+
+def _timings(function: Callable, repeats: int) -> dict[str, float]:
+    """
+    Calls function repeatedly and returns statistics of its wall time in milliseconds
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1000
+    return {"mean_ms": float(times.mean()), "p50_ms": float(np.percentile(times, 50)),
+            "p95_ms": float(np.percentile(times, 95)), "repeats": repeats}
+
+
+def _commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def benchmark_end_to_end(video: str, out_dir: str, loader_config: dict, disp_res: int,
+                         system_config: dict) -> dict:
+    """
+    Runs SystemHandler.process_video with stand-in models
+
+        :param video: path to input video
+        :param out_dir: directory for output video and logs
+        :param loader_config: parameters of StandInModelLoader
+        :param disp_res: resolution of output video
+        :param system_config: values overriding SystemHandler.config
+
+        :return: throughput and per-stage latency percentiles
+    """
+    from system_handler import SystemHandler  # imports tensorflow
+
+    system = SystemHandler(StandInModelLoader(**loader_config))
+    system.config.update({"display_image": False, "profile": True})
+    system.config.update(system_config)
+
+    name = "_".join(f"{k}-{v}" for k, v in sorted(system_config.items())) or "default"
+    start = time.perf_counter()
+    system.process_video(video, os.path.join(out_dir, name), disp_res)
+    elapsed = time.perf_counter() - start
+
+    frames = len(system.profiler.timings) - 1  # last read returns no frame
+    return {"frames": frames, "seconds": elapsed, "fps": frames / elapsed,
+            "stages": system.profiler.percentiles()}
+
+
+def benchmark_tracker(loader_config: dict, frames: int) -> dict:
+    """
+    Runs DeepSort on stand-in detections
+    """
+    from models.deep_sort.depsort import DeepSort  # imports tensorflow
+
+    od_resolution = loader_config.get("od_resolution", 320)
+    detector = StandInDetectionModel(0, loader_config.get("n_detections", 10), seed=loader_config.get("seed", 0))
+    tracker = DeepSort(0.5, 5, create_stand_in_box_encoder(0))
+    frame = np.random.default_rng(0).integers(0, 255, (od_resolution, od_resolution, 3), dtype=np.uint8)
+
+    def step():
+        detections = detector(None)
+        boxes = (np.asarray(detections["detection_boxes"][0, :detector.n_detections]) * od_resolution).astype(int)
+        classes = np.asarray(detections["detection_classes"][0, :detector.n_detections])
+        scores = np.asarray(detections["detection_scores"][0, :detector.n_detections])
+        tracker.predict(frame, boxes, classes, scores)
+
+    return _timings(step, frames)
+
+
+def benchmark_regressor(loader_config: dict, frames: int) -> dict:
+    """
+    Runs distance regression on random depth frame and boxes
+    """
+    od_resolution = loader_config.get("od_resolution", 320)
+    n_detections = loader_config.get("n_detections", 10)
+    regressor = StandInModelLoader(**{**loader_config, "n_detections": 0}).distance_regressor
+
+    rng = np.random.default_rng(0)
+    alpha = rng.integers(0, 255, (od_resolution, od_resolution, 3), dtype=np.uint8)
+    top_left = rng.integers(0, od_resolution // 2, (n_detections, 2))
+    boxes = np.concatenate([top_left, top_left + rng.integers(10, od_resolution // 2, (n_detections, 2))], axis=1)
+    distances = np.array(list(rng.uniform(2, 50, n_detections)), dtype=object)
+
+    return _timings(lambda: regressor.predict(alpha, boxes, distances), frames)
+
+
+def benchmark_annotation(loader_config: dict, disp_res: int, frames: int) -> dict:
+    """
+    Runs VideoReader.annonate_image on random frame and boxes
+    """
+    from video_reader import VideoReader
+
+    od_resolution = loader_config.get("od_resolution", 320)
+    n_detections = loader_config.get("n_detections", 10)
+    reader = VideoReader("", od_resolution, disp_res)
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (od_resolution, od_resolution, 3), dtype=np.uint8)
+    top_left = rng.integers(0, od_resolution // 2, (n_detections, 2))
+    boxes = np.concatenate([top_left, top_left + rng.integers(10, od_resolution // 2, (n_detections, 2))], axis=1)
+    classes = rng.choice([1, 2, 3, 4], n_detections)
+    distances = np.array(list(rng.uniform(2, 50, n_detections)), dtype=object)
+    ids = np.arange(n_detections)
+
+    return _timings(lambda: reader.annonate_image(frame, boxes, classes, distances, ids, ""), frames)
+
+
+def benchmark_point_cloud(disp_res: int, frames: int) -> dict:
+    """
+    Builds point cloud from random RGB and depth frames, skipped if open3d is not installed
+    """
+    try:
+        from point_cloud_live import PointCloudLive
+    except ImportError:
+        return {"skipped": "open3d not installed"}
+
+    rng = np.random.default_rng(0)
+    rgb = rng.integers(0, 255, (disp_res, disp_res, 3), dtype=np.uint8)
+    depth = rng.integers(0, 255, (disp_res, disp_res, 3), dtype=np.uint8)
+    params = [disp_res, disp_res, float(disp_res), float(disp_res), disp_res / 2, disp_res / 2]
+
+    point_cloud = PointCloudLive(params, np.array([[0.1]]), np.array([1.0]))
+    point_cloud.set_imgs(rgb, depth)
+    point_cloud._PointCloudBase__read_data()
+    point_cloud.pcd = point_cloud._PointCloudBase__prepare_point_cloud()
+
+    def build():  # displayed point cloud is updated in place, as in update_view_callback
+        point_cloud._PointCloudBase__read_data()
+        point_cloud._PointCloudBase__prepare_point_cloud(point_cloud.pcd)
+
+    return _timings(build, frames)
+
+
+def run(args: argparse.Namespace) -> dict:
+    loader_config = {"od_resolution": args.od_resolution, "detection_latency": args.detection_latency,
+                     "depth_latency": args.depth_latency, "distance_latency": args.distance_latency,
+                     "encoder_latency": args.encoder_latency, "n_detections": args.detections, "seed": args.seed}
+
+    results = {"meta": {"commit": _commit(), "python": platform.python_version(), "platform": platform.platform(),
+                        "arguments": vars(args)},
+               "stages": {}, "end_to_end": {}}
+
+    stage_benchmarks = {
+        "tracker": lambda: benchmark_tracker(loader_config, args.frames),
+        "regressor": lambda: benchmark_regressor(loader_config, args.frames),
+        "annotation": lambda: benchmark_annotation(loader_config, args.disp_res, args.frames),
+        "point_cloud": lambda: benchmark_point_cloud(args.disp_res, args.frames),
+    }
+    for name, benchmark in stage_benchmarks.items():
+        if name in args.skip:
+            continue
+        print(f"Benchmarking {name}")
+        results["stages"][name] = benchmark()
+
+    if "end_to_end" not in args.skip:
+        with tempfile.TemporaryDirectory() as out_dir:
+            video = generate_video(os.path.join(out_dir, "synthetic.avi"), args.frames,
+                                   tuple(args.video_resolution), args.detections, seed=args.seed)
+            for mode, system_config in {"sequential": {"pipelined": False},
+                                        "pipelined": {"pipelined": True},
+                                        "batched": {"batch_size": args.batch_size}}.items():
+                print(f"Benchmarking end to end, {mode}")
+                results["end_to_end"][mode] = benchmark_end_to_end(video, out_dir, loader_config, args.disp_res,
+                                                                   system_config)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks with stand-in models")
+    parser.add_argument("--frames", type=int, default=100, help="Frames of synthetic video and stage repeats.")
+    parser.add_argument("--video-resolution", type=int, nargs=2, default=[1280, 720], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--od-resolution", type=int, default=320)
+    parser.add_argument("--disp-res", type=int, default=800)
+    parser.add_argument("--detections", type=int, default=10, help="Synthetic detections per frame.")
+    parser.add_argument("--detection-latency", type=float, default=0.05, help="Seconds per detector call.")
+    parser.add_argument("--depth-latency", type=float, default=0.1, help="Seconds per MiDaS call.")
+    parser.add_argument("--distance-latency", type=float, default=0.01, help="Seconds per DisNet call.")
+    parser.add_argument("--encoder-latency", type=float, default=0.002, help="Seconds per encoded detection.")
+    parser.add_argument("--batch-size", type=int, default=4, help="Frames per model call in batched mode.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip", nargs="*", default=[],
+                        choices=["tracker", "regressor", "annotation", "point_cloud", "end_to_end"])
+    parser.add_argument("--output", default="benchmark_results.json", help="Path of JSON file with results.")
+    args = parser.parse_args()
+
+    results = run(args)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps({k: v for k, v in results.items() if k != "meta"}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Lightweight stand-ins for the models loaded by ModelLoader. They follow the same call interfaces as the real models,
+return outputs of the same shapes and simulate inference time with a configurable latency, so the whole system can be
+benchmarked without model files and without GPU.
+"""
+from __future__ import annotations
+import time
+import numpy as np
+import cv2
+from models.distance_regressor.distance_regressor import DistanceRegressor
+
+
+class StandInTensor(np.ndarray):
+    """
+    NumPy array with `numpy()` method, mimics eager tensors returned by tensorflow models
+    """
+    def numpy(self) -> np.ndarray:
+        return np.asarray(self)
+
+
+def _as_tensor(array: np.ndarray) -> StandInTensor:
+    return np.asarray(array).view(StandInTensor)
+
+
+def _wait(latency: float) -> None:
+    """
+    Simulates model inference time, busy waits for short latencies to keep timings precise
+    """
+    if latency <= 0:
+        return
+    end = time.perf_counter() + latency
+    if latency > 0.002:
+        time.sleep(latency - 0.001)
+    while time.perf_counter() < end:
+        pass
+
+
+class StandInDetectionModel:
+    """
+    Stand-in for tensorflow Object Detection API saved model, returns objects moving on straight lines
+
+        Parameters
+        ----------
+            latency : simulated inference time in seconds
+            n_detections : number of objects detected in every frame
+            max_detections : size of model output, as in Object Detection API models
+            seed : random generator seed
+
+        Attributes
+        ----------
+            frame : number of processed frames
+    """
+    def __init__(self, latency: float = 0.05, n_detections: int = 10, max_detections: int = 100,
+                 seed: int = 0) -> None:
+        self.latency = latency
+        self.n_detections = min(n_detections, max_detections)
+        self.max_detections = max_detections
+        self.frame = 0
+
+        rng = np.random.default_rng(seed)
+        self._size = rng.uniform(0.08, 0.3, (self.n_detections, 2))
+        self._position = rng.uniform(0, 1 - self._size)
+        self._velocity = rng.uniform(-0.005, 0.005, (self.n_detections, 2))
+        self._classes = rng.choice([1, 2, 3, 4], self.n_detections).astype(np.float32)
+        self._scores = rng.uniform(0.7, 1.0, self.n_detections).astype(np.float32)
+
+    def __call__(self, input_tensor) -> dict[str, StandInTensor]:
+        batch = 1 if input_tensor is None else np.shape(input_tensor)[0]
+        _wait(self.latency)
+
+        # objects bounce off image borders, every image of the batch is the next frame
+        frames = self.frame + np.arange(batch)[:, np.newaxis, np.newaxis]
+        position = self._position + self._velocity * frames
+        span = 1 - self._size
+        position = span - np.abs(np.mod(position, 2 * span) - span)
+        self.frame += batch
+
+        boxes = np.zeros((batch, self.max_detections, 4), np.float32)
+        boxes[:, :self.n_detections, :2] = position
+        boxes[:, :self.n_detections, 2:] = position + self._size
+
+        scores = np.zeros((batch, self.max_detections), np.float32)
+        scores[:, :self.n_detections] = self._scores
+
+        classes = np.ones((batch, self.max_detections), np.float32)
+        classes[:, :self.n_detections] = self._classes
+
+        return {"detection_boxes": _as_tensor(boxes), "detection_scores": _as_tensor(scores),
+                "detection_classes": _as_tensor(classes),
+                "num_detections": _as_tensor(np.full(batch, self.n_detections, np.float32))}
+
+
+class StandInDepthModel:
+    """
+    Stand-in for tensorflow hub MiDaS model, returns inverse relative depth growing towards the bottom of the image
+
+        Parameters
+        ----------
+            latency : simulated inference time in seconds
+            resolution : resolution of model output
+
+        Attributes
+        ----------
+            signatures : model signatures, same as in loaded tensorflow hub model
+    """
+    def __init__(self, latency: float = 0.1, resolution: int = 256) -> None:
+        self.latency = latency
+        self.resolution = resolution
+        self.signatures = {"serving_default": self.__serve}
+
+    def __serve(self, tensor) -> dict[str, StandInTensor]:
+        _wait(self.latency)
+
+        image = np.asarray(tensor)
+        batch = image.shape[0]
+        gradient = np.linspace(100, 1000, self.resolution, dtype=np.float32)[:, np.newaxis]
+        texture = image.mean(axis=1) * 50  # depends on input, so output is not constant
+        depth = gradient + texture.reshape(batch, self.resolution, self.resolution)
+
+        return {"default": _as_tensor(depth.astype(np.float32))}
+
+
+class StandInDistanceModel:
+    """
+    Stand-in for DisNet keras model, distance is proportional to inverse of relative object height
+
+        Parameters
+        ----------
+            latency : simulated inference time in seconds, per model call
+    """
+    def __init__(self, latency: float = 0.01) -> None:
+        self.latency = latency
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        _wait(self.latency)
+        x = np.asarray(x, np.float32)
+        return (x[:, 1:2] * x[:, 3:4] / 100).astype(np.float32)
+
+
+def create_stand_in_box_encoder(latency_per_box: float = 0.002, feature_dim: int = 128):
+    """
+    Creates stand-in for DeepSort appearance encoder, features are computed from downsampled image patches,
+    so the same object gets similar features in consecutive frames
+
+        :param latency_per_box: simulated inference time in seconds per detection
+        :param feature_dim: dimension of features
+
+        :return: encoder with the same interface as generate_detections.create_box_encoder
+    """
+    def encoder(image: np.ndarray, boxes: list) -> np.ndarray:
+        _wait(latency_per_box * len(boxes))
+
+        features = np.zeros((len(boxes), feature_dim), np.float32)
+        for i, (x, y, w, h) in enumerate(np.asarray(boxes, dtype=int).reshape(-1, 4)):
+            patch = image[max(y, 0):max(y + h, 1), max(x, 0):max(x + w, 1)]
+            if patch.size == 0:
+                continue
+            descriptor = cv2.resize(patch, (4, 4), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+            features[i, :min(len(descriptor), feature_dim)] = descriptor[:feature_dim]
+        return features + 1e-3  # avoid zero vectors in cosine distance
+
+    return encoder
+
+
+class StandInModelLoader:
+    """
+    Provides stand-in models with the same attributes as ModelLoader
+
+        Parameters
+        ----------
+            od_resolution : resolution required for object detection model, assumed to be square
+            detection_latency : simulated object detection time in seconds
+            depth_latency : simulated depth estimation time in seconds
+            distance_latency : simulated distance estimation time in seconds, per model call
+            encoder_latency : simulated appearance feature extraction time in seconds, per detection
+            n_detections : number of objects detected in every frame
+            region_extractor_type : type of method for extracting distance info from regions by DistanceRegressor
+            regressor_type : type of method for distance regression by DistanceRegressor
+            seed : random generator seed
+    """
+    def __init__(self, od_resolution: int = 320, detection_latency: float = 0.05, depth_latency: float = 0.1,
+                 distance_latency: float = 0.01, encoder_latency: float = 0.002, n_detections: int = 10,
+                 region_extractor_type: str = "mean", regressor_type: str = "linear", seed: int = 0,
+                 **kwargs) -> None:
+        self.detection_model = StandInDetectionModel(detection_latency, n_detections, seed=seed)
+        self.od_resolution = od_resolution
+        self.distance_model = StandInDistanceModel(distance_latency)
+        self.depth_model = StandInDepthModel(depth_latency)
+        self.regressor_args = (region_extractor_type, regressor_type, kwargs)
+        self.distance_regressor = self.create_distance_regressor()
+        self.box_encoder = create_stand_in_box_encoder(encoder_latency)
+
+    def load_distance_regressor(self, region_extractor_type, regressor_type, **kwargs) -> DistanceRegressor:
+        return DistanceRegressor(region_extractor_type, regressor_type, **kwargs)
+
+    def create_distance_regressor(self) -> DistanceRegressor:
+        region_extractor_type, regressor_type, kwargs = self.regressor_args
+        return self.load_distance_regressor(region_extractor_type, regressor_type, **kwargs)
@@ -0,0 +1,72 @@
+"""
+Generator of synthetic test videos with moving rectangles on a textured background.
+
+Run from the Application directory:
+    python -m benchmarks.synthetic_video output.mp4 --frames 300 --resolution 1280 720
+"""
+import argparse
+import numpy as np
+import cv2
+
+
+def generate_video(path: str, n_frames: int = 300, resolution: tuple[int, int] = (1280, 720), n_objects: int = 10,
+                   fps: int = 30, seed: int = 0) -> str:
+    """
+    Writes synthetic video file
+
+        :param path: path of the video file
+        :param n_frames: number of frames
+        :param resolution: width and height of frames
+        :param n_objects: number of moving rectangles
+        :param fps: frames per second of the video
+        :param seed: random generator seed
+
+        :return: path of the video file
+    """
+    width, height = resolution
+    rng = np.random.default_rng(seed)
+
+    yy, xx = np.mgrid[0:height, 0:width]
+    background = np.stack([xx * 255 // width, yy * 255 // height, (xx + yy) * 127 // (width + height)], axis=2)
+    background = (background + rng.integers(0, 30, background.shape)).astype(np.uint8)
+
+    sizes = rng.integers(20, max(21, min(width, height) // 4), (n_objects, 2))
+    positions = rng.uniform(0, 1, (n_objects, 2)) * (np.array([width, height]) - sizes)
+    velocities = rng.uniform(-4, 4, (n_objects, 2))
+    colors = [tuple(int(c) for c in rng.integers(0, 255, 3)) for _ in range(n_objects)]
+
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    try:
+        for _ in range(n_frames):
+            frame = background.copy()
+            for (x, y), (w, h), color in zip(positions.astype(int), sizes, colors):
+                cv2.rectangle(frame, (x, y), (x + w, y + h), color, -1)
+            out.write(frame)
+
+            positions += velocities
+            # bounce off borders
+            limits = np.array([width, height]) - sizes
+            bounced = (positions < 0) | (positions > limits)
+            velocities[bounced] *= -1
+            positions = np.clip(positions, 0, limits)
+    finally:
+        out.release()
+
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Synthetic video generator")
+    parser.add_argument("path", help="Path of the output video.")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--resolution", type=int, nargs=2, default=[1280, 720], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--objects", type=int, default=10)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_video(args.path, args.frames, tuple(args.resolution), args.objects, args.fps, args.seed)
+
+
+if __name__ == "__main__":
+    main()
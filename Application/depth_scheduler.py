@@ -0,0 +1,183 @@
+from __future__ import annotations
+from typing import Iterable, Optional
+import cv2
+import numpy as np
+
+
+class DepthScheduler:
+    """
+    Decides on which frames depth estimation model is run. Between keyframes the depth map of the last keyframe
+    is reused, optionally shifted by global motion estimated with phase correlation.
+
+        Parameters
+        ----------
+            mode : "always" - every frame is a keyframe,
+                "interval" - every interval-th frame is a keyframe,
+                "adaptive" - keyframe when frame differs from the last keyframe more than threshold,
+                "on_demand" - keyframe when distance regression needs fresh samples - at least min_known objects
+                with reference size are detected (regression can be fitted) and some of them were not present
+                on the last keyframe with enough of such objects, e.g. regression was not fitted yet or new
+                tracks appeared
+            interval : distance between keyframes in "interval" mode
+            threshold : mean absolute difference of grayscale thumbnails (0-255) triggering keyframe in "adaptive" mode
+            max_interval : maximal distance between keyframes in "adaptive" and "on_demand" modes
+            min_known : number of objects with reference size needed for fitting distance regression, used in
+                "on_demand" mode
+            known_classes : classes with reference size defined in DisNet
+            warp : shift reused depth map by global motion between the keyframe and current frame
+            thumbnail : resolution of grayscale thumbnails used for frame difference and motion estimation
+
+        Attributes
+        ----------
+            frames_since_keyframe : number of frames processed since the last keyframe
+            keyframes : number of keyframes since the last reset
+            depth : depth map of the last keyframe, None before the first keyframe
+            sampled : track ids and classes of objects with reference size sampled on the last keyframe with
+                at least min_known of them, None if there was no such keyframe
+    """
+    MODES = ("always", "interval", "adaptive", "on_demand")
+
+    def __init__(self, mode: str = "always", interval: int = 5, threshold: float = 8.0, max_interval: int = 30,
+                 min_known: int = 2, known_classes: Optional[Iterable[int]] = None, warp: bool = False,
+                 thumbnail: int = 128) -> None:
+        if mode not in self.MODES:
+            print(f"Unknown depth scheduling mode {mode}, using always")
+            mode = "always"
+
+        self.mode = mode
+        self.interval = max(interval, 1)
+        self.threshold = threshold
+        self.max_interval = max(max_interval, 1)
+        self.min_known = min_known
+        self.known_classes = np.array(sorted(known_classes or []), dtype=int)
+        self.warp = warp
+        self.thumbnail = (thumbnail, thumbnail)
+
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forgets the last keyframe, next frame is always a keyframe
+        """
+        self.frames_since_keyframe = 0
+        self.keyframes = 0
+        self.depth = None
+        self.sampled = None
+        self._keyframe_thumbnail = None
+
+    def __thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.thumbnail, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def __known_objects(self, classes: Optional[np.ndarray],
+                        ids: Optional[np.ndarray]) -> set[tuple[int, int, int]]:
+        """
+        Returns track id and class of every object with reference size, ids are 0 when objects are not tracked
+        """
+        if classes is None:
+            return set()
+        classes = np.asarray(classes).astype(int).reshape(-1)
+        ids = np.zeros(len(classes), int) if ids is None or len(ids) != len(classes) else np.asarray(ids).astype(int)
+        known = np.isin(classes, self.known_classes)
+        # untracked objects of the same class are told apart by their order
+        return {(track_id, object_class, 0 if track_id else i) for i, (track_id, object_class) in
+                enumerate(zip(ids[known], classes[known]))}
+
+    def is_keyframe(self, frame: np.ndarray, classes: Optional[np.ndarray] = None,
+                    ids: Optional[np.ndarray] = None) -> bool:
+        """
+        Decides if depth has to be estimated for the frame
+
+            :param frame: current frame
+            :param classes: classes of objects detected in the frame, used in "on_demand" mode
+            :param ids: track ids of objects detected in the frame, used in "on_demand" mode
+
+            :return: True if depth estimation model should be run
+        """
+        if self.depth is None or self.mode == "always" or self.depth.shape[:2] != frame.shape[:2]:
+            return True
+
+        if self.mode == "interval":
+            return self.frames_since_keyframe + 1 >= self.interval
+
+        if self.frames_since_keyframe + 1 >= self.max_interval:
+            return True
+
+        if self.mode == "adaptive":
+            score = np.abs(self.__thumbnail(frame) - self._keyframe_thumbnail).mean()
+            return bool(score > self.threshold)
+
+        # on_demand
+        known = self.__known_objects(classes, ids)
+        if len(known) < self.min_known:  # regression can not be fitted, fresh depth would not be used
+            return False
+        return self.sampled is None or not known <= self.sampled
+
+    def plan(self, frames: list[np.ndarray], classes: list[np.ndarray],
+             ids: Optional[list[np.ndarray]] = None) -> list[bool]:
+        """
+        Decides which of consecutive frames will be keyframes, without changing the scheduler state, so depth
+        of all keyframes can be estimated in one batch before the frames are processed one by one
+
+            :param frames: consecutive frames
+            :param classes: classes of objects detected in every frame
+            :param ids: track ids of objects detected in every frame
+
+            :return: True for every frame which will be a keyframe
+        """
+        state = (self.frames_since_keyframe, self.keyframes, self.depth, self.sampled, self._keyframe_thumbnail)
+
+        keyframes = []
+        for frame, frame_classes, frame_ids in zip(frames, classes, ids or [None] * len(frames)):
+            keyframe = self.is_keyframe(frame, frame_classes, frame_ids)
+            if keyframe:
+                # only shape of the depth map is used by is_keyframe
+                self.update(frame, frame[..., 0], frame_classes, frame_ids)
+            else:
+                self.frames_since_keyframe += 1
+            keyframes.append(keyframe)
+
+        self.frames_since_keyframe, self.keyframes, self.depth, self.sampled, self._keyframe_thumbnail = state
+
+        return keyframes
+
+    def update(self, frame: np.ndarray, depth: np.ndarray, classes: Optional[np.ndarray] = None,
+               ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Stores depth map estimated for a keyframe
+
+            :param frame: keyframe
+            :param depth: depth map estimated for the keyframe
+            :param classes: classes of objects detected in the keyframe
+            :param ids: track ids of objects detected in the keyframe
+
+            :return: stored depth map
+        """
+        known = self.__known_objects(classes, ids)
+        if len(known) >= self.min_known:  # regression is fitted on this depth
+            self.sampled = known
+        self.depth = depth
+        self.frames_since_keyframe = 0
+        self.keyframes += 1
+        if self.mode != "always":
+            self._keyframe_thumbnail = self.__thumbnail(frame)
+
+        return depth
+
+    def reuse(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Returns depth map of the last keyframe for a frame without depth estimation
+
+            :param frame: current frame
+
+            :return: depth map of the last keyframe, shifted by global motion if warping is enabled
+        """
+        self.frames_since_keyframe += 1
+        if not self.warp:
+            return self.depth
+
+        (dx, dy), _ = cv2.phaseCorrelate(self._keyframe_thumbnail, self.__thumbnail(frame))
+        height, width = self.depth.shape[:2]
+        shift = np.float32([[1, 0, dx * width / self.thumbnail[0]], [0, 1, dy * height / self.thumbnail[1]]])
+
+        return cv2.warpAffine(self.depth, shift, (width, height), borderMode=cv2.BORDER_REPLICATE)
@@ -0,0 +1,195 @@
+from __future__ import annotations
+import json
+import os
+from typing import Optional
+import numpy as np
+
+FRAME_DTYPE = np.dtype("<f2")
+COEFFICIENTS_DTYPE = np.dtype([("coef", "<f4"), ("intercept", "<f4"), ("metric", "?")])
+UNITS = ("relative", "metric")
+
+
+def store_directory(filename: str) -> str:
+    return f"{filename}_depth"
+
+
+def is_depth_store(filename: str) -> bool:
+    """
+    Checks if depth of a recording was saved by DepthStore
+
+        :param filename: path of the recording without extension, e.g. output video path without extension
+    """
+    return os.path.exists(os.path.join(store_directory(filename), "header.json"))
+
+
+class DepthStore:
+    """
+    Lossless depth recording. Depth of every frame is appended as float16 to one frame-indexed file, regression
+    coefficients of the frame are appended to a second file. Both files have fixed record size, so they can be
+    memory-mapped by DepthStoreReader and frames written before an interruption remain readable.
+
+    Relative depth is stored in the same units as alpha_record frames - inverse relative depth scaled to 0-255,
+    where 255 is the farthest point - so coefficients of the distance regressor convert it to meters.
+
+        Parameters
+        ----------
+            filename : path of the recording without extension, files are saved in filename_depth directory
+            units : "relative" - store relative depth and coefficients, "metric" - store depth converted to meters
+                on frames with fitted regression, other frames are stored as relative
+
+        Attributes
+        ----------
+            directory : directory with the store files
+            shape : height and width of stored frames, set by the first frame
+            frames : number of stored frames
+    """
+    def __init__(self, filename: str, units: str = "relative") -> None:
+        if units not in UNITS:
+            print(f"Unknown depth units {units}, using relative")
+            units = "relative"
+
+        self.directory = store_directory(filename)
+        self.units = units
+        self.shape = None
+        self.frames = 0
+        self._frames_file = None
+        self._coefficients_file = None
+        self._buffer = None
+
+    def open(self) -> DepthStore:
+        os.makedirs(self.directory, exist_ok=True)
+        header = os.path.join(self.directory, "header.json")
+        if os.path.exists(header):  # store of the previous run
+            os.remove(header)
+        self._frames_file = open(os.path.join(self.directory, "frames.f16"), "wb")
+        self._coefficients_file = open(os.path.join(self.directory, "coefficients.bin"), "wb")
+        return self
+
+    def __write_header(self) -> None:
+        with open(os.path.join(self.directory, "header.json"), "w") as f:
+            json.dump({"height": self.shape[0], "width": self.shape[1], "dtype": FRAME_DTYPE.str, "units": self.units,
+                       "frames": self.frames}, f)
+
+    def append(self, depth: np.ndarray, coefs: Optional[tuple] = None) -> None:
+        """
+        Stores depth of the next frame
+
+            :param depth: relative depth of the frame in alpha_record units, single channel
+            :param coefs: coefficients of fitted distance regressor, (coef, intercept), None if not fitted
+        """
+        if self.shape is None:
+            self.shape = depth.shape[:2]
+            self._buffer = np.empty(self.shape, FRAME_DTYPE)
+            self.__write_header()  # frames can be read from now on
+        elif depth.shape[:2] != self.shape:
+            raise ValueError(f"Depth frame of shape {depth.shape[:2]} differs from stored frames {self.shape}")
+
+        record = np.zeros(1, COEFFICIENTS_DTYPE)
+        if coefs is None:
+            record["coef"] = record["intercept"] = np.nan
+        else:
+            record["coef"], record["intercept"] = np.ravel(coefs[0])[0], np.ravel(coefs[1])[0]
+
+        if self.units == "metric" and coefs is not None:
+            np.multiply(depth, record["coef"][0], out=self._buffer, casting="unsafe")
+            self._buffer += record["intercept"][0]
+            record["metric"] = True
+        else:
+            np.copyto(self._buffer, depth, casting="unsafe")
+
+        self._frames_file.write(memoryview(self._buffer))
+        self._coefficients_file.write(record.tobytes())
+        self.frames += 1
+
+    def flush(self) -> None:
+        self._frames_file.flush()
+        self._coefficients_file.flush()
+
+    def close(self) -> None:
+        if self._frames_file is None:
+            return
+        self._frames_file.close()
+        self._coefficients_file.close()
+        self._frames_file = self._coefficients_file = None
+        if self.shape is not None:
+            self.__write_header()
+
+    def __enter__(self) -> DepthStore:
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class DepthStoreReader:
+    """
+    Random access to depth saved by DepthStore, frames are memory-mapped views of the store file
+
+        Parameters
+        ----------
+            filename : path of the recording without extension, e.g. output video path without extension
+
+        Attributes
+        ----------
+            frames : memory-mapped float16 depth, shape (number of frames, height, width)
+            coefficients : regression coefficients of every frame, with "coef", "intercept" and "metric" fields
+            units : units given to DepthStore
+    """
+    def __init__(self, filename: str) -> None:
+        directory = store_directory(filename)
+        with open(os.path.join(directory, "header.json")) as f:
+            header = json.load(f)
+        self.units = header["units"]
+        shape = (header["height"], header["width"])
+        dtype = np.dtype(header["dtype"])
+
+        # frames are counted from file sizes, the header is not updated while recording
+        frames_path = os.path.join(directory, "frames.f16")
+        coefficients_path = os.path.join(directory, "coefficients.bin")
+        n = min(os.path.getsize(frames_path) // (dtype.itemsize * shape[0] * shape[1]),
+                os.path.getsize(coefficients_path) // COEFFICIENTS_DTYPE.itemsize)
+
+        self.frames = np.memmap(frames_path, dtype, "r", shape=(n, *shape)) if n else np.empty((0, *shape), dtype)
+        self.coefficients = np.memmap(coefficients_path, COEFFICIENTS_DTYPE, "r", shape=(n,)) if n else \
+            np.empty(0, COEFFICIENTS_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        """
+        :return: stored depth of the frame, view of the memory-mapped file
+        """
+        return self.frames[index]
+
+    def latest_coefficients(self, index: int) -> Optional[tuple[float, float]]:
+        """
+        Finds coefficients of the last frame with fitted regression, up to the given frame
+
+            :param index: index of the frame
+
+            :return: coefficient and intercept, None if regression was not fitted yet
+        """
+        fitted = np.flatnonzero(~np.isnan(self.coefficients["coef"][:index + 1]))
+        if len(fitted) == 0:
+            return None
+        record = self.coefficients[fitted[-1]]
+        return float(record["coef"]), float(record["intercept"])
+
+    def metric(self, index: int, coefs: Optional[tuple[float, float]] = None) -> Optional[np.ndarray]:
+        """
+        Returns depth of the frame in meters
+
+            :param index: index of the frame
+            :param coefs: coefficient and intercept used for relative frames, by default the latest fitted ones
+
+            :return: float32 metric depth, None if frame is relative and no coefficients are known
+        """
+        depth = self.frames[index]
+        if self.coefficients["metric"][index]:
+            return depth.astype(np.float32)
+
+        coefs = coefs or self.latest_coefficients(index)
+        if coefs is None:
+            return None
+        return depth.astype(np.float32) * coefs[0] + coefs[1]
@@ -0,0 +1,76 @@
+from __future__ import annotations
+import numpy as np
+
+
+class DetectionScheduler:
+    """
+    Decides on which frames object detector is run. On other frames tracked objects are propagated by Kalman filter
+    of the tracker. Detector is run earlier than after interval frames if tracks are uncertain.
+
+        Parameters
+        ----------
+            interval : maximal distance between frames with detection, 1 to detect on every frame
+            adaptive : shorten interval when tracks are tentative or their predicted positions are uncertain
+            max_uncertainty : standard deviation of track center relative to its height triggering detection
+            max_tentative : number of tentative tracks triggering detection, they need consecutive detections
+                to be confirmed
+
+        Attributes
+        ----------
+            frames_since_detection : number of frames processed since the last detection
+            detections : number of frames with detection since the last reset
+    """
+    def __init__(self, interval: int = 1, adaptive: bool = True, max_uncertainty: float = 0.15,
+                 max_tentative: int = 0) -> None:
+        self.interval = max(interval, 1)
+        self.adaptive = adaptive
+        self.max_uncertainty = max_uncertainty
+        self.max_tentative = max_tentative
+
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forgets the last detection, next frame is always detected
+        """
+        self.frames_since_detection = None
+        self.detections = 0
+
+    def is_keyframe(self, tracker) -> bool:
+        """
+        Decides if detector has to be run on the frame
+
+            :param tracker: DeepSORT tracker (deep_sort.tracker.Tracker) updated on previous frames
+
+            :return: True if detector should be run
+        """
+        if self.interval == 1 or self.frames_since_detection is None:
+            return True
+
+        if self.frames_since_detection + 1 >= self.interval:
+            return True
+
+        confirmed = sum(track.is_confirmed() for track in tracker.tracks)
+        if confirmed == 0:  # nothing to propagate
+            return True
+
+        if not self.adaptive:
+            return False
+
+        if len(tracker.tracks) - confirmed > self.max_tentative:
+            return True
+
+        return bool(np.any(tracker.position_uncertainty() > self.max_uncertainty))
+
+    def update(self) -> None:
+        """
+        Registers frame with detection
+        """
+        self.frames_since_detection = 0
+        self.detections += 1
+
+    def skip(self) -> None:
+        """
+        Registers frame without detection
+        """
+        self.frames_since_detection += 1
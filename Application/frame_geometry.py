@@ -0,0 +1,83 @@
+from __future__ import annotations
+from typing import Optional
+import cv2
+import numpy as np
+
+
+class FrameGeometry:
+    """
+    Planner of frame resizing. Knows resolution required by every consumer of the frame and computes each resize
+    only once, directly from the source frame. Consumers requiring the same resolution and interpolation share
+    one array, consumers requiring source resolution get the source frame itself.
+
+        Attributes
+        ----------
+            consumers : consumer name -> (resolution as (width, height), cv2 interpolation flag)
+            planned : names of consumers reading the source frame, others (e.g. display of annotated frame) are only
+                resized on request
+    """
+    def __init__(self) -> None:
+        self.consumers = {}
+        self.planned = set()
+
+    def add_consumer(self, name: str, resolution: tuple[int, int], interpolation: int = cv2.INTER_LINEAR,
+                     from_source: bool = True) -> None:
+        """
+        Registers consumer of the frame
+
+            :param name: name of the consumer, used as a key of planned frames
+            :param resolution: required resolution as (width, height)
+            :param interpolation: cv2 interpolation flag
+            :param from_source: True if consumer reads source frame and should be included in plan
+        """
+        self.consumers[name] = (tuple(resolution), interpolation)
+        if from_source:
+            self.planned.add(name)
+        else:
+            self.planned.discard(name)
+
+    @staticmethod
+    def _matches(frame: np.ndarray, resolution: tuple[int, int]) -> bool:
+        return frame.shape[1] == resolution[0] and frame.shape[0] == resolution[1]
+
+    def plan(self, source: np.ndarray, known: Optional[dict[str, np.ndarray]] = None) -> dict[str, np.ndarray]:
+        """
+        Computes frames for all consumers from the source frame, does not modify planner state, so it can be called
+        from any thread
+
+            :param source: frame as read from the video
+            :param known: frames already resized for some consumers, e.g. by prefetching thread
+
+            :return: consumer name -> frame in resolution required by the consumer
+        """
+        frames = dict(known) if known else {}
+        resized = {(self.consumers[name][0], self.consumers[name][1]): frame for name, frame in frames.items()
+                   if name in self.consumers}
+
+        for name in self.planned:
+            if name in frames:
+                continue
+            resolution, interpolation = self.consumers[name]
+            if self._matches(source, resolution):
+                frames[name] = source
+                continue
+            key = (resolution, interpolation)
+            if key not in resized:
+                resized[key] = cv2.resize(source, resolution, interpolation=interpolation)
+            frames[name] = resized[key]
+
+        return frames
+
+    def resize(self, frame: np.ndarray, name: str) -> np.ndarray:
+        """
+        Resizes frame to resolution of given consumer, frames already in that resolution are returned without copy
+
+            :param frame: frame to be resized
+            :param name: name of the consumer
+
+            :return: frame in resolution required by the consumer
+        """
+        resolution, interpolation = self.consumers[name]
+        if self._matches(frame, resolution):
+            return frame
+        return cv2.resize(frame, resolution, interpolation=interpolation)
@@ -0,0 +1,137 @@
+from __future__ import annotations
+from collections import deque
+import threading
+import time
+import cv2
+import numpy as np
+
+
+class FramePrefetcher:
+    """
+    Decodes and resizes frames in a background thread into a ring buffer of reusable arrays
+
+        Parameters
+        ----------
+            cap : opened video reader object
+            od_resolution : resolution to which frames are resized
+            size : number of slots in the ring buffer
+            drop_oldest : policy when all slots are full, True - overwrite oldest not consumed frame (live sources),
+                False - wait for the consumer (offline files)
+
+        Attributes
+        ----------
+            dropped : number of frames overwritten before being consumed
+    """
+    def __init__(self, cap: cv2.VideoCapture, od_resolution: tuple[int, int], size: int = 4,
+                 drop_oldest: bool = False) -> None:
+        self.cap = cap
+        self.od_resolution = od_resolution
+        self.size = max(size, 2)  # one slot is held by the consumer
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+
+        # slots are allocated on first decode, when frame size is known
+        self._raw = [None] * self.size
+        self._resized = [None] * self.size
+        self._capture_t = [0.0] * self.size
+        self._index = [0] * self.size
+
+        self._free = list(range(self.size))
+        self._ready = deque()
+        self._held = None
+        self._eof = False
+        self._error = None
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self.__run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def __take_slot(self):
+        """
+        Returns slot for next decoded frame, None if prefetcher was stopped
+        """
+        with self._condition:
+            while not self._stopped:
+                if self._free:
+                    return self._free.pop()
+                if self.drop_oldest and self._ready:
+                    self.dropped += 1
+                    return self._ready.popleft()
+                self._condition.wait()
+        return None
+
+    def __run(self) -> None:
+        index = 0
+        try:
+            while True:
+                slot = self.__take_slot()
+                if slot is None:
+                    return
+
+                ret, raw = self.cap.read(self._raw[slot])
+                capture_t = time.time()
+
+                if not ret:
+                    with self._condition:
+                        self._free.append(slot)
+                        self._eof = True
+                        self._condition.notify_all()
+                    return
+
+                self._raw[slot] = raw  # reader may have reallocated the buffer
+                if self._resized[slot] is None:
+                    self._resized[slot] = np.empty((*self.od_resolution[::-1], *raw.shape[2:]), raw.dtype)
+                cv2.resize(raw, self.od_resolution, dst=self._resized[slot])
+                self._capture_t[slot] = capture_t
+                self._index[slot] = index
+                index += 1
+
+                with self._condition:
+                    self._ready.append(slot)
+                    self._condition.notify_all()
+        except Exception as e:  # re-raised in the consumer thread
+            with self._condition:
+                self._error = e
+                self._condition.notify_all()
+
+    def release(self) -> None:
+        """
+        Returns slot of last acquired frame to the ring buffer, its arrays must not be used afterwards
+        """
+        with self._condition:
+            if self._held is not None:
+                self._free.append(self._held)
+                self._held = None
+                self._condition.notify_all()
+
+    def acquire(self) -> tuple[bool, np.ndarray, np.ndarray, float, int]:
+        """
+        Takes next decoded frame, previously acquired frame is released
+
+            :return[0]: True if frame not valid, False if valid
+            :return[1]: frame as read from video file, view of ring buffer slot, None if invalid
+            :return[2]: frame resized to object detection resolution, view of ring buffer slot, empty if invalid
+            :return[3]: time of frame decoding
+            :return[4]: number of the frame in the video
+        """
+        self.release()
+        with self._condition:
+            while not self._ready and not self._eof and self._error is None:
+                self._condition.wait()
+
+            if self._ready:
+                slot = self._held = self._ready.popleft()
+                return False, self._raw[slot], self._resized[slot], self._capture_t[slot], self._index[slot]
+
+            if self._error is not None:
+                raise self._error
+
+            return True, None, np.array([]), time.time(), -1
@@ -0,0 +1,233 @@
+from __future__ import annotations
+import json
+import os
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # logs are written as npz files
+    pa = pq = None
+
+DETECTION_COLUMNS = {
+    "frame": np.int32,  # index of the frame
+    "detection": np.int16,  # index of the object in the frame
+    "track_id": np.int32,  # DeepSort track id, 0 when objects are not tracked
+    "ymin": np.float32, "xmin": np.float32, "ymax": np.float32, "xmax": np.float32,  # box in detector resolution
+    "class": np.int16,
+    "score": np.float32,  # score of the last detection associated with the track
+    "distance": np.float32,  # nan when class has no reference size
+    "focal_vertical": np.float32,
+    "focal_horizontal": np.float32,
+}
+FRAME_COLUMNS = {
+    "frame": np.int32,
+    "detections": np.int16,  # number of objects in the frame
+    "fitted": np.bool_,  # distance regression was fitted
+    "coef": np.float32,  # regression coefficient, nan when not fitted
+    "intercept": np.float32,  # regression intercept, nan when not fitted
+    "comment": str,
+    "depth_keyframe": np.bool_,  # depth was estimated for the frame, False also when depth is not used
+    "detection_keyframe": np.bool_,  # detector was run on the frame
+}
+TABLES = {"detections": DETECTION_COLUMNS, "frames": FRAME_COLUMNS}
+
+
+def _floats(values, n: int) -> np.ndarray:
+    """
+    Converts values which may contain None to float array, None is converted to nan
+    """
+    values = [] if values is None else list(values)
+    if len(values) != n:
+        return np.full(n, np.nan, np.float32)
+    return np.array([np.nan if v is None else v for v in values], np.float32)
+
+
+class LogWriter:
+    """
+    Streaming writer of per-frame logs. Rows are buffered and written in chunks as separate part files of
+    "detections" and "frames" tables, so memory does not grow with video length and a log of interrupted run can be
+    read up to the last written chunk.
+
+        Parameters
+        ----------
+            filename : path of the log without extension, parts are saved in filename_log directory
+            chunk_size : number of frames written in one part file
+            backend : "parquet", "npz" or "auto" - parquet if pyarrow is installed
+
+        Attributes
+        ----------
+            directory : directory with part files
+            frames : number of logged frames
+            parts : number of written part files of every table
+    """
+    def __init__(self, filename: str, chunk_size: int = 256, backend: str = "auto") -> None:
+        if backend == "auto":
+            backend = "npz" if pq is None else "parquet"
+        if backend == "parquet" and pq is None:
+            print("pyarrow is not installed, using npz log backend")
+            backend = "npz"
+        if backend not in ("parquet", "npz"):
+            print(f"Unknown log backend {backend}, using npz")
+            backend = "npz"
+
+        self.backend = backend
+        self.chunk_size = max(chunk_size, 1)
+        self.directory = log_directory(filename)
+        self.frames = 0
+        self.parts = 0
+        self._buffers = {table: {column: [] for column in columns} for table, columns in TABLES.items()}
+        self._buffered = 0
+
+    def open(self) -> LogWriter:
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):  # parts of the previous run
+            if name.startswith(tuple(TABLES)) or name == "meta.json":
+                os.remove(os.path.join(self.directory, name))
+        return self
+
+    def log(self, boxes, classes, scores, distances, focal_v, focal_h, coefs, comment, depth_keyframe=None,
+            detection_keyframe=None, ids=None) -> None:
+        """
+        Buffers log of one frame, buffered frames are written when chunk is full
+
+            :param boxes: boxes of objects, [ymin, xmin, ymax, xmax]
+            :param classes: classes of objects
+            :param scores: probability scores, ignored when their number differs from number of boxes
+            :param distances: distances of objects, None for objects without reference size
+            :param focal_v: vertical focal length estimated from every object
+            :param focal_h: horizontal focal length estimated from every object
+            :param coefs: coefficients of fitted distance regressor, (coef, intercept), None if not fitted
+            :param comment: comment of the frame
+            :param depth_keyframe: depth was estimated for the frame
+            :param detection_keyframe: detector was run on the frame
+            :param ids: track ids of objects
+        """
+        boxes = np.asarray(boxes, np.float32).reshape(-1, 4)
+        n = len(boxes)
+
+        detections = self._buffers["detections"]
+        detections["frame"].append(np.full(n, self.frames))
+        detections["detection"].append(np.arange(n))
+        detections["track_id"].append(np.zeros(n) if ids is None or len(ids) != n else np.asarray(ids))
+        for i, column in enumerate(("ymin", "xmin", "ymax", "xmax")):
+            detections[column].append(boxes[:, i])
+        detections["class"].append(np.asarray(classes).reshape(-1)[:n])
+        detections["score"].append(_floats(scores, n))
+        detections["distance"].append(_floats(distances, n))
+        detections["focal_vertical"].append(_floats(focal_v, n))
+        detections["focal_horizontal"].append(_floats(focal_h, n))
+
+        coef, intercept = (np.nan, np.nan) if coefs is None else (np.ravel(coefs[0])[0], np.ravel(coefs[1])[0])
+        frames = self._buffers["frames"]
+        for column, value in (("frame", self.frames), ("detections", n), ("fitted", coefs is not None),
+                              ("coef", coef), ("intercept", intercept), ("comment", comment),
+                              ("depth_keyframe", bool(depth_keyframe)),
+                              ("detection_keyframe", bool(detection_keyframe))):
+            frames[column].append(np.array([value]))
+
+        self.frames += 1
+        self._buffered += 1
+        if self._buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes buffered frames as new part files
+        """
+        if self._buffered == 0:
+            return
+
+        for table, columns in TABLES.items():
+            buffer = self._buffers[table]
+            data = {column: np.concatenate(buffer[column]).astype(dtype) for column, dtype in columns.items()}
+            self.__write_part(table, data)
+            for values in buffer.values():
+                values.clear()
+
+        self.parts += 1
+        self._buffered = 0
+
+    def __write_part(self, table: str, data: dict[str, np.ndarray]) -> None:
+        path = os.path.join(self.directory, f"{table}_{self.parts:05d}.{self.backend}")
+        temporary = f"{path}.tmp"  # part appears only when it is complete
+
+        if self.backend == "parquet":
+            pq.write_table(pa.table(data), temporary)
+        else:
+            with open(temporary, "wb") as f:
+                np.savez(f, **data)
+        os.replace(temporary, path)
+
+    def close(self, complete: bool = True) -> None:
+        """
+        Writes remaining frames and marks log as complete
+
+            :param complete: the run finished, False when processing failed and the log stays incomplete
+        """
+        self.flush()
+        if not complete:
+            return
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump({"frames": self.frames, "parts": self.parts, "backend": self.backend, "complete": True}, f)
+
+    def __enter__(self) -> LogWriter:
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close(complete=exc_type is None)
+
+
+def log_directory(filename: str) -> str:
+    return f"{filename}_log"
+
+
+def log_complete(filename: str) -> bool:
+    """
+    Checks if log was closed, logs of interrupted runs are readable but incomplete
+
+        :param filename: path of the log without extension, e.g. output video path without extension
+    """
+    return os.path.exists(os.path.join(log_directory(filename), "meta.json"))
+
+
+def frame_coefficients(frames: pd.DataFrame) -> np.ndarray:
+    """
+    Distance regression coefficients for every frame of a log, frames without fit use the latest fitted ones and
+    frames before the first fit use the first fitted ones
+
+        :param frames: "frames" table of a log
+
+        :return: array with coefficient and intercept of every frame, nan if regression was never fitted
+    """
+    return frames[["coef", "intercept"]].ffill().bfill().to_numpy(np.float32)
+
+
+def load_log(filename: str, table: str = "frames") -> pd.DataFrame:
+    """
+    Reads log written by LogWriter, all written parts are read also when the log is incomplete
+
+        :param filename: path of the log without extension, e.g. output video path without extension
+        :param table: "frames" - one row per frame, or "detections" - one row per detected object
+
+        :return: table with typed columns, see FRAME_COLUMNS and DETECTION_COLUMNS
+    """
+    directory = log_directory(filename)
+    parts = sorted(name for name in os.listdir(directory)
+                   if name.startswith(f"{table}_") and name.endswith((".parquet", ".npz")))
+
+    frames = []
+    for name in parts:
+        path = os.path.join(directory, name)
+        if name.endswith(".parquet"):
+            if pq is None:
+                raise ImportError(f"pyarrow is required to read {path}")
+            frames.append(pq.read_table(path).to_pandas())
+        else:
+            with np.load(path, allow_pickle=False) as data:
+                frames.append(pd.DataFrame({column: data[column] for column in data.files}))
+
+    if not frames:
+        return pd.DataFrame({column: np.empty(0, dtype) for column, dtype in TABLES[table].items()})
+    return pd.concat(frames, ignore_index=True)
@@ -1,7 +1,8 @@
 from . import nn_matching
 from .tracker import Tracker
-from .detection import Detection
+from .detection import Detection, FeatureBank
 from . import generate_detections as gdet
+from typing import Callable, Optional
 import numpy as np
 
 
@@ -14,19 +15,22 @@ class DeepSort:
         ----------
             max_cosine_distance : maximal cosine distance for object association
             max_age : number of frames after track will be deleted
+            encoder : function extracting appearance features of detections, loaded from disk if None
 
         Attributes
         ----------
             encoder : used for extracting features for tracking algo
             tracker : tracking algo
     """
-    def __init__(self, max_cosine_distance: float, max_age: int) -> None:
+    def __init__(self, max_cosine_distance: float, max_age: int, encoder: Optional[Callable] = None) -> None:
         max_cosine_distance = max_cosine_distance
-        nn_budget = None
+        nn_budget = 100  # samples kept per track, bounds gallery memory on long videos
 
         # initialize deep sort object
-        model_filename = r'models/deep_sort/model_data/mars-small128.pb'
-        self.encoder = gdet.create_box_encoder(model_filename, batch_size=1)
+        if encoder is None:
+            model_filename = r'models/deep_sort/model_data/mars-small128.pb'
+            encoder = gdet.create_box_encoder(model_filename, batch_size=None)
+        self.encoder = encoder
 
         metric = nn_matching.NearestNeighborDistanceMetric("cosine", max_cosine_distance, nn_budget)
         self.tracker = Tracker(metric, max_age=max_age)
@@ -40,31 +44,34 @@ class DeepSort:
             :param boxes: list of detected objects bounding boxes
             :param scores: list of detected objects probability scores
 
-            :return: list of features for tracker
+            :return: list of detections for tracker, with lazily extracted features
         """
         boxes = np.array(boxes)
         # TODO -check if width and height are correctly placed 
         boxes = [[box[0], box[1], abs(box[2] - box[0]), abs(box[3] - box[1])] for box in boxes]
         names = np.array(classes)
         scores = np.array(scores) + 0.2
-        features = np.array(self.encoder(frame, boxes))
-        detections = [Detection(bbox, score, class_name, feature) for bbox, score, class_name, feature in
-                      zip(boxes, scores, names, features)]
+        # appearance features are extracted by the tracker only when needed
+        bank = FeatureBank(self.encoder, frame, boxes)
+        detections = [Detection(bbox, score, class_name, bank=bank, index=i) for i, (bbox, score, class_name) in
+                      enumerate(zip(boxes, scores, names))]
 
         return detections
 
-    def __postprocess(self) -> tuple[np.array, np.array, np.array]:
+    def __postprocess(self) -> tuple[np.array, np.array, np.array, np.array]:
         """
         Method for getting current tracked objects info
 
             :return[0]: tracked objects ids
             :return[1]: tracked objects bounding boxes
             :return[2]: tracked objects classes
+            :return[3]: tracked objects probability scores of last associated detections
         """
 
         tracked_bboxes = []
         tracked_ids = []
         tracked_classes = []
+        tracked_scores = []
         for track in self.tracker.tracks:
             if not track.is_confirmed() or track.time_since_update > 1:
                 continue
@@ -74,11 +81,12 @@ class DeepSort:
             tracked_bboxes.append(bbox.tolist())  # Structure data, that we could use it with our draw_bbox function
             tracked_ids.append(tracking_id)
             tracked_classes.append(class_name)
+            tracked_scores.append(track.confidence - 0.2)  # offset added in preprocessing
 
-        return np.array(tracked_ids), np.array(tracked_bboxes), np.array(tracked_classes)
+        return np.array(tracked_ids), np.array(tracked_bboxes), np.array(tracked_classes), np.array(tracked_scores)
 
     def predict(self, frame: np.ndarray, boxes: np.ndarray, classes: np.ndarray, scores: np.ndarray)\
-            -> tuple[np.array, np.array, np.array]:
+            -> tuple[np.array, np.array, np.array, np.array]:
         """
         Method for updating tracker and getting tracked objects info
 
@@ -90,11 +98,26 @@ class DeepSort:
             :return[0]: tracked objects ids
             :return[1]: tracked objects bounding boxes
             :return[2]: tracked objects classes
+            :return[3]: tracked objects probability scores of last associated detections
         """
         detections = self.__preprocess(frame, boxes, classes, scores)
         self.tracker.predict()
         self.tracker.update(detections)
+        if detections:  # frame buffer may be reused by the reader, tentative tracks may still need it
+            detections[0].bank.detach()
 
-        ids, boxes, classes = self.__postprocess()
+        return self.__postprocess()
 
-        return ids, boxes, classes
\ No newline at end of file
+    def coast(self) -> tuple[np.array, np.array, np.array, np.array]:
+        """
+        Method for propagating tracked objects to the next frame without detections, e.g. when detector is run only
+        on some frames
+
+            :return[0]: tracked objects ids
+            :return[1]: tracked objects predicted bounding boxes
+            :return[2]: tracked objects classes
+            :return[3]: tracked objects probability scores of last associated detections
+        """
+        self.tracker.predict(coast=True)
+
+        return self.__postprocess()
\ No newline at end of file
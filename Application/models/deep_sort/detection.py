@@ -12,8 +12,13 @@ class Detection(object):
         Bounding box in format `(x, y, w, h)`.
     confidence : float
         Detector confidence score.
-    feature : array_like
+    feature : Optional[array_like]
         A feature vector that describes the object contained in this image.
+        If None, the feature is computed on first access by `bank`.
+    bank : Optional[FeatureBank]
+        Lazy feature extractor of all detections in the image.
+    index : Optional[int]
+        Index of this detection in `bank`.
 
     Attributes
     ----------
@@ -25,14 +30,34 @@ class Detection(object):
         Detector class.
     feature : ndarray | NoneType
         A feature vector that describes the object contained in this image.
+        Accessing it computes the feature if it was not extracted yet.
 
     """
 
-    def __init__(self, tlwh, confidence, class_name, feature):
+    def __init__(self, tlwh, confidence, class_name, feature=None, bank=None,
+                 index=None):
         self.tlwh = np.asarray(tlwh, dtype=np.float)
         self.confidence = float(confidence)
         self.class_name = class_name
-        self.feature = np.asarray(feature, dtype=np.float32)
+        self.bank = bank
+        self.index = index
+        self._feature = None
+        if feature is not None:
+            self.feature = feature
+
+    @property
+    def feature(self):
+        if self._feature is None and self.bank is not None:
+            self._feature = self.bank.request([self.index])[0]
+        return self._feature
+
+    @feature.setter
+    def feature(self, value):
+        self._feature = np.asarray(value, dtype=np.float32)
+
+    def has_feature(self):
+        """Check if the feature vector is available without extracting it."""
+        return self._feature is not None or self.bank is None
 
     def get_class(self):
         return self.class_name
@@ -53,3 +78,96 @@ class Detection(object):
         ret[:2] += ret[2:] / 2
         ret[2] /= ret[3]
         return ret
+
+
+class FeatureBank(object):
+    """
+    Lazy appearance feature extractor for all detections in one image.
+    Features are extracted in one batch per request and only once per
+    detection.
+
+    Parameters
+    ----------
+    encoder : Callable[ndarray, List[array_like]] -> ndarray
+        Box encoder, see `generate_detections.create_box_encoder`.
+    image : ndarray
+        The image the detections were found in.
+    boxes : array_like
+        Bounding boxes of all detections, in the format expected by `encoder`.
+
+    Attributes
+    ----------
+    features : List[ndarray | NoneType]
+        Extracted feature of every detection, None if not extracted yet.
+    requests : int
+        Number of encoder calls.
+
+    """
+
+    def __init__(self, encoder, image, boxes):
+        self.encoder = encoder
+        self.image = image
+        self.boxes = boxes
+        self.features = [None] * len(boxes)
+        self.requests = 0
+
+    def request(self, indices):
+        """Get features of detections, extracting missing ones in one batch.
+
+        Parameters
+        ----------
+        indices : List[int]
+            Indices of detections.
+
+        Returns
+        -------
+        List[ndarray]
+            Feature of every requested detection.
+
+        """
+        missing = sorted(set(i for i in indices if self.features[i] is None))
+        if len(missing) > 0:
+            features = self.encoder(
+                self.image, [self.boxes[i] for i in missing])
+            self.requests += 1
+            for i, feature in zip(missing, features):
+                self.features[i] = np.asarray(feature, dtype=np.float32)
+        return [self.features[i] for i in indices]
+
+    def detach(self):
+        """Release the image, or keep a private copy of it if some features
+        were not extracted yet. Called when the image buffer may be reused,
+        e.g. by a frame reader.
+        """
+        if all(feature is not None for feature in self.features):
+            self.image = None
+        elif self.image is not None:
+            self.image = self.image.copy()
+
+
+def gather_features(items):
+    """Stack features, extracting the missing ones in one batch per image.
+
+    Parameters
+    ----------
+    items : List[ndarray | Detection]
+        Feature vectors, or detections whose features are extracted lazily.
+
+    Returns
+    -------
+    ndarray
+        Returns a matrix with one feature per row, in order of `items`.
+
+    """
+    pending = {}
+    for item in items:
+        if isinstance(item, Detection) and not item.has_feature():
+            pending.setdefault(id(item.bank), (item.bank, []))[1].append(item)
+    for bank, detections in pending.values():
+        features = bank.request([d.index for d in detections])
+        for detection, feature in zip(detections, features):
+            detection.feature = feature
+
+    return np.asarray([
+        item.feature if isinstance(item, Detection) else item
+        for item in items])
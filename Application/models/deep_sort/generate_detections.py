@@ -100,19 +100,59 @@ class ImageEncoder(object):
         return out
 
 
-def create_box_encoder(model_filename, input_name="images:0", output_name="features:0", batch_size=32):
+def _auto_batch_size(n_boxes, max_batch_size):
+    """Choose batch size for given number of detections, so that all patches
+    are encoded in as few session calls as possible with batches of similar
+    size (e.g. 40 detections and max 32 gives 2 batches of 20, not 32 + 8).
+    """
+    if n_boxes == 0:
+        return 1
+    num_batches = int(np.ceil(n_boxes / float(max_batch_size)))
+    return int(np.ceil(n_boxes / float(num_batches)))
+
+
+def create_box_encoder(model_filename, input_name="images:0", output_name="features:0", batch_size=32,
+                       max_batch_size=64):
+    """Create encoder function computing appearance features of detections.
+
+    Parameters
+    ----------
+    model_filename : str
+        Path to freezed inference graph protobuf.
+    batch_size : Optional[int]
+        Number of patches encoded by one session call. If None, batch size is
+        chosen for every frame from the number of detections.
+    max_batch_size : int
+        Upper limit for automatically chosen batch size.
+
+    Returns
+    -------
+    Callable[ndarray, ndarray] -> ndarray
+        The encoder function takes as input a BGR color image and a matrix of
+        bounding boxes in format `(x, y, w, h)` and returns a matrix of
+        corresponding feature vectors.
+
+    """
     image_encoder = ImageEncoder(model_filename, input_name, output_name)
     image_shape = image_encoder.image_shape
 
+    # patches are gathered into preallocated buffer, which is grown when needed
+    buffer = {"patches": np.zeros((0, *image_shape), np.uint8)}
+
     def encoder(image, boxes):
-        image_patches = []
-        for box in boxes:
+        if len(buffer["patches"]) < len(boxes):
+            buffer["patches"] = np.zeros((max(len(boxes), 2 * len(buffer["patches"])), *image_shape), np.uint8)
+        image_patches = buffer["patches"][:len(boxes)]
+
+        for i, box in enumerate(boxes):
             patch = extract_image_patch(image, box, image_shape[:2])
             if patch is None:
                 print("WARNING: Failed to extract image patch: %s." % str(box))
                 patch = np.random.uniform(0., 255., image_shape).astype(np.uint8)
-            image_patches.append(patch)
-        image_patches = np.asarray(image_patches)
+            image_patches[i] = patch
+
+        if batch_size is None:
+            return image_encoder(image_patches, _auto_batch_size(len(boxes), max_batch_size))
         return image_encoder(image_patches, batch_size)
 
     return encoder
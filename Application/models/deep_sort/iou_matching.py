@@ -10,7 +10,8 @@ def iou(bbox, candidates):
     Parameters
     ----------
     bbox : ndarray
-        A bounding box in format `(top left x, top left y, width, height)`.
+        A bounding box in format `(top left x, top left y, width, height)`, or
+        a matrix of T such bounding boxes (one per row).
     candidates : ndarray
         A matrix of candidate bounding boxes (one per row) in the same format
         as `bbox`.
@@ -20,23 +21,30 @@ def iou(bbox, candidates):
     ndarray
         The intersection over union in [0, 1] between the `bbox` and each
         candidate. A higher score means a larger fraction of the `bbox` is
-        occluded by the candidate.
+        occluded by the candidate. If `bbox` is a matrix, returns TxD matrix
+        with one row per bounding box.
 
     """
-    bbox_tl, bbox_br = bbox[:2], bbox[:2] + bbox[2:]
+    bbox = np.asarray(bbox, dtype=np.float64)
+    candidates = np.asarray(candidates, dtype=np.float64).reshape(-1, 4)
+    bboxes = np.atleast_2d(bbox)
+
+    bbox_tl, bbox_br = bboxes[:, :2], bboxes[:, :2] + bboxes[:, 2:]
     candidates_tl = candidates[:, :2]
     candidates_br = candidates[:, :2] + candidates[:, 2:]
 
-    tl = np.c_[np.maximum(bbox_tl[0], candidates_tl[:, 0])[:, np.newaxis],
-               np.maximum(bbox_tl[1], candidates_tl[:, 1])[:, np.newaxis]]
-    br = np.c_[np.minimum(bbox_br[0], candidates_br[:, 0])[:, np.newaxis],
-               np.minimum(bbox_br[1], candidates_br[:, 1])[:, np.newaxis]]
-    wh = np.maximum(0., br - tl)
+    # intersection width and height as TxD matrices
+    w = np.minimum(bbox_br[:, 0, np.newaxis], candidates_br[np.newaxis, :, 0])
+    w -= np.maximum(bbox_tl[:, 0, np.newaxis], candidates_tl[np.newaxis, :, 0])
+    h = np.minimum(bbox_br[:, 1, np.newaxis], candidates_br[np.newaxis, :, 1])
+    h -= np.maximum(bbox_tl[:, 1, np.newaxis], candidates_tl[np.newaxis, :, 1])
+
+    area_intersection = np.maximum(0., w, out=w) * np.maximum(0., h, out=h)
+    area_bbox = bboxes[:, 2:].prod(axis=1)[:, np.newaxis]
+    area_candidates = candidates[:, 2:].prod(axis=1)[np.newaxis, :]
+    result = area_intersection / (area_bbox + area_candidates - area_intersection)
 
-    area_intersection = wh.prod(axis=1)
-    area_bbox = bbox[2:].prod()
-    area_candidates = candidates[:, 2:].prod(axis=1)
-    return area_intersection / (area_bbox + area_candidates - area_intersection)
+    return result[0] if bbox.ndim == 1 else result
 
 
 def iou_cost(tracks, detections, track_indices=None,
@@ -69,13 +77,14 @@ def iou_cost(tracks, detections, track_indices=None,
     if detection_indices is None:
         detection_indices = np.arange(len(detections))
 
-    cost_matrix = np.zeros((len(track_indices), len(detection_indices)))
-    for row, track_idx in enumerate(track_indices):
-        if tracks[track_idx].time_since_update > 1:
-            cost_matrix[row, :] = linear_assignment.INFTY_COST
-            continue
+    if len(track_indices) == 0 or len(detection_indices) == 0:
+        return np.zeros((len(track_indices), len(detection_indices)))
+
+    bboxes = np.asarray([tracks[i].to_tlwh() for i in track_indices])
+    candidates = np.asarray([detections[i].tlwh for i in detection_indices])
+    stale = np.asarray(
+        [tracks[i].time_since_update > 1 for i in track_indices])
 
-        bbox = tracks[track_idx].to_tlwh()
-        candidates = np.asarray([detections[i].tlwh for i in detection_indices])
-        cost_matrix[row, :] = 1. - iou(bbox, candidates)
+    cost_matrix = 1. - iou(bboxes, candidates)
+    cost_matrix[stale, :] = linear_assignment.INFTY_COST
     return cost_matrix
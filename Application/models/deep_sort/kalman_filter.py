@@ -185,6 +185,162 @@ class KalmanFilter(object):
             kalman_gain, projected_cov, kalman_gain.T))
         return new_mean, new_covariance
 
+    def _motion_std(self, height):
+        """Standard deviations of process noise for given bounding box heights,
+        returns an Nx8 dimensional array.
+        """
+        pos, vel = self._std_weight_position * height, self._std_weight_velocity * height
+        return np.stack([
+            pos, pos, np.full_like(height, 1e-2), pos,
+            vel, vel, np.full_like(height, 1e-5), vel], axis=1)
+
+    def _measurement_std(self, height):
+        """Standard deviations of measurement noise for given bounding box
+        heights, returns an Nx4 dimensional array.
+        """
+        pos = self._std_weight_position * height
+        return np.stack([pos, pos, np.full_like(height, 1e-1), pos], axis=1)
+
+    def predict_batch(self, mean, covariance):
+        """Run Kalman filter prediction step for N state distributions at once.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean vectors of the object states at the
+            previous time step.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices of the object states at
+            the previous time step.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the mean vectors and covariance matrices of the predicted
+            states.
+
+        """
+        motion_var = np.square(self._motion_std(mean[:, 3]))
+
+        mean = np.dot(mean, self._motion_mat.T)
+        covariance = np.matmul(
+            np.matmul(self._motion_mat, covariance), self._motion_mat.T)
+        diagonal = np.arange(covariance.shape[-1])
+        covariance[:, diagonal, diagonal] += motion_var
+
+        return mean, covariance
+
+    def project_batch(self, mean, covariance):
+        """Project N state distributions to measurement space at once.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional mean vectors.
+        covariance : ndarray
+            The Nx8x8 dimensional covariance matrices.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the Nx4 projected means and Nx4x4 covariance matrices of
+            the given state estimates.
+
+        """
+        innovation_var = np.square(self._measurement_std(mean[:, 3]))
+
+        mean = np.dot(mean, self._update_mat.T)
+        covariance = np.matmul(
+            np.matmul(self._update_mat, covariance), self._update_mat.T)
+        diagonal = np.arange(covariance.shape[-1])
+        covariance[:, diagonal, diagonal] += innovation_var
+
+        return mean, covariance
+
+    def update_batch(self, mean, covariance, measurements):
+        """Run Kalman filter correction step for N state distributions at once.
+
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional predicted mean vectors.
+        covariance : ndarray
+            The Nx8x8 dimensional predicted covariance matrices.
+        measurements : ndarray
+            The Nx4 dimensional measurement vectors (x, y, a, h), i-th
+            measurement is associated with i-th state.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the measurement-corrected state distributions.
+
+        """
+        projected_mean, projected_cov = self.project_batch(mean, covariance)
+
+        # K = P H^T S^-1, solved as S K^T = H P^T, S is symmetric
+        cov_update_t = np.matmul(self._update_mat, covariance)
+        kalman_gain = np.linalg.solve(
+            projected_cov, cov_update_t).transpose(0, 2, 1)
+        innovation = measurements - projected_mean
+
+        new_mean = mean + np.einsum('nij,nj->ni', kalman_gain, innovation)
+        new_covariance = covariance - np.matmul(
+            np.matmul(kalman_gain, projected_cov), kalman_gain.transpose(0, 2, 1))
+        return new_mean, new_covariance
+
+    def project_cholesky_batch(self, mean, covariance):
+        """Project N state distributions to measurement space and factorize
+        the projected covariances.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the Nx4 projected means and Nx4x4 lower Cholesky factors of
+            the projected covariance matrices.
+
+        """
+        projected_mean, projected_cov = self.project_batch(mean, covariance)
+        return projected_mean, np.linalg.cholesky(projected_cov)
+
+    def gating_distance_batch(self, projected_mean, cholesky_factor,
+                              measurements, only_position=False):
+        """Compute gating distance between N projected state distributions
+        and M measurements at once.
+
+        Parameters
+        ----------
+        projected_mean : ndarray
+            The Nx4 dimensional projected means, see `project_cholesky_batch`.
+        cholesky_factor : ndarray
+            The Nx4x4 dimensional lower Cholesky factors of the projected
+            covariances.
+        measurements : ndarray
+            An Mx4 dimensional matrix of M measurements in format (x, y, a, h).
+        only_position : Optional[bool]
+            If True, distance computation is done with respect to the bounding
+            box center position only. The Cholesky factor of the position block
+            is the upper left block of the full factor, so the same factors can
+            be used in both cases.
+
+        Returns
+        -------
+        ndarray
+            Returns an NxM array, where element (i, j) contains the squared
+            Mahalanobis distance between i-th distribution and j-th
+            measurement.
+
+        """
+        measurements = np.asarray(measurements)
+        if only_position:
+            projected_mean = projected_mean[:, :2]
+            cholesky_factor = cholesky_factor[:, :2, :2]
+            measurements = measurements[:, :2]
+
+        d = measurements[np.newaxis, :, :] - projected_mean[:, np.newaxis, :]
+        z = np.linalg.solve(cholesky_factor, d.transpose(0, 2, 1))
+        return np.sum(z * z, axis=1)
+
     def gating_distance(self, mean, covariance, measurements,
                         only_position=False):
         """Compute gating distance between state distribution and measurements.
@@ -227,3 +383,143 @@ class KalmanFilter(object):
             overwrite_b=True)
         squared_maha = np.sum(z * z, axis=0)
         return squared_maha
+
+
+class KalmanStateStore(object):
+    """
+    Stacked storage of the state distributions of all tracks, which allows to
+    run Kalman filter steps for every track with a single batched operation.
+    Every track owns one slot of the store, slots of deleted tracks are reused.
+
+    Parameters
+    ----------
+    capacity : int
+        Initial number of slots, the store grows when all slots are taken.
+
+    Attributes
+    ----------
+    mean : ndarray
+        The Nx8 dimensional mean vectors of all slots.
+    covariance : ndarray
+        The Nx8x8 dimensional covariance matrices of all slots.
+    projected_mean : ndarray
+        The Nx4 dimensional measurement space means of all slots, cached
+        during the prediction step for gating.
+    cholesky_factor : ndarray
+        The Nx4x4 dimensional lower Cholesky factors of the measurement space
+        covariances of all slots, cached during the prediction step for gating.
+
+    """
+
+    def __init__(self, capacity=32):
+        self.mean = np.zeros((capacity, 8))
+        self.covariance = np.zeros((capacity, 8, 8))
+        self.projected_mean = np.zeros((capacity, 4))
+        self.cholesky_factor = np.zeros((capacity, 4, 4))
+        self._active = np.zeros(capacity, dtype=bool)
+        self._projected = np.zeros(capacity, dtype=bool)
+
+    def allocate(self, mean, covariance):
+        """Take a free slot and initialize it with given state distribution.
+
+        Returns
+        -------
+        int
+            Index of the taken slot.
+
+        """
+        free = np.flatnonzero(~self._active)
+        if len(free) == 0:
+            self._grow()
+            free = np.flatnonzero(~self._active)
+        slot = int(free[0])
+
+        self.mean[slot] = mean
+        self.covariance[slot] = covariance
+        self._active[slot] = True
+        self._projected[slot] = False
+        return slot
+
+    def release(self, slot):
+        """Free slot of a deleted track."""
+        self._active[slot] = False
+
+    def _grow(self):
+        capacity = len(self.mean)
+        self.mean = np.concatenate([self.mean, np.zeros_like(self.mean)])
+        self.covariance = np.concatenate(
+            [self.covariance, np.zeros_like(self.covariance)])
+        self.projected_mean = np.concatenate(
+            [self.projected_mean, np.zeros_like(self.projected_mean)])
+        self.cholesky_factor = np.concatenate(
+            [self.cholesky_factor, np.zeros_like(self.cholesky_factor)])
+        self._active = np.concatenate(
+            [self._active, np.zeros(capacity, dtype=bool)])
+        self._projected = np.concatenate(
+            [self._projected, np.zeros(capacity, dtype=bool)])
+
+    def active_slots(self):
+        """Returns indices of all taken slots."""
+        return np.flatnonzero(self._active)
+
+    def predict(self, kf, slots=None):
+        """Run Kalman filter prediction step for given slots. Projection to
+        measurement space needed for gating is computed and cached in the same
+        step.
+
+        Parameters
+        ----------
+        kf : KalmanFilter
+            The Kalman filter.
+        slots : Optional[array_like]
+            Indices of slots to be propagated. Defaults to all taken slots.
+
+        """
+        slots = self.active_slots() if slots is None else np.asarray(slots, dtype=int)
+        if len(slots) == 0:
+            return
+        self.mean[slots], self.covariance[slots] = kf.predict_batch(
+            self.mean[slots], self.covariance[slots])
+        self._project(kf, slots)
+
+    def _project(self, kf, slots):
+        self.projected_mean[slots], self.cholesky_factor[slots] = \
+            kf.project_cholesky_batch(self.mean[slots], self.covariance[slots])
+        self._projected[slots] = True
+
+    def projection(self, kf, slots):
+        """Get measurement space means and Cholesky factors of projected
+        covariances of given slots, computing only those not cached yet.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the Nx4 projected means and Nx4x4 Cholesky factors.
+
+        """
+        slots = np.asarray(slots, dtype=int)
+        stale = slots[~self._projected[slots]]
+        if len(stale) > 0:
+            self._project(kf, stale)
+        return self.projected_mean[slots], self.cholesky_factor[slots]
+
+    def update(self, kf, slots, measurements):
+        """Run Kalman filter correction step for given slots.
+
+        Parameters
+        ----------
+        kf : KalmanFilter
+            The Kalman filter.
+        slots : array_like
+            Indices of slots to be corrected.
+        measurements : ndarray
+            The Nx4 dimensional measurements, i-th measurement corrects
+            i-th slot in `slots`.
+
+        """
+        slots = np.asarray(slots, dtype=int)
+        if len(slots) == 0:
+            return
+        self.mean[slots], self.covariance[slots] = kf.update_batch(
+            self.mean[slots], self.covariance[slots], np.asarray(measurements))
+        self._projected[slots] = False
@@ -181,11 +181,24 @@ def gate_cost_matrix(
     """
     gating_dim = 2 if only_position else 4
     gating_threshold = kalman_filter.chi2inv95[gating_dim]
+    if len(track_indices) == 0 or len(detection_indices) == 0:
+        return cost_matrix
+
     measurements = np.asarray(
         [detections[i].to_xyah() for i in detection_indices])
-    for row, track_idx in enumerate(track_indices):
-        track = tracks[track_idx]
-        gating_distance = kf.gating_distance(
-            track.mean, track.covariance, measurements, only_position)
-        cost_matrix[row, gating_distance > gating_threshold] = gated_cost
+    gated_tracks = [tracks[i] for i in track_indices]
+
+    store = gated_tracks[0].store
+    if store is not None and all(t.store is store for t in gated_tracks):
+        # projections cached during this frame's prediction step
+        projected_mean, cholesky_factor = store.projection(
+            kf, [t.slot for t in gated_tracks])
+    else:
+        projected_mean, cholesky_factor = kf.project_cholesky_batch(
+            np.asarray([t.mean for t in gated_tracks]),
+            np.asarray([t.covariance for t in gated_tracks]))
+
+    gating_distance = kf.gating_distance_batch(
+        projected_mean, cholesky_factor, measurements, only_position)
+    cost_matrix[gating_distance > gating_threshold] = gated_cost
     return cost_matrix
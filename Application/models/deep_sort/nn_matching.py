@@ -2,105 +2,17 @@
 import numpy as np
 
 
-def _pdist(a, b):
-    """Compute pair-wise squared distance between points in `a` and `b`.
-
-    Parameters
-    ----------
-    a : array_like
-        An NxM matrix of N samples of dimensionality M.
-    b : array_like
-        An LxM matrix of L samples of dimensionality M.
-
-    Returns
-    -------
-    ndarray
-        Returns a matrix of size len(a), len(b) such that eleement (i, j)
-        contains the squared distance between `a[i]` and `b[j]`.
-
-    """
-    a, b = np.asarray(a), np.asarray(b)
-    if len(a) == 0 or len(b) == 0:
-        return np.zeros((len(a), len(b)))
-    a2, b2 = np.square(a).sum(axis=1), np.square(b).sum(axis=1)
-    r2 = -2. * np.dot(a, b.T) + a2[:, None] + b2[None, :]
-    r2 = np.clip(r2, 0., float(np.inf))
-    return r2
-
-
-def _cosine_distance(a, b, data_is_normalized=False):
-    """Compute pair-wise cosine distance between points in `a` and `b`.
-
-    Parameters
-    ----------
-    a : array_like
-        An NxM matrix of N samples of dimensionality M.
-    b : array_like
-        An LxM matrix of L samples of dimensionality M.
-    data_is_normalized : Optional[bool]
-        If True, assumes rows in a and b are unit length vectors.
-        Otherwise, a and b are explicitly normalized to lenght 1.
-
-    Returns
-    -------
-    ndarray
-        Returns a matrix of size len(a), len(b) such that eleement (i, j)
-        contains the squared distance between `a[i]` and `b[j]`.
-
-    """
-    if not data_is_normalized:
-        a = np.asarray(a) / np.linalg.norm(a, axis=1, keepdims=True)
-        b = np.asarray(b) / np.linalg.norm(b, axis=1, keepdims=True)
-    return 1. - np.dot(a, b.T)
-
-
-def _nn_euclidean_distance(x, y):
-    """ Helper function for nearest neighbor distance metric (Euclidean).
-
-    Parameters
-    ----------
-    x : ndarray
-        A matrix of N row-vectors (sample points).
-    y : ndarray
-        A matrix of M row-vectors (query points).
-
-    Returns
-    -------
-    ndarray
-        A vector of length M that contains for each entry in `y` the
-        smallest Euclidean distance to a sample in `x`.
-
-    """
-    distances = _pdist(x, y)
-    return np.maximum(0.0, distances.min(axis=0))
-
-
-def _nn_cosine_distance(x, y):
-    """ Helper function for nearest neighbor distance metric (cosine).
-
-    Parameters
-    ----------
-    x : ndarray
-        A matrix of N row-vectors (sample points).
-    y : ndarray
-        A matrix of M row-vectors (query points).
-
-    Returns
-    -------
-    ndarray
-        A vector of length M that contains for each entry in `y` the
-        smallest cosine distance to a sample in `x`.
-
-    """
-    distances = _cosine_distance(x, y)
-    return distances.min(axis=0)
-
-
 class NearestNeighborDistanceMetric(object):
     """
     A nearest neighbor distance metric that, for each target, returns
     the closest distance to any sample that has been observed so far.
 
+    Samples are kept in a gallery: one preallocated float32 slab with a slot
+    of `budget` rows per target, used as a ring buffer. For the cosine metric
+    rows are normalized when stored. The cost matrix is computed with a
+    single matrix product over the valid rows of the requested targets
+    followed by a segmented minimum.
+
     Parameters
     ----------
     metric : str
@@ -110,29 +22,87 @@ class NearestNeighborDistanceMetric(object):
         invalid match.
     budget : Optional[int]
         If not None, fix samples per class to at most this number. Removes
-        the oldest samples when the budget is reached.
+        the oldest samples when the budget is reached. If None, slots grow
+        without limit.
 
     Attributes
     ----------
-    samples : Dict[int -> List[ndarray]]
-        A dictionary that maps from target identities to the list of samples
-        that have been observed so far.
+    samples : Dict[int -> ndarray]
+        A dictionary that maps from target identities to the samples that
+        have been observed so far (normalized for the cosine metric, in ring
+        buffer order).
 
     """
 
     def __init__(self, metric, matching_threshold, budget=None):
 
 
-        if metric == "euclidean":
-            self._metric = _nn_euclidean_distance
-        elif metric == "cosine":
-            self._metric = _nn_cosine_distance
-        else:
+        if metric not in ("euclidean", "cosine"):
             raise ValueError(
                 "Invalid metric; must be either 'euclidean' or 'cosine'")
+        self._cosine = metric == "cosine"
         self.matching_threshold = matching_threshold
         self.budget = budget
-        self.samples = {}
+
+        self._slab = None  # (slots, slot size, feature dim)
+        self._sq_norms = None  # (slots, slot size), used by euclidean metric
+        self._written = np.zeros(0, dtype=np.int64)  # samples written per slot
+        self._slot_of = {}  # target -> slot
+        self._free = []
+
+    @property
+    def samples(self):
+        return {target: self._slab[slot, :self._valid_count(slot)]
+                for target, slot in self._slot_of.items()}
+
+    def _valid_count(self, slot):
+        return min(int(self._written[slot]), self._slab.shape[1])
+
+    def _allocate_gallery(self, dim):
+        slot_size = self.budget if self.budget is not None else 16
+        self._slab = np.zeros((8, slot_size, dim), dtype=np.float32)
+        self._sq_norms = np.zeros((8, slot_size), dtype=np.float32)
+        self._written = np.zeros(8, dtype=np.int64)
+        self._free = list(range(7, -1, -1))
+
+    def _grow_slots(self):
+        n_slots = len(self._slab)
+        self._slab = np.concatenate([self._slab, np.zeros_like(self._slab)])
+        self._sq_norms = np.concatenate(
+            [self._sq_norms, np.zeros_like(self._sq_norms)])
+        self._written = np.concatenate(
+            [self._written, np.zeros(n_slots, dtype=np.int64)])
+        self._free += list(range(2 * n_slots - 1, n_slots - 1, -1))
+
+    def _grow_slot_size(self, min_size):
+        """Only used without budget, samples keep their positions."""
+        slot_size = self._slab.shape[1]
+        while slot_size < min_size:
+            slot_size *= 2
+        pad = slot_size - self._slab.shape[1]
+        self._slab = np.pad(self._slab, ((0, 0), (0, pad), (0, 0)))
+        self._sq_norms = np.pad(self._sq_norms, ((0, 0), (0, pad)))
+
+    def _take_slot(self, target):
+        if target not in self._slot_of:
+            if not self._free:
+                self._grow_slots()
+            slot = self._free.pop()
+            self._written[slot] = 0
+            self._slot_of[target] = slot
+        return self._slot_of[target]
+
+    def _append(self, slot, rows):
+        slot_size = self._slab.shape[1]
+        if self.budget is None and self._written[slot] + len(rows) > slot_size:
+            self._grow_slot_size(self._written[slot] + len(rows))
+            slot_size = self._slab.shape[1]
+        rows = rows[-slot_size:]
+
+        positions = (self._written[slot] + np.arange(len(rows))) % slot_size
+        self._slab[slot, positions] = rows
+        self._sq_norms[slot, positions] = np.square(rows).sum(axis=1)
+        self._written[slot] += len(rows)
 
     def partial_fit(self, features, targets, active_targets):
         """Update the distance metric with new data.
@@ -147,11 +117,22 @@ class NearestNeighborDistanceMetric(object):
             A list of targets that are currently present in the scene.
 
         """
-        for feature, target in zip(features, targets):
-            self.samples.setdefault(target, []).append(feature)
-            if self.budget is not None:
-                self.samples[target] = self.samples[target][-self.budget:]
-        self.samples = {k: self.samples[k] for k in active_targets}
+        features = np.asarray(features, dtype=np.float32)
+        targets = np.asarray(targets)
+        if len(features) > 0:
+            if self._slab is None:
+                self._allocate_gallery(features.shape[1])
+            if self._cosine:
+                features = features / np.linalg.norm(
+                    features, axis=1, keepdims=True)
+
+            for target in np.unique(targets):
+                self._append(
+                    self._take_slot(target), features[targets == target])
+
+        active_targets = set(active_targets)
+        for target in [t for t in self._slot_of if t not in active_targets]:
+            self._free.append(self._slot_of.pop(target))
 
     def distance(self, features, targets):
         """Compute distance between features and targets.
@@ -168,10 +149,39 @@ class NearestNeighborDistanceMetric(object):
         ndarray
             Returns a cost matrix of shape len(targets), len(features), where
             element (i, j) contains the closest squared distance between
-            `targets[i]` and `features[j]`.
+            `targets[i]` and `features[j]`. Targets without samples have
+            infinite distance.
 
         """
-        cost_matrix = np.zeros((len(targets), len(features)))
-        for i, target in enumerate(targets):
-            cost_matrix[i, :] = self._metric(self.samples[target], features)
+        cost_matrix = np.full((len(targets), len(features)), np.inf)
+        if len(targets) == 0 or len(features) == 0 or self._slab is None:
+            return cost_matrix
+
+        slots = np.array([self._slot_of.get(t, -1) for t in targets])
+        counts = np.array(
+            [self._valid_count(slot) if slot >= 0 else 0 for slot in slots])
+        known = counts > 0
+        if not known.any():
+            return cost_matrix
+        slots, counts = slots[known], counts[known]
+
+        # flat indices of valid rows of requested targets, one segment per target
+        starts = np.cumsum(counts) - counts
+        slot_size = self._slab.shape[1]
+        rows = np.repeat(slots * slot_size - starts, counts) + \
+            np.arange(counts.sum())
+
+        gallery = self._slab.reshape(-1, self._slab.shape[2])[rows]
+        features = np.asarray(features, dtype=np.float32)
+        if self._cosine:
+            features = features / np.linalg.norm(
+                features, axis=1, keepdims=True)
+            distances = 1. - np.dot(gallery, features.T)
+        else:
+            distances = -2. * np.dot(gallery, features.T) + \
+                self._sq_norms.reshape(-1)[rows][:, None] + \
+                np.square(features).sum(axis=1)[None, :]
+            distances = np.maximum(0., distances)
+
+        cost_matrix[known] = np.minimum.reduceat(distances, starts, axis=0)
         return cost_matrix
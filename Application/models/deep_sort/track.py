@@ -37,16 +37,27 @@ class Track:
     max_age : int
         The maximum number of consecutive misses before the track state is
         set to `Deleted`.
-    feature : Optional[ndarray]
-        Feature vector of the detection this track originates from. If not None,
-        this feature is added to the `features` cache.
+    feature : Optional[ndarray | Detection]
+        Feature vector of the detection this track originates from, or the
+        detection itself if its feature is extracted lazily. If not None,
+        it is added to the `features` cache.
+    class_name : Optional[int]
+        Class of the detection this track originates from.
+    store : Optional[kalman_filter.KalmanStateStore]
+        If not None, the state distribution is kept in a slot of this store
+        and `mean`, `covariance` are views into it, so the state of all tracks
+        can be propagated with batched operations.
 
     Attributes
     ----------
     mean : ndarray
-        Mean vector of the initial state distribution.
+        Mean vector of the current state distribution.
     covariance : ndarray
-        Covariance matrix of the initial state distribution.
+        Covariance matrix of the current state distribution.
+    store : kalman_filter.KalmanStateStore | NoneType
+        Store holding the state distribution.
+    slot : int | NoneType
+        Index of the slot in `store`.
     track_id : int
         A unique track identifier.
     hits : int
@@ -57,16 +68,24 @@ class Track:
         Total number of frames since last measurement update.
     state : TrackState
         The current track state.
-    features : List[ndarray]
-        A cache of features. On each measurement update, the associated feature
-        vector is added to this list.
+    features : List[ndarray | Detection]
+        A cache of features. On each measurement update, the associated
+        detection is added to this list, its feature is extracted lazily
+        when the cache is consumed.
+    confidence : float | NoneType
+        Detector confidence score of the last associated detection.
 
     """
 
     def __init__(self, mean, covariance, track_id, n_init, max_age,
-                 feature=None, class_name=None):
-        self.mean = mean
-        self.covariance = covariance
+                 feature=None, class_name=None, store=None, confidence=None):
+        self.store = store
+        self.slot = None
+        if store is not None:
+            self.slot = store.allocate(mean, covariance)
+        else:
+            self._mean = mean
+            self._covariance = covariance
         self.track_id = track_id
         self.hits = 1
         self.age = 1
@@ -80,6 +99,33 @@ class Track:
         self._n_init = n_init
         self._max_age = max_age
         self.class_name = class_name
+        self.confidence = confidence
+
+    @property
+    def mean(self):
+        if self.store is None:
+            return self._mean
+        return self.store.mean[self.slot]
+
+    @mean.setter
+    def mean(self, value):
+        if self.store is None:
+            self._mean = value
+        else:
+            self.store.mean[self.slot] = value
+
+    @property
+    def covariance(self):
+        if self.store is None:
+            return self._covariance
+        return self.store.covariance[self.slot]
+
+    @covariance.setter
+    def covariance(self, value):
+        if self.store is None:
+            self._covariance = value
+        else:
+            self.store.covariance[self.slot] = value
 
     def to_tlwh(self):
         """Get current position in bounding box format `(top left x, top left y,
@@ -124,8 +170,22 @@ class Track:
 
         """
         self.mean, self.covariance = kf.predict(self.mean, self.covariance)
+        self.increment_age()
+
+    def increment_age(self, coast=False):
+        """Advance track age by one time step. Used directly when the state
+        distribution has been propagated for all tracks at once.
+
+        Parameters
+        ----------
+        coast : bool
+            If True, the time step had no detector run, so it is not counted
+            as a missed measurement.
+
+        """
         self.age += 1
-        self.time_since_update += 1
+        if not coast:
+            self.time_since_update += 1
 
     def update(self, kf, detection):
         """Perform Kalman filter measurement update step and update the feature
@@ -141,7 +201,21 @@ class Track:
         """
         self.mean, self.covariance = kf.update(
             self.mean, self.covariance, detection.to_xyah())
-        self.features.append(detection.feature)
+        self.register_hit(detection)
+
+    def register_hit(self, detection):
+        """Update the feature cache and track state after a measurement
+        update. Used directly when the state distribution has been corrected
+        for all matched tracks at once.
+
+        Parameters
+        ----------
+        detection : Detection
+            The associated detection.
+
+        """
+        self.features.append(detection)
+        self.confidence = detection.confidence
 
         self.hits += 1
         self.time_since_update = 0
@@ -168,3 +242,11 @@ class Track:
     def is_deleted(self):
         """Returns True if this track is dead and should be deleted."""
         return self.state == TrackState.Deleted
+
+    def release(self):
+        """Free the slot of the state store, called once the track is removed.
+        """
+        if self.store is not None:
+            self._mean, self._covariance = self.mean.copy(), self.covariance.copy()
+            self.store.release(self.slot)
+            self.store, self.slot = None, None
@@ -4,6 +4,7 @@ import numpy as np
 from . import kalman_filter
 from . import linear_assignment
 from . import iou_matching
+from .detection import gather_features
 from .track import Track
 
 
@@ -32,6 +33,8 @@ class Tracker:
         Number of frames that a track remains in initialization phase.
     kf : kalman_filter.KalmanFilter
         A Kalman filter to filter target trajectories in image space.
+    state_store : kalman_filter.KalmanStateStore
+        Stacked state distributions of all tracks, filtered in one batch.
     tracks : List[Track]
         The list of active tracks at the current time step.
 
@@ -44,16 +47,45 @@ class Tracker:
         self.n_init = n_init
 
         self.kf = kalman_filter.KalmanFilter()
+        self.state_store = kalman_filter.KalmanStateStore()
         self.tracks = []
         self._next_id = 1
 
-    def predict(self):
+    def predict(self, coast=False):
         """Propagate track state distributions one time step forward.
 
         This function should be called once every time step, before `update`.
+
+        Parameters
+        ----------
+        coast : bool
+            If True, no detections are available for this time step and
+            `update` is not called. Tracks are propagated without being
+            counted as missed, so they survive frames skipped by the detector.
+
         """
+        self.state_store.predict(
+            self.kf, [track.slot for track in self.tracks])
         for track in self.tracks:
-            track.predict(self.kf)
+            track.increment_age(coast)
+
+    def position_uncertainty(self):
+        """Get position uncertainty of confirmed tracks.
+
+        Returns
+        -------
+        ndarray
+            Returns an array of length N, where element i contains the
+            standard deviation of the i-th confirmed track's center position
+            relative to its height.
+
+        """
+        slots = [t.slot for t in self.tracks if t.is_confirmed()]
+        if len(slots) == 0:
+            return np.zeros(0)
+        covariance = self.state_store.covariance[slots]
+        height = np.maximum(self.state_store.mean[slots, 3], 1e-6)
+        return np.sqrt(covariance[:, 0, 0] + covariance[:, 1, 1]) / height
 
     def update(self, detections):
         """Perform measurement update and track management.
@@ -69,13 +101,18 @@ class Tracker:
             self._match(detections)
 
         # Update track set.
+        self.state_store.update(
+            self.kf, [self.tracks[track_idx].slot for track_idx, _ in matches],
+            [detections[detection_idx].to_xyah() for _, detection_idx in matches])
         for track_idx, detection_idx in matches:
-            self.tracks[track_idx].update(
-                self.kf, detections[detection_idx])
+            self.tracks[track_idx].register_hit(detections[detection_idx])
         for track_idx in unmatched_tracks:
             self.tracks[track_idx].mark_missed()
         for detection_idx in unmatched_detections:
             self._initiate_track(detections[detection_idx])
+        for track in self.tracks:
+            if track.is_deleted():
+                track.release()
         self.tracks = [t for t in self.tracks if not t.is_deleted()]
 
         # Update distance metric.
@@ -87,18 +124,28 @@ class Tracker:
             features += track.features
             targets += [track.track_id for _ in track.features]
             track.features = []
+        # features of tentative and deleted tracks are never extracted
         self.metric.partial_fit(
-            np.asarray(features), np.asarray(targets), active_targets)
+            gather_features(features), np.asarray(targets), active_targets)
 
     def _match(self, detections):
 
         def gated_metric(tracks, dets, track_indices, detection_indices):
-            features = np.array([dets[i].feature for i in detection_indices])
-            targets = np.array([tracks[i].track_id for i in track_indices])
-            cost_matrix = self.metric.distance(features, targets)
-            cost_matrix = linear_assignment.gate_cost_matrix(
-                self.kf, cost_matrix, tracks, dets, track_indices,
-                detection_indices)
+            # gate first, so features are extracted only for detections
+            # feasible for at least one track
+            gated = linear_assignment.gate_cost_matrix(
+                self.kf, np.zeros((len(track_indices), len(detection_indices))),
+                tracks, dets, track_indices, detection_indices) > 0
+            cost_matrix = np.full(gated.shape, linear_assignment.INFTY_COST)
+
+            feasible = np.flatnonzero(~gated.all(axis=0))
+            if len(feasible) > 0:
+                features = gather_features(
+                    [dets[detection_indices[j]] for j in feasible])
+                targets = np.array([tracks[i].track_id for i in track_indices])
+                cost_matrix[:, feasible] = self.metric.distance(
+                    features, targets)
+                cost_matrix[gated] = linear_assignment.INFTY_COST
 
             return cost_matrix
 
@@ -135,5 +182,6 @@ class Tracker:
         class_name = detection.get_class()
         self.tracks.append(Track(
             mean, covariance, self._next_id, self.n_init, self.max_age,
-            detection.feature, class_name))
+            detection, class_name, self.state_store,
+            detection.confidence))
         self._next_id += 1
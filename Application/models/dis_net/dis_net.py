@@ -1,5 +1,10 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Union
 import numpy as np
-import keras
+from .numpy_mlp import NumpyMLP
+
+if TYPE_CHECKING:  # keras model is only called, importing keras would load tensorflow
+    import keras
 
 
 class DisNet:
@@ -8,21 +13,46 @@ class DisNet:
 
         Parameters
         ----------
-            distance_model : loaded keras distance estimation model
+            distance_model : loaded keras distance estimation model or NumpyMLP engine
+            engine : "keras" to run model through keras, "numpy" to evaluate it with plain NumPy
+            image_size : resolution of images in which bounding boxes are given, assumed to be square
 
         Attributes
         ----------
-            model : loaded keras distance estimation model
+            model : loaded keras distance estimation model, None if NumpyMLP was passed
+            engine : object used for inference, keras model or NumpyMLP
+            image_size : resolution of images in which bounding boxes are given
             class_sizes : reference average class dimensions in centimeters
             zoom_in_factor : zoom factor, 1 for no zoom
     """
-    def __init__(self, distance_model: keras.engine.sequential.Sequential) -> None:
-        self.model = distance_model
+    def __init__(self, distance_model: Union[keras.engine.sequential.Sequential, NumpyMLP],
+                 engine: str = "keras", image_size: int = 320) -> None:
+        self.image_size = image_size
+        if isinstance(distance_model, NumpyMLP):
+            self.model = None
+            self.engine = distance_model
+        else:
+            self.model = distance_model
+            self.engine = self.__get_engine(engine)
+
         self.class_sizes = {1: {"name": "person", "size": [175, 55, 30]},
                             2: {"name": "car", "size": [150, 180, 400]},
                             4: {"name": "bike", "size": [110, 50, 180]}}
         self.zoom_in_factor = 1
 
+        # reference sizes indexed by class id, NaN for classes without reference size
+        self.__class_size_table = np.full((max(self.class_sizes.keys()) + 1, 3), np.nan, dtype=np.float32)
+        for class_id, class_info in self.class_sizes.items():
+            self.__class_size_table[class_id] = class_info['size']
+
+    def __get_engine(self, engine: str) -> Union[keras.engine.sequential.Sequential, NumpyMLP]:
+        engines = {"keras": lambda: self.model, "numpy": lambda: NumpyMLP.from_keras(self.model)}
+        try:
+            return engines[engine]()
+        except KeyError:
+            print("Wrong key for DisNet engine \n Choosing keras")
+            return self.model
+
     def __invert_dimensions(self, width: float, height: float, diagonal: float) -> tuple[float, float, float]:
         """
         Returns inverse dimensions, handles division by 0
@@ -62,7 +92,46 @@ class DisNet:
 
             :return: predicted distance
         """
-        distance_input = self.__load_dist_input(bounding_box, class_deteted, 320, 320)
-        distance = self.model.predict(np.array([distance_input]).reshape(-1, 6)) * self.zoom_in_factor
+        distance_input = self.__load_dist_input(bounding_box, class_deteted, self.image_size, self.image_size)
+        distance = self.engine.predict(np.array([distance_input]).reshape(-1, 6)) * self.zoom_in_factor
         return distance
 
+    def __load_dist_inputs(self, predict_boxes: np.ndarray, predict_classes: np.ndarray,
+                           img_width: int, img_height: int) -> np.ndarray:
+        """
+        Vectorized version of __load_dist_input, prepares inputs for all objects at once
+
+            :param predict_boxes: Nx4 array of bounding boxes coordinates
+            :param predict_classes: N predicted objects classes, all need to have reference size
+            :param img_width: width of image
+            :param img_height: height of image
+
+            :return: Nx6 array of features for distance estimation model
+        """
+        top, left, bottom, right = np.asarray(predict_boxes, dtype=np.float64).T
+        width = (right - left) / img_width
+        height = (bottom - top) / img_height
+        diagonal = np.sqrt(np.square(width) + np.square(height))
+
+        dimensions = np.stack([width, height, diagonal], axis=1)
+        inv_dimensions = np.divide(1, dimensions, out=np.zeros_like(dimensions), where=dimensions != 0)
+
+        class_dimensions = self.__class_size_table[np.asarray(predict_classes, dtype=int)]
+
+        return np.concatenate([inv_dimensions, class_dimensions], axis=1)
+
+    def predict_batch(self, bounding_boxes: np.ndarray, classes_detected: np.ndarray) -> np.ndarray:
+        """
+        Predicts distances of all objects in a frame with a single model call
+
+            :param bounding_boxes: Nx4 array of bounding boxes coordinates, same format as in predict
+            :param classes_detected: N predicted objects classes, all need to have reference size
+
+            :return: N predicted distances
+        """
+        if len(bounding_boxes) == 0:
+            return np.empty(0, dtype=np.float32)
+
+        distance_input = self.__load_dist_inputs(bounding_boxes, classes_detected, self.image_size, self.image_size)
+        distances = self.engine.predict(distance_input) * self.zoom_in_factor
+        return distances.reshape(-1)
@@ -0,0 +1,134 @@
+from __future__ import annotations
+import numpy as np
+
+
+def _linear(x):
+    return x
+
+
+def _relu(x):
+    return np.maximum(x, 0)
+
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def _elu(x):
+    return np.where(x > 0, x, np.expm1(np.minimum(x, 0)))
+
+
+def _selu(x):
+    return 1.0507009873554805 * np.where(x > 0, x, 1.6732632423543772 * np.expm1(np.minimum(x, 0)))
+
+
+def _softplus(x):
+    return np.logaddexp(x, 0)
+
+
+def _swish(x):
+    return x * _sigmoid(x)
+
+
+ACTIVATIONS = {"linear": _linear, "relu": _relu, "sigmoid": _sigmoid, "tanh": np.tanh, "softmax": _softmax,
+               "elu": _elu, "selu": _selu, "softplus": _softplus, "swish": _swish, "silu": _swish}
+
+# layers which do nothing during inference
+PASSTHROUGH_LAYERS = ("InputLayer", "Dropout", "GaussianNoise", "GaussianDropout", "Flatten")
+
+
+class NumpyMLP:
+    """
+    Inference engine for fully connected keras models, evaluates network with plain NumPy matrix multiplications.
+    Does not depend on tensorflow, so it can be used in processes without tensorflow imported.
+
+        Parameters
+        ----------
+            weights : weight matrices of consecutive dense layers
+            biases : bias vectors of consecutive dense layers
+            activations : activation names of consecutive dense layers
+
+        Attributes
+        ----------
+            layers : list of (weights, bias, activation function) tuples
+            activations : activation names of consecutive dense layers
+    """
+    def __init__(self, weights: list[np.ndarray], biases: list[np.ndarray], activations: list[str]) -> None:
+        unknown = [a for a in activations if a not in ACTIVATIONS]
+        if unknown:
+            raise ValueError(f"Unsupported activations: {unknown}")
+
+        self.activations = list(activations)
+        self.layers = [(np.asarray(w, dtype=np.float32), np.asarray(b, dtype=np.float32), ACTIVATIONS[a])
+                       for w, b, a in zip(weights, biases, activations)]
+
+    @classmethod
+    def from_keras(cls, model) -> NumpyMLP:
+        """
+        Extracts weights and activations from loaded keras Sequential model
+
+            :param model: keras Sequential model built from Dense layers
+
+            :return: NumPy inference engine
+        """
+        weights, biases, activations = [], [], []
+        for layer in model.layers:
+            layer_type = layer.__class__.__name__
+            if layer_type in PASSTHROUGH_LAYERS:
+                continue
+            elif layer_type == "Dense":
+                w, b = layer.get_weights() if layer.use_bias else (layer.get_weights()[0], None)
+                weights.append(w)
+                biases.append(b if b is not None else np.zeros(w.shape[1], dtype=np.float32))
+                activations.append(layer.activation.__name__)
+            elif layer_type == "Activation":
+                # standalone activation is folded into previous dense layer
+                if not weights or activations[-1] != "linear":
+                    raise ValueError("Activation layer has to follow Dense layer with linear activation")
+                activations[-1] = layer.activation.__name__
+            else:
+                raise ValueError(f"Unsupported layer type: {layer_type}")
+
+        return cls(weights, biases, activations)
+
+    @classmethod
+    def load(cls, path: str) -> NumpyMLP:
+        """
+        Loads engine saved with save method
+
+            :param path: path to .npz file
+        """
+        data = np.load(path)
+        n_layers = len(data["activations"])
+        return cls([data[f"w{i}"] for i in range(n_layers)], [data[f"b{i}"] for i in range(n_layers)],
+                   [str(a) for a in data["activations"]])
+
+    def save(self, path: str) -> None:
+        """
+        Saves weights and activations, so the engine can be loaded without tensorflow
+
+            :param path: path to .npz file
+        """
+        arrays = {}
+        for i, (w, b, _) in enumerate(self.layers):
+            arrays[f"w{i}"] = w
+            arrays[f"b{i}"] = b
+        np.savez(path, activations=np.array(self.activations), **arrays)
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        """
+        Evaluates the network, same contract as keras model.predict
+
+            :param x: NxM array of N samples
+
+            :return: network outputs for all samples
+        """
+        x = np.asarray(x, dtype=np.float32)
+        for w, b, activation in self.layers:
+            x = activation(x @ w + b)
+        return x
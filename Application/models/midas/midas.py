@@ -11,44 +11,56 @@ class MiDas:
         Parameters
         ----------
             model : loaded tensorflow hub depth estimation model
+            input_resolution : resolution required by the model, assumed to be square
 
         Attributes
         ----------
             model : loaded tensorflow hub depth estimation model
+            input_resolution : resolution required by the model, assumed to be square
+            batching : False if model rejected batch of images, images are then processed one by one
     """
-    def __init__(self, model: tf_python.trackable.autotrackable.AutoTrackable) -> None:
+    def __init__(self, model: tf_python.trackable.autotrackable.AutoTrackable, input_resolution: int = 256) -> None:
         self.model = model
+        self.input_resolution = input_resolution
+        self.batching = True
 
-    def __preprocess(self, img: np.ndarray) -> tf_python.framework.ops.EagerTensor:
+    def __preprocess(self, img: np.ndarray, resized: np.ndarray = None) -> tf_python.framework.ops.EagerTensor:
         """
         Prepares image for processing by resizing and creating a tensor
 
             :param img: image for depth estimation
+            :param resized: image already resized to input resolution, e.g. directly from source frame
 
             :return: tensor ready to be processed by depth estimation model
         """
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB) / 255.0
+        r = self.input_resolution
 
-        img_resized = tf.image.resize(img, [256,256], method='bicubic', preserve_aspect_ratio=False)
-        img_resized = tf.transpose(img_resized, [2, 0, 1])
-        img_input = img_resized.numpy()
-        reshape_img = img_input.reshape(1,3,256,256)
+        if resized is None:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB) / 255.0
+            img_resized = tf.image.resize(img, [r, r], method='bicubic', preserve_aspect_ratio=False).numpy()
+        else:
+            img_resized = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
+
+        reshape_img = img_resized.transpose(2, 0, 1).reshape(1, 3, r, r)
         tensor = tf.convert_to_tensor(reshape_img, dtype=tf.float32)
 
         return tensor
 
-    def __post_process(self, output: dict, img: np.ndarray) -> np.ndarray:
+    def __post_process(self, prediction: np.ndarray, img: np.ndarray, raw: bool = False) -> np.ndarray:
         """
         Process inverse relative depth estimation output to get depth image
 
-            :param output: output from depth estimation model
+            :param prediction: output from depth estimation model for the image
             :param img: image for depth estimation
+            :param raw: return model output resized to image resolution, without normalization and quantization
 
             :return: Depth image
         """
-        prediction = output['default'].numpy()
-        prediction = prediction.reshape(256, 256)
+        prediction = prediction.reshape(self.input_resolution, self.input_resolution)
         prediction = cv2.resize(prediction, (img.shape[1], img.shape[0]), interpolation=cv2.INTER_CUBIC)
+        if raw:
+            return prediction.astype(np.float32, copy=False)
+
         depth_min = prediction.min()
         depth_max = prediction.max()
         img_out = (255 * (prediction - depth_min) / (depth_max - depth_min)).astype("uint8")
@@ -56,16 +68,86 @@ class MiDas:
         return img_out
 
 
-    def predict(self, img: np.ndarray) -> np.ndarray:
+    def predict(self, img: np.ndarray, resized: np.ndarray = None, raw: bool = False) -> np.ndarray:
         """
         Estimate inverse relative depth in an image
 
-            :param img: image for depth estimation
+            :param img: image for depth estimation, output has the same resolution
+            :param resized: optional image already resized to input resolution, avoids resizing img
+            :param raw: return float32 model output instead of depth normalized to uint8, for lossless recording
 
             :return: estimation image depth
         """
-        tensor = self.__preprocess(img)
+        tensor = self.__preprocess(img, resized)
         output = self.model.signatures['serving_default'](tensor)
-        result = self.__post_process(output, img)
+        result = self.__post_process(output['default'].numpy(), img, raw)
+
+        return result
+
+    def __preprocess_batch(self, imgs, resized) -> tf_python.framework.ops.EagerTensor:
+        """
+        Prepares multiple images for processing, images without resized version are resized in one call
+        if they have the same resolution
+
+            :param imgs: list of images or stacked array of images
+            :param resized: images already resized to input resolution, entries may be None
+
+            :return: tensor with batch of images ready to be processed by depth estimation model
+        """
+        r = self.input_resolution
+        batch = np.empty((len(imgs), r, r, 3), np.float32)
 
-        return result
\ No newline at end of file
+        given = [i for i, img in enumerate(resized) if img is not None]
+        if given:
+            batch[given] = np.stack([resized[i] for i in given])
+
+        missing = [i for i, img in enumerate(resized) if img is None]
+        if missing and len({imgs[i].shape for i in missing}) == 1:
+            stacked = np.stack([imgs[i] for i in missing]).astype(np.float32)
+            batch[missing] = tf.image.resize(stacked, [r, r], method='bicubic', preserve_aspect_ratio=False).numpy()
+        else:
+            for i in missing:
+                batch[i] = tf.image.resize(imgs[i].astype(np.float32), [r, r], method='bicubic',
+                                           preserve_aspect_ratio=False).numpy()
+
+        # BGR to RGB, scaling and channels first, resizing is linear, so it can be done before scaling
+        batch = batch[..., ::-1].transpose(0, 3, 1, 2) / 255.0
+
+        return tf.convert_to_tensor(np.ascontiguousarray(batch), dtype=tf.float32)
+
+    def predict_batch(self, imgs, resized=None, pad_to: int = None, raw: bool = False) -> list[np.ndarray]:
+        """
+        Estimate inverse relative depth in multiple images with one model call, falls back to processing images
+        one by one if model does not accept batches
+
+            :param imgs: images for depth estimation, list or stacked array, e.g. consecutive frames or frames of
+                different streams
+            :param resized: optional images already resized to input resolution, entries may be None
+            :param pad_to: batch size to which smaller (e.g. final) batches are padded, so model is always called
+                with the same input shape
+            :param raw: return float32 model outputs instead of depth normalized to uint8
+
+            :return: estimation image depth for every image
+        """
+        n = len(imgs)
+        if resized is None:
+            resized = [None] * n
+        if n == 0:
+            return []
+        if not self.batching:
+            return [self.predict(img, r, raw) for img, r in zip(imgs, resized)]
+
+        tensor = self.__preprocess_batch(imgs, resized)
+        if pad_to is not None and n < pad_to:  # repeat last image, its depth is dropped
+            tensor = tf.concat([tensor] + [tensor[-1:]] * (pad_to - n), axis=0)
+
+        try:
+            prediction = self.model.signatures['serving_default'](tensor)['default'].numpy()
+            prediction = prediction.reshape(tensor.shape[0], -1)
+        except (tf.errors.InvalidArgumentError, ValueError):  # model exported with fixed batch size
+            if tensor.shape[0] == 1:
+                raise
+            self.batching = False
+            return self.predict_batch(imgs, resized, raw=raw)
+
+        return [self.__post_process(p, img, raw) for p, img in zip(prediction[:n], imgs)]
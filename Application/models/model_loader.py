@@ -1,6 +1,8 @@
 import tensorflow as tf
 import tensorflow_hub as hub
 from .distance_regressor.distance_regressor import DistanceRegressor
+from .dis_net.numpy_mlp import NumpyMLP
+from .deep_sort import generate_detections as gdet
 
 
 class ModelLoader:
@@ -11,10 +13,11 @@ class ModelLoader:
         ---------
             od_model_path : path to object detection model
             od_resolution : resolution required for object detection model, assumed to be square
-            dis_model_path : path to distance estimation model
+            dis_model_path : path to distance estimation model, keras model or .npz file saved by NumpyMLP
             midas_path : path to depth estimation model
             region_extractor_type : type of method for extracting distance info from regions by DistanceRegressor
             regressor_type : type of method for distance regression by DistanceRegressor
+            reid_model_path : path to appearance feature extraction model used by DeepSort
 
         Attributes
         ----------
@@ -23,23 +26,43 @@ class ModelLoader:
             distance_model : distance estimation model instance
             depth_model : inverse relative depth estimation model instance
             distance_regressor : object for distance regression
+            regressor_args : arguments of DistanceRegressor, used for creating regressors for additional streams
+            box_encoder : appearance feature extractor used by DeepSort
     """
     def __init__(self, od_model_path: str, od_resolution: int, dis_model_path: str, midas_path: str,
-                 region_extractor_type: str, regressor_type: str, **kwargs) -> None:
+                 region_extractor_type: str, regressor_type: str,
+                 reid_model_path: str = r'models/deep_sort/model_data/mars-small128.pb', **kwargs) -> None:
         self.load_detection_model(od_model_path)
         self.od_resolution = od_resolution
         self.load_distance_model(dis_model_path)
         self.load_depth_model(midas_path)
-        self.distance_regressor = self.load_distance_regressor(region_extractor_type, regressor_type, **kwargs)
+        self.regressor_args = (region_extractor_type, regressor_type, kwargs)
+        self.distance_regressor = self.create_distance_regressor()
+        self.load_box_encoder(reid_model_path)
 
     def load_detection_model(self, path: str) -> None:
         self.detection_model = tf.saved_model.load(path)
 
     def load_distance_model(self, path: str) -> None:
-        self.distance_model = tf.keras.models.load_model(path)
+        if path.endswith(".npz"):
+            self.distance_model = NumpyMLP.load(path)
+        else:
+            self.distance_model = tf.keras.models.load_model(path)
 
     def load_depth_model(self, path: str) -> None:
         self.depth_model = hub.load(path, tags=['serve'])
 
+    def load_box_encoder(self, path: str) -> None:
+        self.box_encoder = gdet.create_box_encoder(path, batch_size=None)
+
     def load_distance_regressor(self, region_extractor_type, regressor_type, **kwargs) -> DistanceRegressor:
         return DistanceRegressor(region_extractor_type, regressor_type, **kwargs)
+
+    def create_distance_regressor(self) -> DistanceRegressor:
+        """
+        Creates new distance regressor with the same arguments, regressors are stateful, so every stream needs its own
+
+            :return: distance regressor which was not fitted yet
+        """
+        region_extractor_type, regressor_type, kwargs = self.regressor_args
+        return self.load_distance_regressor(region_extractor_type, regressor_type, **kwargs)
@@ -11,13 +11,18 @@ class ObjectDetector:
         Parameters
         ----------
             detection_model : loaded tensorflow Object Detection API model
+            resolution : input resolution of the model, assumed to be square
 
         Attributes
         ----------
             model : loaded tensorflow Object Detection API model
+            resolution : input resolution of the model as (width, height)
+            batching : False if model rejected batch of images, images are then processed one by one
     """
-    def __init__(self, detection_model: tf_python.saved_model) -> None:
+    def __init__(self, detection_model: tf_python.saved_model, resolution: int = 320) -> None:
         self.model = detection_model
+        self.resolution = (resolution, resolution)
+        self.batching = True
 
     def __preprocess_image(self, img: np.ndarray) -> tuple[np.ndarray, tf_python.framework.ops.EagerTensor]:
         """
@@ -27,8 +32,8 @@ class ObjectDetector:
 
             :return: input image and tensor for object detection model
         """
-        img = cv2.resize(img, (320, 320)) #* 255
-        # img = img.astype(np.uint8)
+        if img.shape[1] != self.resolution[0] or img.shape[0] != self.resolution[1]:
+            img = cv2.resize(img, self.resolution)
         input_tensor = tf.convert_to_tensor(img)
 
         # The model expects a batch of images, so add an axis with `tf.newaxis`.
@@ -43,4 +48,81 @@ class ObjectDetector:
             :return:input image and detections
         """
         img, input_tensor = self.__preprocess_image(img)
-        return img, self.model(input_tensor)
\ No newline at end of file
+        return img, self.model(input_tensor)
+
+    def __preprocess_batch(self, imgs) -> np.ndarray:
+        """
+        Prepares images for processing by stacking them into one array, only images with different resolution
+        than required by the model are resized
+
+            :param imgs: list of images or stacked array of images
+
+            :return: stacked images in model resolution
+        """
+        width, height = self.resolution
+        if isinstance(imgs, np.ndarray) and imgs.shape[1:3] == (height, width):
+            return imgs
+
+        batch = np.empty((len(imgs), height, width, imgs[0].shape[2]), imgs[0].dtype)
+        for i, img in enumerate(imgs):
+            if img.shape[0] == height and img.shape[1] == width:
+                batch[i] = img
+            else:
+                cv2.resize(img, self.resolution, dst=batch[i])
+
+        return batch
+
+    @staticmethod
+    def __split_batch(detections: dict, n: int, threshold: float) -> list[dict]:
+        """
+        Converts model output to numpy and splits it per image, keeping only detections with high enough score
+
+            :param detections: output of the model for a batch of images
+            :param n: number of images
+            :param threshold: minimal detection probability, detections with lower or equal score are dropped
+
+            :return: detection boxes, classes and scores of every image
+        """
+        scores = np.asarray(detections['detection_scores'])[:n]
+        boxes = np.asarray(detections['detection_boxes'])[:n]
+        classes = np.asarray(detections['detection_classes'])[:n]
+        keep = scores > threshold
+
+        return [{"detection_boxes": boxes[i][keep[i]], "detection_classes": classes[i][keep[i]],
+                 "detection_scores": scores[i][keep[i]]} for i in range(n)]
+
+    def predict_batch(self, imgs, threshold: float = 0.0, pad_to: int = None) -> list[dict]:
+        """
+        Detect objects in multiple images with one model call, falls back to processing images one by one
+        if model does not accept batches (Object Detection API models are often exported with batch size 1)
+
+            :param imgs: images for object detection, list or stacked array, e.g. consecutive frames or frames of
+                different streams
+            :param threshold: minimal detection probability, detections with lower or equal score are dropped
+            :param pad_to: batch size to which smaller (e.g. final) batches are padded, so model is always called
+                with the same input shape
+
+            :return: numpy arrays with detection boxes (relative [ymin, xmin, ymax, xmax]), classes and scores
+                of every image
+        """
+        n = len(imgs)
+        if n == 0:
+            return []
+        if not self.batching:
+            return [self.__split_batch(self.predict(img)[1], 1, threshold)[0] for img in imgs]
+
+        batch = self.__preprocess_batch(imgs)
+        if pad_to is not None and n < pad_to:  # repeat last image, its detections are dropped
+            batch = np.concatenate([batch, np.repeat(batch[-1:], pad_to - n, axis=0)])
+
+        try:
+            detections = self.model(tf.convert_to_tensor(batch))
+            if any(value.shape[0] != len(batch) for value in detections.values()):
+                raise ValueError("Model returned detections for different number of images")
+        except (tf.errors.InvalidArgumentError, ValueError):  # model exported with fixed batch size
+            if len(batch) == 1:
+                raise
+            self.batching = False
+            return self.predict_batch(imgs, threshold)
+
+        return self.__split_batch(detections, n, threshold)
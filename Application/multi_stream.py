@@ -0,0 +1,156 @@
+from __future__ import annotations
+from contextlib import ExitStack
+import itertools
+import time
+import tensorflow as tf
+from models.model_loader import ModelLoader
+from system_handler import SystemHandler
+from stage_profiler import StageProfiler
+
+
+class MultiStreamRunner:
+    """
+    Processes several videos at once with one set of loaded models. Every stream has its own tracker, distance
+    regressor, schedulers, reader and recorder, while object detection and depth estimation are run for frames
+    of all streams in one batch.
+
+        Parameters
+        ----------
+            model_loader : Object with models loaded from disk
+            max_cosine_distance : maximal cosine distance for object association
+            max_age : number of frames after track will be deleted
+            disnet_engine : "keras" or "numpy", engine used for distance estimation model inference
+
+        Attributes
+        ----------
+            handler : handler owning model instances shared by all streams, its config and use_* flags are copied
+                to every stream
+            config : config of all streams, same keys as SystemHandler.config
+            streams : handlers of streams processed by the last call of process_videos
+            profiler : per-frame timings of batched stages, enabled with config["profile"]
+    """
+    def __init__(self, model_loader: ModelLoader, max_cosine_distance: float = 0.5, max_age: int = 5,
+                 disnet_engine: str = "keras") -> None:
+        self.model_loader = model_loader
+        self.max_cosine_distance = max_cosine_distance
+        self.max_age = max_age
+
+        self.handler = SystemHandler(model_loader, max_cosine_distance, max_age, disnet_engine)
+        self.config = self.handler.config
+        self.config["display_image"] = False  # one window per stream is rarely wanted
+        self.streams = []
+        self.profiler = StageProfiler()
+
+    def create_stream(self) -> SystemHandler:
+        """
+        Creates handler for one stream, sharing model instances with other streams
+
+            :return: handler with its own tracker and distance regressor
+        """
+        stream = SystemHandler(self.model_loader, self.max_cosine_distance, self.max_age, shared=self.handler)
+        stream.config = dict(self.config)
+        stream.od_threshold = self.handler.od_threshold
+        stream.use_midas = self.handler.use_midas
+        stream.use_disnet = self.handler.use_disnet
+        stream.use_deepsort = self.handler.use_deepsort
+        stream.reset_video_state()
+
+        return stream
+
+    def process_videos(self, paths: list[str], out_paths: list[str], disp_res: int) -> dict:
+        """
+        Main loop for processing multiple videos, frames with the same index are processed together,
+        streams which ended are dropped from the batch
+
+            :param paths: paths to video files
+            :param out_paths: paths for output video files, one for each input
+            :param disp_res: resolution for displayed video, assumed to be square
+
+            :return: number of processed frames, processing time and aggregate fps
+        """
+        self.streams = [self.create_stream() for _ in paths]
+        self.profiler.enabled = self.config["profile"]
+        self.profiler.reset()
+
+        frames_processed = 0
+        start = time.perf_counter()
+
+        with ExitStack() as stack:
+            videos, outs = [], []
+            for stream, path, out_path in zip(self.streams, paths, out_paths):
+                video = stack.enter_context(stream.create_reader(path, disp_res))
+                if not video:  # stream failed to open, nothing is recorded for it
+                    print(f"Could not open {path}, skipping it")
+                    videos.append(None)
+                    outs.append(None)
+                    continue
+                video.window = path
+                videos.append(video)
+                outs.append(stack.enter_context(stream.create_recorder(out_path, disp_res)))
+
+            active = [i for i, video in enumerate(videos) if video is not None]
+
+            with tf.device("/device:GPU:0"):
+                for frame_number in itertools.count():
+                    self.profiler.frame(frame_number)
+
+                    frames = {}
+                    for i in active:
+                        self.streams[i].profiler.frame(frame_number)
+                        with self.streams[i].profiler.stage("read"):
+                            ret, frame = videos[i].read_frame()
+                        if not ret:
+                            frames[i] = frame
+                    active = list(frames)
+                    if not active:  # all streams ended
+                        break
+
+                    interrupted = self.__process_batch(active, frames, videos, outs)
+                    frames_processed += len(active)
+                    if interrupted:
+                        break
+
+        for stream, out_path in zip(self.streams, out_paths):
+            if stream.profiler.enabled:
+                stream.profiler.dump(f"{out_path}_timings.csv")
+        if self.profiler.enabled:
+            print(self.profiler.summary())
+
+        elapsed = time.perf_counter() - start
+        return {"frames": frames_processed, "seconds": elapsed, "fps": frames_processed / max(elapsed, 1e-9)}
+
+    def __process_batch(self, active: list[int], frames: dict, videos: list, outs: list) -> bool:
+        """
+        Processes current frames of active streams
+
+            :return: True if user interrupt
+        """
+        streams = self.streams
+
+        # detector is run only for streams whose tracks can not be propagated
+        detect = [i for i in active if streams[i]._detection_needed()]
+        with self.profiler.stage("detection_batch"):
+            detections = self.handler.detector.predict_batch([frames[i] for i in detect], self.handler.od_threshold)
+        detections = dict(zip(detect, detections))
+
+        results = {i: streams[i]._process_detections(frames[i], videos[i], detections.get(i)) for i in active}
+
+        estimate = [i for i in active if streams[i]._depth_needed(frames[i], results[i][2], results[i][0])]
+        with self.profiler.stage("depth_batch"):
+            depths = self.handler.midas.predict_batch([frames[i] for i in estimate],
+                                                      [videos[i].get_frame("depth") for i in estimate],
+                                                      raw=self.handler._record_depth())
+        depths = dict(zip(estimate, depths))
+
+        interrupted = False
+        for i in active:
+            stream = streams[i]
+            ids, boxes, classes, scores = results[i]
+
+            with stream.profiler.stage("depth"):
+                depth_frame, inv_rel_depth = stream._process_depth(videos[i], frames[i], classes, depths.get(i), ids)
+
+            interrupted |= stream._process_outputs(videos[i], outs[i], ids, boxes, classes, scores, inv_rel_depth,
+                                                   stream.annotation_needed())
+
+        return interrupted
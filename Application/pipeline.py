@@ -0,0 +1,204 @@
+from __future__ import annotations
+from typing import Callable, Iterator, Optional
+import queue
+import threading
+import numpy as np
+
+
+class FramePacket:
+    """
+    Container for all data produced for a single frame while it travels through the pipeline
+
+        Parameters
+        ----------
+            index : number of the frame in the video
+            frame : frame resized to object detection resolution
+            raw : frame as read from the video file
+            frame_t : time of read frame
+
+        Attributes
+        ----------
+            index : number of the frame in the video
+            frame : frame resized to object detection resolution
+            frame_t : time of read frame
+            frames : frames at different stages, same keys as in VideoReader
+            results : outputs of the pipeline stages
+            info : per-frame metadata logged with the frame, same contract as in VideoReader
+    """
+    def __init__(self, index: int, frame: np.ndarray, raw: np.ndarray, frame_t: float) -> None:
+        self.index = index
+        self.frame = frame
+        self.frame_t = frame_t
+        self.frames = {"raw": raw, "annotated": None, "alpha_record": None, "detection": frame, "depth": None,
+                       "depth_record": None}
+        self.results = {}
+        self.info = {}
+
+    def set_frame(self, frame: np.ndarray, key: str) -> None:
+        """
+        Same contract as VideoReader.set_frame, so stages can be run on a packet instead of a reader
+
+            :param frame: frame to be stored
+            :param key: stage of the frame
+        """
+        self.frames[key] = frame
+
+    def get_frame(self, key: str) -> np.ndarray:
+        """
+        Same contract as VideoReader.get_frame
+
+            :param key: stage of the frame
+
+            :return: stored frame
+        """
+        return self.frames[key]
+
+    def set_info(self, value, key: str) -> None:
+        """
+        Same contract as VideoReader.set_info
+
+            :param value: metadata to be stored
+            :param key: name of the metadata
+        """
+        self.info[key] = value
+
+    def get_info(self, key: str, default=None):
+        """
+        Same contract as VideoReader.get_info
+
+            :param key: name of the metadata
+            :param default: returned if metadata was not set for the frame
+
+            :return: stored metadata
+        """
+        return self.info.get(key, default)
+
+
+class StagePipeline:
+    """
+    Runs consecutive processing stages in separate worker threads connected by bounded queues.
+    Every stage is handled by exactly one thread, so frames leave the pipeline in the same order they entered it
+    and stateful stages (tracker, regressor) see frames in the same order as in the sequential loop.
+
+        Parameters
+        ----------
+            source : callable returning next FramePacket, or None when there are no more frames
+            stages : callables processing FramePacket in place, executed in given order
+            queue_size : maximal number of frames waiting between two stages
+            worker_context : optional factory of context manager entered by every worker thread (e.g. tf.device)
+
+        Attributes
+        ----------
+            error : first exception raised by any of the workers
+    """
+    _END = object()
+
+    def __init__(self, source: Callable[[], Optional[FramePacket]], stages: list[Callable[[FramePacket], None]],
+                 queue_size: int = 2, worker_context: Optional[Callable] = None) -> None:
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self.worker_context = worker_context
+
+        self.error = None
+        self._stop = threading.Event()
+        self._queues = []
+        self._threads = []
+
+    def __put(self, q: queue.Queue, item) -> bool:
+        """
+        Blocking put, which can be interrupted by stopping the pipeline
+
+            :return: True if item was put into the queue
+        """
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __get(self, q: queue.Queue):
+        """
+        Blocking get, which can be interrupted by stopping the pipeline
+        """
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return self._END
+
+    def __run_worker(self, work: Callable, q_in: Optional[queue.Queue], q_out: queue.Queue) -> None:
+        """
+        Worker loop: takes packet from input queue (or from source), processes it and passes it further
+        """
+        try:
+            if self.worker_context is not None:
+                with self.worker_context():
+                    self.__loop(work, q_in, q_out)
+            else:
+                self.__loop(work, q_in, q_out)
+        except Exception as e:  # stop whole pipeline, error is re-raised in consumer thread
+            if self.error is None:
+                self.error = e
+            self._stop.set()
+        finally:
+            self.__put(q_out, self._END)
+
+    def __loop(self, work: Callable, q_in: Optional[queue.Queue], q_out: queue.Queue) -> None:
+        while not self._stop.is_set():
+            if q_in is None:
+                packet = work()
+                if packet is None:
+                    break
+            else:
+                packet = self.__get(q_in)
+                if packet is self._END:
+                    break
+                work(packet)
+
+            if not self.__put(q_out, packet):
+                break
+
+    def start(self) -> None:
+        """
+        Starts source and stage workers
+        """
+        self._queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        workers = [(self.source, None, self._queues[0])]
+        workers += [(stage, self._queues[i], self._queues[i + 1]) for i, stage in enumerate(self.stages)]
+
+        self._threads = [threading.Thread(target=self.__run_worker, args=worker, daemon=True) for worker in workers]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops all workers and waits for them to finish
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def __iter__(self) -> Iterator[FramePacket]:
+        """
+        Yields fully processed packets in frame order, last stage (display, writing) is run by the consumer
+        """
+        while True:
+            packet = self.__get(self._queues[-1])
+            if packet is self._END:
+                break
+            yield packet
+
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self) -> StagePipeline:
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
@@ -3,6 +3,7 @@ import open3d as o3d
 import numpy as np
 import time
 import pandas as pd
+from back_projection import BackProjector
 
 
 
@@ -14,6 +15,7 @@ class PointCloudBase(ABC):
         self.intercept = intercept[0]
 
         self.pinhole_camera_intrinsic = o3d.camera.PinholeCameraIntrinsic(*params)
+        self.back_projector = BackProjector(params)
 
     @abstractmethod
     def __read_data(self):
@@ -27,35 +29,26 @@ class PointCloudBase(ABC):
     def __exit__(self):
         pass
 
-    def __get_point_cloud(self):
+    def __get_point_cloud(self, pcd=None):
         """
+        Back-projects current frames
 
-        :param rgb:
-        :param depth:
-        :return:
+        :param pcd: point cloud whose points are replaced, new point cloud is created if None
+        :return: point cloud already flipped to view coordinates
         """
-        depth = self.depth_frame[::, ::, 0] * self.coe + self.intercept
-        # This is in meters, technically should be converted to mm but it seems to wrok the same
-
-        # convert bgr to rgb
-        rgb = self.rgb_frame.copy()
-        rgb[::, ::, 0] = self.rgb_frame[::, ::, 2]
-        rgb[::, ::, 2] = self.rgb_frame[::, ::, 0]
-
-        o3d_rgb = o3d.geometry.Image(rgb)
-        o3d_a = o3d.geometry.Image(depth.astype(np.float32))
+        # depth * coe + intercept is in meters, technically should be converted to mm but it seems to wrok the same
+        points, colors = self.back_projector.project(self.depth_frame, self.rgb_frame, self.coe, self.intercept)
 
-        rgbd = o3d.geometry.RGBDImage.create_from_color_and_depth(o3d_rgb, o3d_a, convert_rgb_to_intensity=False, depth_scale=1.0, depth_trunc=1000.0)
-
-        pcd = o3d.geometry.PointCloud.create_from_rgbd_image(rgbd, self.pinhole_camera_intrinsic)
+        # float64 arrays are converted by open3d with a single copy
+        if pcd is None:
+            pcd = o3d.geometry.PointCloud()
+        pcd.points = o3d.utility.Vector3dVector(points)
+        pcd.colors = o3d.utility.Vector3dVector(colors)
 
         return pcd
 
-    def __prepare_point_cloud(self):
-        pcd = self.__get_point_cloud()
-
-        flip_transform = [[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, -1, 0], [0, 0, 0, 1]]
-        pcd.transform(flip_transform)
+    def __prepare_point_cloud(self, pcd=None):
+        pcd = self.__get_point_cloud(pcd)  # flip transform is folded into the back-projection
 
         # pcd = pcd.uniform_down_sample(every_k_points=2)
 
@@ -75,10 +68,8 @@ class PointCloudBase(ABC):
         else:
             self.__read_data()
             if self.ret:
-                pcd = self.__prepare_point_cloud()
+                self.__prepare_point_cloud(self.pcd)  # displayed point cloud is updated in place, not copied from a new one
 
-                self.pcd.points = pcd.points
-                self.pcd.colors = pcd.colors
                 v.update_geometry(self.pcd)
                 v.register_animation_callback(self.update_view_callback)
                 # self.frame_num += 1 TODO only in video reader
@@ -0,0 +1,260 @@
+"""
+Headless export of point clouds of whole videos, one file per frame, without open3d or a display.
+
+Exports a recording (colour video and depth video or DepthStore, with the log written by VideoRecorder).
+Run from the Application directory:
+    python point_cloud_export.py output/rgb.mp4 output/depth --params 320 320 320 320 160 160 --format npz
+
+Point clouds of a running SystemHandler.process_video are exported with config["export_point_clouds"].
+"""
+from __future__ import annotations
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+import cv2
+import numpy as np
+import pandas as pd
+from back_projection import BackProjector
+from depth_store import DepthStoreReader, is_depth_store
+from log_writer import load_log, frame_coefficients
+
+FORMATS = ("ply", "npz")
+
+
+def write_ply(path: str, points: np.ndarray, colors: np.ndarray, comments: Optional[dict] = None) -> None:
+    """
+    Writes binary little endian PLY file with float32 coordinates and uint8 colors
+
+        :param path: path of the file
+        :param points: point coordinates, shape (n, 3)
+        :param colors: RGB colors of the points, uint8, shape (n, 3)
+        :param comments: values written as header comments, e.g. frame metadata
+    """
+    vertices = np.empty(len(points), [("x", "<f4"), ("y", "<f4"), ("z", "<f4"),
+                                      ("red", "u1"), ("green", "u1"), ("blue", "u1")])
+    vertices["x"], vertices["y"], vertices["z"] = points.T
+    vertices["red"], vertices["green"], vertices["blue"] = colors.T
+
+    header = ["ply", "format binary_little_endian 1.0"]
+    header += [f"comment {key} {value}" for key, value in (comments or {}).items()]
+    header += [f"element vertex {len(points)}",
+               "property float x", "property float y", "property float z",
+               "property uchar red", "property uchar green", "property uchar blue", "end_header"]
+
+    with open(path, "wb") as f:
+        f.write(("\n".join(header) + "\n").encode("ascii"))
+        vertices.tofile(f)
+
+
+def write_npz(path: str, points: np.ndarray, colors: np.ndarray, comments: Optional[dict] = None,
+              arrays: Optional[dict] = None) -> None:
+    """
+    Writes compressed npz file with float32 "points" and uint8 "colors"
+
+        :param path: path of the file
+        :param points: point coordinates, shape (n, 3)
+        :param colors: RGB colors of the points, uint8, shape (n, 3)
+        :param comments: scalar metadata saved as 0-d arrays
+        :param arrays: additional arrays, e.g. detections of the frame
+    """
+    metadata = {key: np.asarray(value) for key, value in (comments or {}).items()}
+    np.savez_compressed(path, points=points.astype(np.float32, copy=False), colors=colors, **metadata,
+                        **(arrays or {}))
+
+
+class PointCloudExporter:
+    """
+    Back-projects frames and writes point cloud of every frame to a separate file. Frames are back-projected in
+    the calling thread and files are encoded and written by a pool of threads, at most max_pending frames wait
+    for writing, so memory use is bounded and the caller is slowed down when disk can not keep up.
+
+        Parameters
+        ----------
+            directory : directory for point cloud files
+            params : width, height, focal_h, focal_v, center_x, center_y of the camera
+            file_format : "ply" - binary PLY, or "npz" - compressed numpy archive with frame metadata and detections
+            workers : number of writing threads
+            max_pending : maximal number of frames waiting for writing, 2 * workers by default
+            max_depth : points farther than max_depth are dropped
+
+        Attributes
+        ----------
+            back_projector : engine converting depth to points
+            index : one row per written frame - frame number, file name, number of points and metadata
+    """
+    def __init__(self, directory: str, params: list[int, int, float, float, float, float], file_format: str = "ply",
+                 workers: int = 4, max_pending: Optional[int] = None, max_depth: float = 1000.0) -> None:
+        if file_format not in FORMATS:
+            print(f"Unknown point cloud format {file_format}, using ply")
+            file_format = "ply"
+
+        self.directory = directory
+        self.file_format = file_format
+        self.workers = max(workers, 1)
+        self.max_pending = max_pending or 2 * self.workers
+        self.back_projector = BackProjector(params, max_depth)
+        self.index = []
+        self._pool = None
+        self._pending = deque()
+
+    def open(self) -> PointCloudExporter:
+        os.makedirs(self.directory, exist_ok=True)
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="point_cloud_export")
+        return self
+
+    def export(self, frame: int, bgr: np.ndarray, depth: np.ndarray, coe: float = 1.0, intercept: float = 0.0,
+               metadata: Optional[dict] = None, arrays: Optional[dict] = None) -> None:
+        """
+        Back-projects a frame and queues its point cloud for writing
+
+            :param frame: number of the frame, used in file name
+            :param bgr: color frame in BGR order, same resolution as depth
+            :param depth: depth frame, single channel or the first channel is used, e.g. alpha_record frame
+            :param coe: coefficient converting depth to meters
+            :param intercept: intercept converting depth to meters
+            :param metadata: scalar metadata of the frame, written to the file and the index
+            :param arrays: arrays saved with the point cloud in npz format, e.g. detections of the frame
+        """
+        points, colors = self.back_projector.project(depth, bgr, coe, intercept, byte_colors=True)
+        # preallocated arrays are reused by the next frame, writer gets its own copies
+        points, colors = points.astype(np.float32), colors.copy()
+
+        while len(self._pending) >= self.max_pending:  # backpressure, also raises errors of finished writes
+            self._pending.popleft().result()
+
+        name = f"{frame:06d}.{self.file_format}"
+        metadata = {"frame": frame, "coef": coe, "intercept": intercept, **(metadata or {})}
+        path = os.path.join(self.directory, name)
+        if self.file_format == "ply":
+            self._pending.append(self._pool.submit(write_ply, path, points, colors, metadata))
+        else:
+            self._pending.append(self._pool.submit(write_npz, path, points, colors, metadata, arrays))
+
+        self.index.append({**metadata, "file": name, "points": len(points)})
+
+    def close(self, raise_error: bool = True) -> None:
+        """
+        Waits for all writes and saves the index of written frames
+
+            :param raise_error: re-raise errors of writing threads, e.g. False when another exception is handled
+        """
+        if self._pool is None:
+            return
+        try:
+            while self._pending:
+                error = self._pending.popleft().exception()
+                if raise_error and error is not None:
+                    raise error
+        finally:
+            self._pool.shutdown()
+            self._pool = None
+            pd.DataFrame(self.index).to_csv(os.path.join(self.directory, "index.csv"), index=False)
+
+    def __enter__(self) -> PointCloudExporter:
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close(raise_error=exc_type is None)
+
+
+def read_recording(rgb: str, depth: str) -> Iterator[tuple[int, np.ndarray, np.ndarray, float, float, pd.Series]]:
+    """
+    Reads frames of a recording with depth converted to the resolution of colour frames
+
+        :param rgb: path to recorded video with colors
+        :param depth: path to recorded depth video, or recording path without extension if depth store exists
+
+        :return: generator of frame number, BGR frame, depth frame, coefficient, intercept and row of the log
+    """
+    recording = os.path.splitext(depth)[0]
+    log = load_log(recording)
+    coefficients = frame_coefficients(log)
+    store = DepthStoreReader(recording) if is_depth_store(recording) else None
+
+    rgb_cap = cv2.VideoCapture(rgb)
+    depth_cap = None if store is not None else cv2.VideoCapture(depth)
+    try:
+        for frame in range(len(log)):
+            ret, bgr = rgb_cap.read()
+            if not ret:
+                return
+
+            coe, intercept = coefficients[frame]
+            if store is None:
+                ret, depth_frame = depth_cap.read()
+                if not ret:
+                    return
+                depth_frame = depth_frame[..., 0]
+            else:
+                if frame >= len(store):
+                    return
+                depth_frame = store[frame]
+                if store.coefficients["metric"][frame]:  # already in meters
+                    coe, intercept = 1.0, 0.0
+
+            if depth_frame.shape != bgr.shape[:2]:
+                depth_frame = cv2.resize(depth_frame.astype(np.float32), bgr.shape[1::-1],
+                                         interpolation=cv2.INTER_LINEAR)
+
+            yield frame, bgr, depth_frame, float(coe), float(intercept), log.iloc[frame]
+    finally:
+        rgb_cap.release()
+        if depth_cap is not None:
+            depth_cap.release()
+
+
+def export_recording(rgb: str, depth: str, directory: str, params: list[int, int, float, float, float, float],
+                     file_format: str = "ply", workers: int = 4) -> pd.DataFrame:
+    """
+    Exports point cloud of every frame of a recording, frames before the first regression fit use its
+    coefficients, recordings without any fit can not be exported
+
+        :param rgb: path to recorded video with colors
+        :param depth: path to recorded depth video, or recording path without extension if depth store exists
+        :param directory: directory for point cloud files
+        :param params: width, height, focal_h, focal_v, center_x, center_y of the camera
+        :param file_format: "ply" or "npz"
+        :param workers: number of writing threads
+
+        :return: index of written frames
+    """
+    recording = os.path.splitext(depth)[0]
+    detections = load_log(recording, "detections")
+    starts = np.searchsorted(detections["frame"].to_numpy(), np.arange(len(load_log(recording)) + 1))
+
+    with PointCloudExporter(directory, params, file_format, workers) as exporter:
+        for frame, bgr, depth_frame, coe, intercept, row in read_recording(rgb, depth):
+            if np.isnan(coe):
+                raise ValueError(f"Distance regression was never fitted in {recording}")
+
+            metadata = {"fitted": bool(row["fitted"]), "detections": int(row["detections"]),
+                        "depth_keyframe": bool(row["depth_keyframe"]),
+                        "detection_keyframe": bool(row["detection_keyframe"])}
+            frame_detections = detections.iloc[starts[frame]:starts[frame + 1]]
+            arrays = {f"detection_{column}": frame_detections[column].to_numpy()
+                      for column in detections.columns if column not in ("frame", "detection")}
+            exporter.export(frame, bgr, depth_frame, coe, intercept, metadata, arrays)
+
+    return pd.DataFrame(exporter.index)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Headless point cloud export of a recording")
+    parser.add_argument("rgb", help="Recorded video with colors.")
+    parser.add_argument("depth", help="Recorded depth video, or recording path without extension with depth store.")
+    parser.add_argument("--params", type=float, nargs=6, required=True,
+                        metavar=("WIDTH", "HEIGHT", "FOCAL_H", "FOCAL_V", "CENTER_X", "CENTER_Y"))
+    parser.add_argument("--output-dir", default=None, help="Directory for point clouds, depth_point_clouds by default.")
+    parser.add_argument("--format", choices=FORMATS, default="ply")
+    parser.add_argument("--workers", type=int, default=4, help="Threads writing point cloud files.")
+    args = parser.parse_args()
+
+    directory = args.output_dir or f"{os.path.splitext(args.depth)[0]}_point_clouds"
+    index = export_recording(args.rgb, args.depth, directory, args.params, args.format, args.workers)
+    print(f"{len(index)} point clouds with {index['points'].sum() if len(index) else 0} points saved to {directory}")
+
+
+if __name__ == "__main__":
+    main()
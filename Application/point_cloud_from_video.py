@@ -1,25 +1,47 @@
 import open3d as o3d
+import os
 import cv2
 import numpy as np
 import time
-import pandas as pd
+from log_writer import load_log, frame_coefficients
+from depth_store import DepthStoreReader, is_depth_store
 from point_cloud_base import PointCloudBase
 
 
 class PointCloudFromVideo(PointCloudBase):
     """
+    Point cloud of a recorded video. If depth was recorded by DepthStore it is read from memory-mapped store
+    without decoding and quantization, otherwise it is decoded from recorded alpha_record video.
 
+        Parameters
+        ----------
+            rgb : path to recorded video with colors
+            depth : path to recorded depth video, or recording path without extension if depth store exists
+            params : width, height, focal_h, focal_v, center_x, center_y of the camera
+
+        Attributes
+        ----------
+            log : per-frame log of the depth recording
+            depth_store : reader of lossless depth, None if depth is decoded from video
+            coefficients : distance regression coefficient and intercept for every frame of the log, the latest
+                fitted ones are used for frames without fit
     """
     def __init__(self, rgb: str, depth: str, params: list[int, int, float, float, float, float]) -> None:
-        super().__init__(params)
         self.rgb_path = rgb
         self.depth_path = depth
-        log_path = f"{depth[:-4]}.pickle"
-        self.log = pd.read_pickle(log_path)
+        recording = os.path.splitext(depth)[0]
+        self.log = load_log(recording)
+        self.depth_store = DepthStoreReader(recording) if is_depth_store(recording) else None
+
+        self.coefficients = frame_coefficients(self.log)
+        if np.isnan(self.coefficients[:, 0]).all():
+            raise ValueError(f"Distance regression was never fitted in {recording}")
+
+        super().__init__(params, [[self.coefficients[0, 0]]], [self.coefficients[0, 1]])
 
     def __enter__(self):
         self.cap1 = cv2.VideoCapture(self.rgb_path)
-        self.cap2 = cv2.VideoCapture(self.depth_path)
+        self.cap2 = None if self.depth_store is not None else cv2.VideoCapture(self.depth_path)
         self.frame_num = 0
 
         return self
@@ -29,18 +51,33 @@ class PointCloudFromVideo(PointCloudBase):
         Method for clean exit
         """
         self.cap1.release()
-        self.cap2.release()
+        if self.cap2 is not None:
+            self.cap2.release()
 
     def _PointCloudBase__read_data(self):
         ret1, self.rgb_frame = self.cap1.read()
-        ret2, self.depth_frame = self.cap2.read()
+        index = min(self.frame_num, len(self.coefficients) - 1)
+        self.coe, self.intercept = self.coefficients[index]
+
+        if self.depth_store is None:
+            ret2, self.depth_frame = self.cap2.read()
+        else:
+            ret2 = self.frame_num < len(self.depth_store)
+            if ret1 and ret2:
+                self.__read_stored_depth()
 
         self.ret = ret1 and ret2
 
+    def __read_stored_depth(self):
+        depth = self.depth_store[self.frame_num]
+        if self.depth_store.coefficients["metric"][self.frame_num]:  # already in meters
+            self.coe, self.intercept = 1.0, 0.0
+
+        height, width = self.rgb_frame.shape[:2]
+        if depth.shape != (height, width):
+            depth = cv2.resize(depth.astype(np.float32), (width, height), interpolation=cv2.INTER_LINEAR)
+        self.depth_frame = depth[..., None]
+
     def update_view_callback(self, v):
         super().update_view_callback(v)
         self.frame_num += 1
-
-
-
-
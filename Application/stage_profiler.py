@@ -0,0 +1,148 @@
+from __future__ import annotations
+from collections import deque
+import csv
+import threading
+import time
+import numpy as np
+
+
+class _StageTimer:
+    """
+    Context manager measuring wall time of a single stage execution
+    """
+    def __init__(self, profiler: StageProfiler, name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> _StageTimer:
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+class _DisabledTimer:
+    """
+    No-op context manager used when profiling is switched off
+    """
+    def __enter__(self) -> _DisabledTimer:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        pass
+
+
+_DISABLED_TIMER = _DisabledTimer()
+
+
+class StageProfiler:
+    """
+    Records per-frame wall time of the processing stages
+
+        Parameters
+        ----------
+            enabled : record timings or not, when disabled timing calls are no-ops
+            window : number of last frames used for rolling percentiles
+
+        Attributes
+        ----------
+            enabled : record timings or not
+            window : number of last frames used for rolling percentiles
+            timings : per frame timings, frame number -> stage name -> seconds
+            recent : last timings of every stage, stage name -> deque of seconds
+    """
+    def __init__(self, enabled: bool = False, window: int = 300) -> None:
+        self.enabled = enabled
+        self.window = window
+
+        self._local = threading.local()  # current frame is set separately by every pipeline worker
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Removes all recorded timings
+        """
+        with self._lock:
+            self.timings = {}
+            self.recent = {}
+            self._stages = []
+
+    def frame(self, index: int) -> None:
+        """
+        Sets frame to which timings recorded by calling thread are assigned
+
+            :param index: number of the frame
+        """
+        self._local.frame = index
+
+    def stage(self, name: str):
+        """
+        Returns context manager measuring stage wall time
+
+            :param name: name of the stage
+
+            :return: context manager, no-op if profiler is disabled
+        """
+        if not self.enabled:
+            return _DISABLED_TIMER
+        return _StageTimer(self, name)
+
+    def record(self, name: str, seconds: float, frame: int = None) -> None:
+        """
+        Stores stage timing, timings of the same stage and frame are summed up
+
+            :param name: name of the stage
+            :param seconds: measured wall time
+            :param frame: number of the frame, current frame of calling thread if None
+        """
+        if frame is None:
+            frame = getattr(self._local, "frame", 0)
+
+        with self._lock:
+            if name not in self.recent:
+                self.recent[name] = deque(maxlen=self.window)
+                self._stages.append(name)
+            frame_timings = self.timings.setdefault(frame, {})
+            frame_timings[name] = frame_timings.get(name, 0) + seconds
+            self.recent[name].append(seconds)
+
+    def percentiles(self, percentiles: tuple[int, ...] = (50, 95, 99)) -> dict[str, dict[str, float]]:
+        """
+        Rolling percentiles of stage wall times over last frames
+
+            :param percentiles: percentiles to be computed
+
+            :return: stage name -> {"p50": milliseconds, ...}
+        """
+        with self._lock:
+            recent = {name: np.array(values) for name, values in self.recent.items()}
+
+        return {name: {f"p{p}": float(np.percentile(values, p)) * 1000 for p in percentiles}
+                for name, values in recent.items() if len(values) > 0}
+
+    def summary(self) -> str:
+        """
+        Human readable table of rolling percentiles
+        """
+        lines = [f"{'stage':<12}{'p50 [ms]':>10}{'p95 [ms]':>10}{'p99 [ms]':>10}"]
+        for name, p in self.percentiles().items():
+            lines.append(f"{name:<12}{p['p50']:>10.2f}{p['p95']:>10.2f}{p['p99']:>10.2f}")
+        return "\n".join(lines)
+
+    def dump(self, path: str) -> None:
+        """
+        Saves per-frame timings as csv file, one row per frame, one column per stage in seconds
+
+            :param path: path to csv file
+        """
+        with self._lock:
+            stages = list(self._stages)
+            rows = [[frame] + [timings.get(name, "") for name in stages]
+                    for frame, timings in sorted(self.timings.items())]
+
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame"] + stages)
+            writer.writerows(rows)
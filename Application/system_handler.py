@@ -1,3 +1,5 @@
+from __future__ import annotations
+from typing import Optional
 from models.midas.midas import MiDas
 from models.dis_net.dis_net import DisNet
 from models.object_detector.object_detector import ObjectDetector
@@ -7,16 +9,24 @@ from video_reader import VideoReader
 import tensorflow as tf
 import numpy as np
 import cv2
+import itertools
 from video_recorder import VideoRecorder
+from point_cloud_export import PointCloudExporter
 from wrappers.detection_wrapper import DetectionWrapper
 from wrappers.distance_wrapper import DistanceWrapper
 from wrappers.point_cloud_wrapper import PointCloudWrapper
 from wrappers.depth_wrapper import DeothWrapper
 from wrappers.writer_wrapper import WriterWrapper
+from wrappers.pipeline_wrapper import PipelineWrapper
 from point_cloud_live import PointCloudLive
+from stage_profiler import StageProfiler
+from pipeline import FramePacket
+from depth_scheduler import DepthScheduler
+from detection_scheduler import DetectionScheduler
 
 
-class SystemHandler(DetectionWrapper, DistanceWrapper, DeothWrapper, PointCloudWrapper, WriterWrapper):
+class SystemHandler(DetectionWrapper, DistanceWrapper, DeothWrapper, PointCloudWrapper, WriterWrapper,
+                    PipelineWrapper):
     """
     This is the most upper lever handler of the system.
 
@@ -25,6 +35,8 @@ class SystemHandler(DetectionWrapper, DistanceWrapper, DeothWrapper, PointCloudW
             model_loader : Object with models loaded from disk
             max_cosine_distance : maximal cosine distance for object association
             max_age : number of frames after track will be deleted
+            disnet_engine : "keras" or "numpy", engine used for distance estimation model inference
+            shared : handler of another stream, its model instances are used instead of creating new ones
 
         Attributes
         ----------
@@ -43,15 +55,25 @@ class SystemHandler(DetectionWrapper, DistanceWrapper, DeothWrapper, PointCloudW
             alpha_blending :
 
             od_threshold : object detection probability threshold
+            profiler : per-frame stage timings, enabled with config["profile"]
+            depth_scheduler : decides on which frames depth is estimated, created from config for every video
+            detection_scheduler : decides on which frames objects are detected, created from config for every video
 
     """
-    def __init__(self, model_loader: ModelLoader, max_cosine_distance: float = 0.5, max_age: int = 5) -> None:
-        self.detector = ObjectDetector(model_loader.detection_model)
+    def __init__(self, model_loader: ModelLoader, max_cosine_distance: float = 0.5, max_age: int = 5,
+                 disnet_engine: str = "keras", shared: Optional[SystemHandler] = None) -> None:
         self.od_resolution = model_loader.od_resolution
-        self.disnet = DisNet(model_loader.distance_model)
-        self.midas = MiDas(model_loader.depth_model)
-        self.tracker = DeepSort(max_cosine_distance, max_age)
-        self.distance_regressor = model_loader.distance_regressor
+        if shared is None:
+            self.detector = ObjectDetector(model_loader.detection_model, self.od_resolution)
+            self.disnet = DisNet(model_loader.distance_model, disnet_engine, self.od_resolution)
+            self.midas = MiDas(model_loader.depth_model)
+            self.distance_regressor = model_loader.distance_regressor
+        else:  # another stream, only stateful objects are created
+            self.detector = shared.detector
+            self.disnet = shared.disnet
+            self.midas = shared.midas
+            self.distance_regressor = model_loader.create_distance_regressor()
+        self.tracker = DeepSort(max_cosine_distance, max_age, model_loader.box_encoder)
 
         self.use_midas = True  # maybe provide a parameter or getter/setter
         self.use_disnet = True  # maybe provide a parameter or getter/setter
@@ -61,11 +83,121 @@ class SystemHandler(DetectionWrapper, DistanceWrapper, DeothWrapper, PointCloudW
             "record_annotated": True,
             "record_alpha_blended": True,
             "display_image": True,
-            "return_depth": False
+            "return_depth": False,
+            "pipelined": False,  # run decoding, detection, depth and distance estimation in separate threads
+            "pipeline_queue_size": 2,  # maximal number of frames waiting between pipeline stages
+            "profile": False,  # record per-frame stage timings and save them next to output video
+            "prefetch": 0,  # number of frames decoded ahead in background thread, 0 to decode in main loop
+            "drop_oldest": False,  # drop frames not processed in time instead of waiting, for live sources
+            "skip_annotation": False,  # never annotate frames, annotation is also skipped if nothing displays/records it
+            "depth_mode": "always",  # always, interval, adaptive or on_demand - see DepthScheduler
+            "depth_interval": 5,  # distance between depth keyframes in interval mode
+            "depth_threshold": 8.0,  # frame difference triggering depth keyframe in adaptive mode
+            "depth_max_interval": 30,  # maximal distance between depth keyframes in adaptive and on_demand modes
+            "depth_warp": False,  # shift reused depth map by global motion between keyframes
+            "detection_interval": 1,  # maximal distance between frames with detection, tracks are predicted between
+            "detection_adaptive": True,  # detect earlier when tracks are tentative or uncertain
+            "detection_max_uncertainty": 0.15,  # track center std relative to its height triggering detection
+            "batch_size": 1,  # frames processed by models in one batch, >1 adds latency, detector runs on every frame
+            "video_codec": "MJPG",  # four character code of recorded video codec, e.g. mp4v or avc1 for smaller files
+            "video_container": "mp4",  # extension of recorded video file
+            "video_fps": 30,  # frame rate of recorded video
+            "async_write": False,  # encode recorded video in a background thread
+            "write_queue_size": 4,  # maximal number of frames waiting for encoding in async mode
+            "record_depth": False,  # save unquantized float16 depth of every frame, see DepthStore
+            "depth_record_units": "relative",  # relative or metric (converted to meters when regression is fitted)
+            "export_point_clouds": False,  # write point cloud of every frame with fitted regression, no display needed
+            "point_cloud_format": "ply",  # ply or npz (compressed, with frame metadata and detections)
+            "point_cloud_focal": None,  # camera focal length in pixels of detection resolution, None to use the resolution
+            "point_cloud_workers": 4  # threads writing point cloud files
         }  # maybe provide a parameter or getter/setter
 
+        self.profiler = StageProfiler()
+        self.depth_scheduler = self.create_depth_scheduler()
+        self.detection_scheduler = self.create_detection_scheduler()
+
         self.od_threshold = 0.6  # maybe provide a parameter or getter/setter
 
+    def create_depth_scheduler(self) -> DepthScheduler:
+        """
+        Creates depth scheduler from current config
+
+            :return: depth scheduler without any keyframe
+        """
+        return DepthScheduler(self.config["depth_mode"], self.config["depth_interval"],
+                              self.config["depth_threshold"], self.config["depth_max_interval"],
+                              known_classes=self.disnet.class_sizes.keys(), warp=self.config["depth_warp"])
+
+    def create_detection_scheduler(self) -> DetectionScheduler:
+        """
+        Creates detection scheduler from current config
+
+            :return: detection scheduler without any detection
+        """
+        return DetectionScheduler(self.config["detection_interval"], self.config["detection_adaptive"],
+                                  self.config["detection_max_uncertainty"])
+
+    def create_reader(self, path: str, disp_res: int) -> VideoReader:
+        """
+        Creates video reader providing frames in resolutions required by the models
+
+            :param path: path to video file
+            :param disp_res: resolution for displayed video, assumed to be square
+
+            :return: not opened video reader
+        """
+        reader = VideoReader(path, self.od_resolution, disp_res, self.config["prefetch"], self.config["drop_oldest"])
+        if self.use_midas:  # depth model input is resized directly from source frame
+            resolution = self.midas.input_resolution
+            reader.geometry.add_consumer("depth", (resolution, resolution), cv2.INTER_CUBIC)
+
+        return reader
+
+    def create_recorder(self, out_path: str, disp_res: int) -> VideoRecorder:
+        """
+        Creates video recorder with codec, container, writing mode, depth recording and point cloud export from
+        current config
+
+            :param out_path: path for output video file, without extension
+            :param disp_res: resolution of recorded video, assumed to be square
+
+            :return: not opened video recorder
+        """
+        depth_units = self.config["depth_record_units"] if self._record_depth() else None
+
+        point_clouds = None
+        if self.use_midas and self.config["export_point_clouds"]:
+            # point clouds are back-projected from frames in detection resolution
+            focal = self.config["point_cloud_focal"] or self.od_resolution
+            center = self.od_resolution / 2
+            point_clouds = PointCloudExporter(f"{out_path}_point_clouds",
+                                              [self.od_resolution, self.od_resolution, focal, focal, center, center],
+                                              self.config["point_cloud_format"], self.config["point_cloud_workers"])
+
+        return VideoRecorder(out_path, disp_res, codec=self.config["video_codec"],
+                             container=self.config["video_container"], fps=self.config["video_fps"],
+                             async_write=self.config["async_write"], queue_size=self.config["write_queue_size"],
+                             depth_units=depth_units, point_clouds=point_clouds)
+
+    def reset_video_state(self) -> None:
+        """
+        Prepares profiler and schedulers for a new video according to current config
+        """
+        self.profiler.enabled = self.config["profile"]
+        self.profiler.reset()
+        self.depth_scheduler = self.create_depth_scheduler()
+        self.detection_scheduler = self.create_detection_scheduler()
+
+    def annotation_needed(self) -> bool:
+        """
+        Checks if annotated frame is used by display or recording
+
+            :return: True if frames have to be annotated
+        """
+        if self.config["skip_annotation"]:
+            return False
+        return self.config["display_image"] or self.config["record_annotated"]
+
     def weighted_focal(self, focal_h, focal_v, scores, distances):
         focal_h = focal_h[distances != None]
         focal_v = focal_v[distances != None]
@@ -86,9 +218,11 @@ class SystemHandler(DetectionWrapper, DistanceWrapper, DeothWrapper, PointCloudW
         reader = VideoReader(path, self.od_resolution, disp_res)
         reader.set_frame(img, "raw")
 
+        self.detection_scheduler.reset()  # single image is always detected
         ids, boxes, classes, scores = self._process_detections(img)
 
-        depth_frame, inv_rel_depth = self._process_depth(reader, img)
+        self.depth_scheduler.reset()  # single image is always a keyframe
+        depth_frame, inv_rel_depth = self._process_depth(reader, img, classes, ids=ids)
 
         distances = self._process_distances(boxes, classes)
 
@@ -135,43 +269,173 @@ class SystemHandler(DetectionWrapper, DistanceWrapper, DeothWrapper, PointCloudW
 
         return boxes, classes, distances
 
-    def process_video(self, path: str, out_path: str, disp_res: int) -> None:
+    def process_video(self, path: str, out_path: str, disp_res: int) -> Optional[int]:
         """
         Main loop for processing input video: detects objects, annotates frames and displays them
 
             :param path: path to video file
             :param out_path: path for output video file
             :param disp_res: resolution for displayed video, assumed to be square
+
+            :return: number of written frames, None if video could not be opened
         """
-        reader = VideoReader(path, self.od_resolution, disp_res)
-        writer = VideoRecorder(out_path, disp_res)
+        reader = self.create_reader(path, disp_res)
+        writer = self.create_recorder(out_path, disp_res)
+        self.reset_video_state()
 
         with reader as video, writer as out:
             if not video:  # break if error while opening file
                 return None
 
-            with tf.device("/device:GPU:0"):
+            try:
+                if self.config["pipelined"]:
+                    self._process_video_pipelined(video, out)
+                elif self.config["batch_size"] > 1:
+                    self._process_video_batched(video, out)
+                else:
+                    self._process_video_sequential(video, out)
+            finally:
+                if self.profiler.enabled:
+                    self.profiler.dump(f"{out.filename}_timings.csv")
+                    print(self.profiler.summary())
+
+            return out.frames
+
+    def _process_video_sequential(self, video: VideoReader, out: VideoRecorder) -> None:
+        """
+        Sequential version of the main loop, every stage is run for a frame before the next frame is read
 
-                while True:
-                    ret, frame = video.read_frame()
+            :param video: opened VideoReader
+            :param out: opened VideoRecorder
+        """
+        profiler = self.profiler
+        annotate = self.annotation_needed()
 
-                    if ret:  # break if no valid frame is retrieved
-                        break
+        with tf.device("/device:GPU:0"):
 
-                    ids, boxes, classes, scores = self._process_detections(frame)
+            for frame_number in itertools.count():
+                profiler.frame(frame_number)
 
-                    depth_frame, inv_rel_depth = self._process_depth(reader, frame)
+                with profiler.stage("read"):
+                    ret, frame = video.read_frame()
 
-                    distances = self._process_distances(boxes, classes)
+                if ret:  # break if no valid frame is retrieved
+                    break
 
-                    focal_v, focal_h = self.calculate_focals(boxes, classes, distances)
+                ids, boxes, classes, scores = self._process_detections(frame, video)
 
-                    fit_status = self._process_regression(inv_rel_depth,  boxes, distances)
+                with profiler.stage("depth"):
+                    depth_frame, inv_rel_depth = self._process_depth(video, frame, classes, ids=ids)
 
-                    reader.annonate_image(video.get_frame("raw"), boxes, classes, distances, ids, "")
+                if self._process_outputs(video, out, ids, boxes, classes, scores, inv_rel_depth, annotate):
+                    break  # user interrupt
 
-                    self._write(out, video, fit_status, boxes, classes, scores, distances, focal_v, focal_h, "")
+    def _process_video_batched(self, video: VideoReader, out: VideoRecorder) -> None:
+        """
+        Offline version of the main loop, frames are read in batches and object detection and depth estimation
+        are run for the whole batch with one model call. Tracking and the rest of processing is done frame by frame
+        in original order. Detection scheduling is not used, as it depends on tracking of previous frames.
 
-                    if reader.show_frame():  # break on user interrupt
+            :param video: opened VideoReader
+            :param out: opened VideoRecorder
+        """
+        profiler = self.profiler
+        annotate = self.annotation_needed()
+        batch_size = self.config["batch_size"]
+        frame_number = itertools.count()
+
+        with tf.device("/device:GPU:0"):
+
+            while True:
+                packets = []
+                while len(packets) < batch_size:
+                    index = next(frame_number)
+                    profiler.frame(index)
+                    with profiler.stage("read"):
+                        ret, raw, frame, frame_t = video.next_frame()
+                    if ret:  # no valid frame is retrieved
                         break
+                    packet = FramePacket(index, frame, raw, frame_t)
+                    packet.frames.update(video.plan_frame(raw, frame))
+                    packets.append(packet)
+
+                if not packets:
+                    break
+
+                # batch timings are recorded for the first frame of the batch
+                profiler.frame(packets[0].index)
+                with profiler.stage("detection_batch"):
+                    detections = self.detector.predict_batch([p.frame for p in packets], self.od_threshold,
+                                                             pad_to=batch_size)
+
+                for packet, frame_detections in zip(packets, detections):
+                    profiler.frame(packet.index)
+                    packet.results["detections"] = self._process_detections(packet.frame, packet, frame_detections)
+
+                depths = [None] * len(packets)
+                if self.use_midas:
+                    keyframes = self.depth_scheduler.plan([p.frame for p in packets],
+                                                          [p.results["detections"][2] for p in packets],
+                                                          [p.results["detections"][0] for p in packets])
+                    estimate = [i for i, keyframe in enumerate(keyframes) if keyframe]
+                    profiler.frame(packets[0].index)
+                    with profiler.stage("depth_batch"):
+                        estimated = self.midas.predict_batch([packets[i].frame for i in estimate],
+                                                             [packets[i].get_frame("depth") for i in estimate],
+                                                             pad_to=batch_size, raw=self._record_depth())
+                    for i, depth in zip(estimate, estimated):
+                        depths[i] = depth
+
+                for packet, depth in zip(packets, depths):
+                    profiler.frame(packet.index)
+                    ids, boxes, classes, scores = packet.results["detections"]
+
+                    with profiler.stage("depth"):
+                        depth_frame, inv_rel_depth = self._process_depth(packet, packet.frame, classes, depth, ids)
+
+                    video.load_packet(packet)
+                    if self._process_outputs(video, out, ids, boxes, classes, scores, inv_rel_depth, annotate):
+                        return  # user interrupt
+
+                if len(packets) < batch_size:  # video ended
+                    break
+
+    def _process_outputs(self, video: VideoReader, out: VideoRecorder, ids: np.ndarray, boxes: np.ndarray,
+                         classes: np.ndarray, scores: np.ndarray, inv_rel_depth: np.ndarray, annotate: bool) -> bool:
+        """
+        Estimates distances and fits regression for detected objects, then annotates, writes and displays the frame
+
+            :param video: opened VideoReader with current frame
+            :param out: opened VideoRecorder
+            :param ids: tracked objects ids
+            :param boxes: tracked objects bounding boxes
+            :param classes: tracked objects classes
+            :param scores: detected objects probability scores
+            :param inv_rel_depth: inverse relative depth of the frame
+            :param annotate: annotate frame or not
+
+            :return: True if user interrupt
+        """
+        profiler = self.profiler
+
+        with profiler.stage("distance"):
+            distances = self._process_distances(boxes, classes)
+
+            focal_v, focal_h = self.calculate_focals(boxes, classes, distances)
+
+        with profiler.stage("regression"):
+            fit_status = self._process_regression(inv_rel_depth,  boxes, distances)
+
+        if annotate:
+            with profiler.stage("annotation"):
+                video.annonate_image(video.get_frame("raw"), boxes, classes, distances, ids, "")
+
+        with profiler.stage("write"):
+            self._write(out, video, fit_status, boxes, classes, scores, distances, focal_v, focal_h, "", ids=ids)
+
+        if self.config["display_image"]:
+            with profiler.stage("display"):
+                if video.show_frame():  # break on user interrupt
+                    return True
 
+        return False
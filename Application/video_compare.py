@@ -1,7 +1,7 @@
 from __future__ import annotations
 import cv2
 import numpy as np
-
+from async_video_writer import AsyncVideoWriter, open_video_writer
 
 
 class VideoCompare:
@@ -15,6 +15,10 @@ class VideoCompare:
             out_path : path for output video
             resolution : resolution for output video
             frame_by_frame : continuous playback or frame by frame
+            codec : four character code of output video codec, container is given by out_path extension
+            fps : frame rate of output video
+            async_write : encode output video in a background thread
+            display : show compared frames, False for headless comparison
 
         Attributes
         ----------
@@ -22,15 +26,19 @@ class VideoCompare:
             half_resolution : resolution to which input frame should be resized to fit both frames in output
             cap1 : first input video reader object
             cap2 : second input video reader object
-            out : output video writer object
+            out : output video writer object, AsyncVideoWriter in async mode
             type : 1 if continuous playback, 0 for frame-by-frame playback (on user input)
     """
-    def __init__(self, file1: str, file2: str, out_path: str, resolution: tuple[int, int], frame_by_frame: bool = False):
+    def __init__(self, file1: str, file2: str, out_path: str, resolution: tuple[int, int], frame_by_frame: bool = False,
+                 codec: str = "MJPG", fps: float = 30, async_write: bool = False, display: bool = True):
         self.resolution = resolution
         self.half_resolution = (int(resolution[1] / 2), resolution[0])
         self.cap1 = cv2.VideoCapture(file1)
         self.cap2 = cv2.VideoCapture(file2)
-        self.out = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'), 30, resolution)
+        self.out = open_video_writer(out_path, resolution, codec, fps)
+        if async_write:
+            self.out = AsyncVideoWriter(self.out, resolution).start()
+        self.display = display
 
         if frame_by_frame:
             self.type = 0
@@ -38,15 +46,21 @@ class VideoCompare:
             self.type = 1
 
 
-    def __close(self) -> None:
+    def __close(self, failed: bool = False) -> None:
         """
         Method for clean exit
+
+            :param failed: comparison was interrupted by an exception, encoder errors are not raised
         """
         self.cap1.release()
         self.cap2.release()
-        self.out.release()
+        if isinstance(self.out, AsyncVideoWriter):
+            self.out.close(raise_error=not failed)
+        else:
+            self.out.release()
 
-        cv2.destroyAllWindows()
+        if self.display:
+            cv2.destroyAllWindows()
 
     def __fill_frame(self, frame1: np.ndarray, frame2: np.ndarray) -> np.ndarray:
         """
@@ -68,22 +82,26 @@ class VideoCompare:
         """
         Method to compare videos
         """
-        while (self.cap1.isOpened() and self.cap1.isOpened()):
-            ret1, frame1 = self.cap1.read()
-            ret2, frame2 = self.cap2.read()
+        try:
+            while (self.cap1.isOpened() and self.cap1.isOpened()):
+                ret1, frame1 = self.cap1.read()
+                ret2, frame2 = self.cap2.read()
+
+                if not (ret1 and ret2):
+                    break
 
-            if ret1 and ret2:
                 result = self.__fill_frame(frame1, frame2)
 
                 self.out.write(result)
 
-                cv2.imshow('', result)
+                if self.display:
+                    cv2.imshow('', result)
 
-                if cv2.waitKey(self.type) == ord('q'):
-                    self.__close()
-                    break
+                    if cv2.waitKey(self.type) == ord('q'):
+                        break
+        except BaseException:
+            self.__close(failed=True)
+            raise
 
-            else:
-                self.__close()
-                break
+        self.__close()
 
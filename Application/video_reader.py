@@ -1,11 +1,12 @@
 from __future__ import annotations
 from typing import Union
 import cv2
-import PIL.ImageDraw
-import PIL.ImageFont
 import numpy as np
 import random
 import time
+from frame_prefetcher import FramePrefetcher
+from frame_geometry import FrameGeometry
+from annotation_renderer import AnnotationRenderer
 
 
 class VideoReader:
@@ -17,6 +18,8 @@ class VideoReader:
             path : path to video file
             od_resolution : resolution required for object detection model
             display_resolution : resolution for displayed video
+            prefetch : number of frames decoded ahead in background thread, 0 for synchronous decoding
+            drop_oldest : when prefetching, overwrite oldest frame not yet processed instead of waiting (live sources)
 
         Attributes
         ----------
@@ -27,18 +30,35 @@ class VideoReader:
             class_names : mapping be
             frame : read video frame
             frame_t : time of read frame
+            capture_t : time of decoding of read frame
+            frame_index : number of read frame in the video
             cap : input video reader object
+            prefetcher : background frame decoder, None if prefetching is disabled
+            geometry : planner of frame resizing, "detection" and "display" consumers are registered by default
+            renderer : engine drawing annotations into frames in display resolution
+            window : name of the window in which frames are displayed
+            info : metadata of read frame set by processing stages, e.g. if depth was estimated, cleared on every read
             frames :
     """
-    def __init__(self, path: str, od_resolution: int, display_resolution: int) -> None:
+    def __init__(self, path: str, od_resolution: int, display_resolution: int, prefetch: int = 0,
+                 drop_oldest: bool = False) -> None:
         self.filename = path
+        self.prefetch = prefetch
+        self.drop_oldest = drop_oldest
+        self.prefetcher = None
         self.od_resolution = (od_resolution, od_resolution)
         self.display_resolution = (display_resolution, display_resolution)
         self.scale = display_resolution / od_resolution
 
+        self.geometry = FrameGeometry()
+        self.geometry.add_consumer("detection", self.od_resolution)
+        self.geometry.add_consumer("display", self.display_resolution, from_source=False)
+
         self.colors = [(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)) for i in range(50)]
 
         self.frame_t = time.time()
+        self.capture_t = self.frame_t
+        self.frame_index = -1
 
         self.class_names = {
             1: "person",
@@ -51,17 +71,35 @@ class VideoReader:
             8: "obstacle"
         }
 
-        self.frames = {"raw": None, "annotated": None, "alpha_record": None}  # TODO - store frames at different stages
+        # TODO - store frames at different stages
+        self.frames = {"raw": None, "annotated": None, "alpha_record": None, "detection": None, "depth": None,
+                       "depth_record": None}
+
+        self.info = {}
+        self.window = ''
+
+        self.renderer = AnnotationRenderer(self.class_names, int(8 * self.scale), int(2 * self.scale))
 
     def __enter__(self) -> VideoReader:
         self.cap = cv2.VideoCapture(self.filename)
         if not self.cap.isOpened():
             return False
+
+        if self.prefetch > 0:
+            self.prefetcher = FramePrefetcher(self.cap, self.od_resolution, self.prefetch + 1, self.drop_oldest)
+            self.prefetcher.start()
+
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+            self.prefetcher = None
         self.cap.release()
-        cv2.destroyAllWindows()
+        try:
+            cv2.destroyAllWindows()
+        except cv2.error:  # headless OpenCV build, no windows were created
+            pass
 
     def read_frame(self) -> tuple[bool, np.ndarray]:
         """
@@ -70,14 +108,60 @@ class VideoReader:
             :return[0]: True if frame not valid, False if valid
             :return[1]: Frame data if valid, 0 if invalid
         """
-        ret, self.frames["raw"] = self.cap.read()
+        if self.prefetcher is None:
+            ret, self.frames["raw"], frame, self.frame_t = self.next_frame()
+            self.capture_t = self.frame_t
+            if not ret:
+                self.frame_index += 1
+        else:
+            # frames are views of prefetcher ring buffer, valid until next call
+            ret, self.frames["raw"], frame, self.capture_t, index = self.prefetcher.acquire()
+            self.frame_t = time.time()
+            if not ret:
+                self.frame_index = index
 
-        self.frame_t = time.time()
+        self.info = {}
+        if not ret:
+            self.frames.update(self.plan_frame(self.frames["raw"], frame))
+
+        return ret, frame
+
+    def plan_frame(self, raw: np.ndarray, frame: np.ndarray) -> dict[str, np.ndarray]:
+        """
+        Resizes frame for all registered consumers, every resize is computed once from the frame read from video
+
+            :param raw: frame as read from video file
+            :param frame: frame already resized to object detection resolution
+
+            :return: consumer name -> resized frame
+        """
+        return self.geometry.plan(raw, {"detection": frame})
+
+    def next_frame(self) -> tuple[bool, np.ndarray, np.ndarray, float]:
+        """
+        Method for retrieving frame from video file without storing it in the reader, so it can be safely called from
+        another thread than the one displaying and annotating frames
+
+            :return[0]: True if frame not valid, False if valid
+            :return[1]: Frame as read from video file, None if invalid
+            :return[2]: Frame resized to object detection resolution if valid, empty array if invalid
+            :return[3]: time the frame was read from video file, in prefetch mode too
+        """
+        if self.prefetcher is not None:
+            ret, raw, frame, capture_t, _ = self.prefetcher.acquire()
+            if not ret:  # copy, so ring buffer slot can be reused
+                raw, frame = raw.copy(), frame.copy()
+            self.prefetcher.release()
+            return ret, raw, frame, capture_t  # time of decoding, queue latency is not included
+
+        ret, raw = self.cap.read()
+
+        frame_t = time.time()
 
         if not ret:
-            return True, np.array([])
+            return True, raw, np.array([]), frame_t
 
-        return False, cv2.resize(self.frames["raw"], self.od_resolution)
+        return False, raw, cv2.resize(raw, self.od_resolution), frame_t
 
     def set_frame(self, frame: np.ndarray, key: str) -> None:
         """
@@ -102,6 +186,36 @@ class VideoReader:
         except KeyError:
             return self.frames[key]
 
+    def set_info(self, value, key: str) -> None:
+        """
+        Stores metadata of current frame
+
+            :param value: metadata to be stored
+            :param key: name of the metadata
+        """
+        self.info[key] = value
+
+    def get_info(self, key: str, default=None):
+        """
+        Returns metadata of current frame
+
+            :param key: name of the metadata
+            :param default: returned if metadata was not set for the frame
+
+            :return: stored metadata
+        """
+        return self.info.get(key, default)
+
+    def load_packet(self, packet) -> None:
+        """
+        Makes frames of a packet processed in the pipeline current frames of the reader
+
+            :param packet: FramePacket with frames from all processing stages
+        """
+        self.frames = packet.frames
+        self.info = packet.info
+        self.frame_t = packet.frame_t
+
     def show_frame(self, annotated: bool = True) -> Union[bool, None]:
         """
         Method for displaying frame
@@ -110,12 +224,12 @@ class VideoReader:
 
             :return: True if user interrupt
         """
-        if annotated:  # TODO - not necessary - refactor
+        if annotated and self.frames["annotated"] is not None:  # TODO - not necessary - refactor
             frame = self.frames["annotated"]
         else:
             frame = self.frames["raw"]
 
-        cv2.imshow('', cv2.resize(frame, self.display_resolution))
+        cv2.imshow(self.window, self.geometry.resize(frame, "display"))
 
         if cv2.waitKey(1) == ord('q'):
             return True
@@ -132,34 +246,14 @@ class VideoReader:
         :param ids: list of tracked object ids
         :param comment:
         """
-        annonated_frame = PIL.Image.fromarray(cv2.resize(frame, self.display_resolution))
-        draw = PIL.ImageDraw.Draw(annonated_frame)
-
-        font = PIL.ImageFont.truetype("arial.ttf", int(8 * self.scale))
-
-        boxes = boxes * self.scale
-        boxes = boxes.astype(int)
-
-        for i, box in enumerate(boxes):
-            class_detected = classes[i]
-
-            # maybe move to system handler
-            box = (box[1], box[0], box[3], box[2])
-
-            color = self.colors[ids[i] % len(self.colors)]
-
-            draw.rectangle(box, outline=color, width=int(2 * self.scale))
-
-            distance = distances[i]
-            if distance:
-                text = f"{self.class_names[class_detected]} at {distance:.2f} m"
-            else:
-                text = self.class_names[class_detected]
+        annonated_frame = self.geometry.resize(frame, "display")
+        if annonated_frame is frame:  # frame already in display resolution, do not draw into source frame
+            annonated_frame = frame.copy()
 
-            text_w, text_h = draw.textsize(text, font)
-            draw.rectangle((box[0], box[1], box[0] + text_w, box[1] + text_h), fill=color, outline=color)
-            draw.text((box[0], box[1]), text, fill=(0, 0, 0), font=font)
+        boxes = (boxes * self.scale).astype(int)
+        colors = [self.colors[i % len(self.colors)] for i in ids]
 
-        draw.text((0, 0), f"{1 / (time.time() - self.frame_t):.3f} fps\n{comment}", fill=(0, 0, 255), font=font)
+        self.renderer.draw(annonated_frame, boxes, classes, distances, colors,
+                           f"{1 / (time.time() - self.frame_t):.3f} fps\n{comment}")
 
-        self.frames["annotated"] = np.array(annonated_frame)
+        self.frames["annotated"] = annonated_frame
@@ -1,7 +1,10 @@
 from __future__ import annotations
 import cv2
 import numpy as np
-import pandas as pd
+from log_writer import LogWriter
+from async_video_writer import AsyncVideoWriter, open_video_writer
+from depth_store import DepthStore
+from point_cloud_export import PointCloudExporter
 
 class VideoRecorder:
     """
@@ -11,52 +14,99 @@ class VideoRecorder:
         ----------
             filename : name of the video file to be saved
             resolution : resolution of recorded video
+            log_chunk_size : number of frames written to the log at once
+            log_backend : "parquet", "npz" or "auto", see LogWriter
+            codec : four character code of the video codec, e.g. "MJPG", "mp4v", "avc1"
+            container : extension of the video file, e.g. "mp4", "avi", "mkv"
+            fps : frame rate of recorded video
+            async_write : encode frames in a background thread, see AsyncVideoWriter
+            queue_size : number of frames waiting for encoding in async mode
+            depth_units : "relative" or "metric" to save float depth to DepthStore, None to not save it
+            point_clouds : not opened exporter writing point cloud of every frame, None to not export them
 
         Attributes
         ----------
             filename : name of the video file to be saved
             resolution : resolution of recorded video
-            out : output video writer object
+            out : output video writer object, AsyncVideoWriter in async mode
+            frames : number of frames written since the recorder was opened
+            log_writer : streaming writer of per-frame logs, read them with log_writer.load_log(filename)
+            depth_store : lossless depth recording, read it with depth_store.DepthStoreReader(filename), None if
+                depth is not recorded
+            point_clouds : exporter of per-frame point clouds, None if they are not exported
+            point_cloud_coefs : latest known coefficient and intercept converting depth to meters
 
     """
 
-    def __init__(self, filename, resolution):
+    def __init__(self, filename, resolution, log_chunk_size: int = 256, log_backend: str = "auto",
+                 codec: str = "MJPG", container: str = "mp4", fps: float = 30, async_write: bool = False,
+                 queue_size: int = 4, depth_units: str = None, point_clouds: PointCloudExporter = None):
         self.filename = filename
         self.resolution = (resolution, resolution)
+        self.log_chunk_size = log_chunk_size
+        self.log_backend = log_backend
+        self.codec = codec
+        self.container = container
+        self.fps = fps
+        self.async_write = async_write
+        self.queue_size = queue_size
+        self.depth_units = depth_units
+        self.point_clouds = point_clouds
 
     def __enter__(self) -> VideoRecorder:
-        self.out = cv2.VideoWriter(f"{self.filename}.mp4", cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'), 30, self.resolution)
+        self.out = open_video_writer(f"{self.filename}.{self.container}", self.resolution, self.codec, self.fps)
+        if self.async_write:
+            self.out = AsyncVideoWriter(self.out, self.resolution, self.queue_size).start()
 
-        self.boxes = []
-        self.classes = []
-        self.scores = []
-        self.distances = []
-
-        self.focal_v = []
-        self.focal_h = []
-        self.weights = []
-        self.calibrated = []
+        self.frames = 0
+        self.log_writer = LogWriter(self.filename, self.log_chunk_size, self.log_backend).open()
+        self.depth_store = None if self.depth_units is None else DepthStore(self.filename, self.depth_units).open()
+        self.point_cloud_coefs = None
+        if self.point_clouds is not None:
+            self.point_clouds.open()
 
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
-        self.out.release()
-        df = pd.DataFrame({"boxes": self.boxes, "classes": self.classes, "scores": self.scores,
-                           "distances": self.distances, "focal_vertical": self.focal_v,
-                           "focal_horizontal": self.focal_h, "weights": self.weights, "calibrated": self.calibrated})
+        try:
+            if self.async_write:  # queued frames are encoded also when processing failed
+                self.out.close(raise_error=exc_type is None)
+            else:
+                self.out.release()
+        finally:
+            self.log_writer.close(complete=exc_type is None)
+            if self.depth_store is not None:
+                self.depth_store.close()
+            if self.point_clouds is not None:
+                self.point_clouds.close(raise_error=exc_type is None)
 
-        df.to_pickle(f"{self.filename}.pickle")
+    def log(self, boxes, classes, scores, distances, focal_v, focal_h, weights, calibrated, depth_keyframe=None,
+            detection_keyframe=None, ids=None):
+        self.log_writer.log(boxes, classes, scores, distances, focal_v, focal_h, weights, calibrated, depth_keyframe,
+                            detection_keyframe, ids)
 
-    def log(self, boxes, classes, scores, distances, focal_v, focal_h, weights, calibrated):
-        self.boxes.append(boxes)
-        self.classes.append(classes)
-        self.scores.append(scores)
-        self.distances.append(distances)
+    def write(self, frame: np.ndarray) -> None:
+        if self.async_write:  # resized by the encoder thread
+            self.out.write(frame)
+        else:
+            if frame.shape[1] != self.resolution[0] or frame.shape[0] != self.resolution[1]:
+                frame = cv2.resize(frame, self.resolution)
+            self.out.write(frame)
+        self.frames += 1
 
-        self.focal_v.append(focal_v)
-        self.focal_h.append(focal_h)
-        self.weights.append(weights)
-        self.calibrated.append(calibrated)
+    def export_point_cloud(self, bgr: np.ndarray, depth: np.ndarray, coefs=None, metadata: dict = None,
+                           arrays: dict = None) -> None:
+        """
+        Exports point cloud of the last written frame, frames before the first regression fit are skipped
 
-    def write(self, frame: np.ndarray) -> None:
-        self.out.write(cv2.resize(frame, self.resolution))
+            :param bgr: color frame in BGR order, same resolution as depth
+            :param depth: relative depth of the frame in alpha_record units
+            :param coefs: coefficients of fitted distance regressor, None if not fitted on this frame
+            :param metadata: scalar metadata of the frame
+            :param arrays: arrays saved with the point cloud in npz format
+        """
+        if coefs is not None:
+            self.point_cloud_coefs = (float(np.ravel(coefs[0])[0]), float(np.ravel(coefs[1])[0]))
+        if self.point_cloud_coefs is None:  # depth can not be converted to meters yet
+            return
+        self.point_clouds.export(self.frames - 1, bgr, depth, *self.point_cloud_coefs, metadata, arrays)
@@ -1,42 +1,105 @@
+import cv2
 import numpy as np
 
 
 class DeothWrapper:
-    def _get_depth(self, frame: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    def _get_depth(self, frame: np.ndarray, resized: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
         """
         Method for estimating inverse relative depth of a frame
 
             :param frame: frame for depth estimation
+            :param resized: frame already resized to depth model input resolution
 
             :return: frame alpha blended with black background basing on depth value for each pixel
         """
-        midas_frame = self.midas.predict(frame)
+        return self._blend_depth(frame, self.midas.predict(frame, resized))[:2]
 
-        a = (midas_frame - midas_frame.min())/(midas_frame.max() - midas_frame.min())
-        blank = np.ones((320, 320, 3), np.uint8) * 255
-        alpha = np.zeros((320, 320, 3), np.float64)
+    def _blend_depth(self, frame: np.ndarray, midas_frame: np.ndarray,
+                     record: bool = False) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Method for visualising inverse relative depth of a frame
+
+            :param frame: frame for which depth was estimated
+            :param midas_frame: inverse relative depth estimated by depth model, same resolution as frame
+            :param record: also return unquantized depth for DepthStore
+
+            :return[0]: frame alpha blended with white background basing on depth value for each pixel
+            :return[1]: inverse relative depth for recording, uint8 with 3 channels
+            :return[2]: the same depth as float32 with one channel, None if record is False
+        """
+        alpha, blended, quantized = self.__scratch(frame.shape)
+
+        # normalized inverse relative depth, constant map is treated as the farthest
+        low, high = midas_frame.min(), midas_frame.max()
+        np.subtract(midas_frame, low, out=alpha)
+        alpha *= 1.0 / (high - low) if high > low else 0.0
+
+        # alpha * frame + (1 - alpha) * white background
+        np.subtract(255, frame, out=blended)
+        blended *= alpha[..., None]
+        np.subtract(255, blended, out=blended)
+        depth_frame = blended.astype(np.uint8)
+
+        # Only for recording purposes, alpha is truncated to uint8 and inverted in place
+        alpha *= 255
+        np.copyto(quantized, alpha, casting="unsafe")
+        np.subtract(255, quantized, out=quantized)
+        inv_rel_depth = cv2.cvtColor(quantized, cv2.COLOR_GRAY2BGR)
+        depth_record = np.subtract(255, alpha) if record else None
+
+        return depth_frame, inv_rel_depth, depth_record
+
+    def _record_depth(self) -> bool:
+        """
+        Checks if depth is recorded losslessly, depth model then returns unquantized output
 
-        alpha[::, ::, 0] = a
-        alpha[::, ::, 1] = a
-        alpha[::, ::, 2] = a
+            :return: True if depth of every frame is saved to DepthStore
+        """
+        return self.use_midas and self.config["record_depth"]
 
-        frame = alpha * frame
-        blank = (1.0 - alpha) * blank
-        frame = frame + blank
+    def __scratch(self, shape: tuple[int, ...]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns buffers for depth blending, reused as long as frame shape does not change
 
-        # Only for recording purposes
-        alpha = alpha * 255
-        alpha = alpha.astype(np.uint8)
-        alpha = np.invert(alpha)
+            :param shape: shape of the blended frame
 
-        return frame.astype(np.uint8), alpha.astype(np.uint8)
+            :return: float32 buffer for depth alpha channel, float32 buffer for blended frame, uint8 buffer for
+                quantized depth
+        """
+        scratch = getattr(self, "_depth_scratch", None)
+        if scratch is None or scratch[1].shape != shape:
+            scratch = self._depth_scratch = (np.empty(shape[:2], np.float32), np.empty(shape, np.float32),
+                                             np.empty(shape[:2], np.uint8))
+        return scratch
 
+    def _depth_needed(self, frame, classes=None, ids=None) -> bool:
+        """
+        Checks if depth has to be estimated for the frame, or depth of the last keyframe can be reused
 
-    def _process_depth(self, reader, frame):
+            :param frame: current frame
+            :param classes: classes of objects detected in the frame
+            :param ids: track ids of objects detected in the frame
+
+            :return: True if depth estimation model has to be run
+        """
+        return self.use_midas and self.depth_scheduler.is_keyframe(frame, classes, ids)
+
+    def _process_depth(self, reader, frame, classes=None, midas_frame=None, ids=None):
         if self.use_midas:
-            depth_frame, inv_rel_depth = self._get_depth(frame)
+            # depth may be already estimated for the frame, e.g. in a batch with other streams
+            keyframe = midas_frame is not None or self.depth_scheduler.is_keyframe(frame, classes, ids)
+            if keyframe:
+                if midas_frame is None:
+                    midas_frame = self.midas.predict(frame, reader.get_frame("depth"), raw=self._record_depth())
+                midas_frame = self.depth_scheduler.update(frame, midas_frame, classes, ids)
+            else:
+                midas_frame = self.depth_scheduler.reuse(frame)
+
+            depth_frame, inv_rel_depth, depth_record = self._blend_depth(frame, midas_frame, self._record_depth())
             reader.set_frame(depth_frame, "raw")
             reader.set_frame(inv_rel_depth, "alpha_record")
+            reader.set_frame(depth_record, "depth_record")
+            reader.set_info(keyframe, "depth_keyframe")
 
             return depth_frame, inv_rel_depth
         else:
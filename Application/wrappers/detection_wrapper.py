@@ -2,32 +2,52 @@ import numpy as np
 
 
 class DetectionWrapper:
-    def _get_detections(self, frame: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    def _get_detections(self, frame: np.ndarray, detections: dict = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
         Method for getting bounding boxes and object classes from frame, when detection probability is high enough
 
             :param frame: video frame for object detection
+            :param detections: detections with high enough probability already computed for the frame by
+                ObjectDetector.predict_batch, e.g. in a batch with other frames
 
             :return: detected objects bounding boxes, classes and scores
         """
-        img_detetect, detections = self.detector.predict(frame)
+        if detections is None:
+            detections = self.detector.predict_batch([frame], self.od_threshold)[0]
 
-        ind = detections['detection_scores'] > self.od_threshold
-        scores = detections['detection_scores'][ind].numpy()
-        boxes = detections['detection_boxes'][ind].numpy()
-        classes = detections['detection_classes'][ind].numpy()
-
-        boxes = boxes * self.od_resolution
+        boxes = detections['detection_boxes'] * self.od_resolution
         boxes = boxes.astype(int)
 
-        return boxes, classes, scores
+        return boxes, detections['detection_classes'], detections['detection_scores']
 
-    def _process_detections(self, frame):
-        boxes, classes, scores = self._get_detections(frame)
+    def _detection_needed(self) -> bool:
+        """
+        Checks if object detector has to be run on the next frame, or tracked objects can be propagated instead
 
-        if self.use_deepsort:
-            ids, boxes, classes = self.tracker.predict(frame, boxes, classes, scores)
+            :return: True if detector has to be run
+        """
+        return not self.use_deepsort or self.detection_scheduler.is_keyframe(self.tracker.tracker)
+
+    def _process_detections(self, frame, reader=None, detections=None):
+        if detections is None and not self._detection_needed():
+            # tracked objects are propagated by Kalman filter instead of running the detector
+            with self.profiler.stage("tracking"):
+                ids, boxes, classes, scores = self.tracker.coast()
+            self.detection_scheduler.skip()
+            keyframe = False
         else:
-            ids = np.array([0] * len(boxes))
+            with self.profiler.stage("detection"):
+                boxes, classes, scores = self._get_detections(frame, detections)
+
+            if self.use_deepsort:
+                with self.profiler.stage("tracking"):
+                    ids, boxes, classes, scores = self.tracker.predict(frame, boxes, classes, scores)
+            else:
+                ids = np.array([0] * len(boxes))
+            self.detection_scheduler.update()
+            keyframe = True
+
+        if reader is not None:
+            reader.set_info(keyframe, "detection_keyframe")
 
         return ids, boxes, classes, scores
\ No newline at end of file
@@ -12,17 +12,15 @@ class DistanceWrapper:
             :return: detected objects estimated distance,
                 none if class doesn't have reference size defined in self.disnet
         """
-        distances = []
-        for i, box in enumerate(boxes):
-            class_detected = int(classes[i])
-            if class_detected in self.disnet.class_sizes.keys():
-                distance = self.disnet.predict([box[1], box[0], box[3], box[2]], class_detected)
-                distance = distance[0][0]
-                distances.append(distance)
-            else:
-                distances.append(None)
-
-        return np.array(distances)
+        classes = np.asarray(classes).astype(int)
+        known = np.isin(classes, list(self.disnet.class_sizes.keys()))
+
+        distances = np.array([None] * len(boxes))
+        if known.any():
+            boxes = np.asarray(boxes)[known]
+            distances[known] = list(self.disnet.predict_batch(boxes[:, [1, 0, 3, 2]], classes[known]))
+
+        return np.array(list(distances))  # same dtype as when distances were predicted one by one
 
     def _process_distances(self, boxes, classes):
         if self.use_disnet:
@@ -0,0 +1,79 @@
+import itertools
+import tensorflow as tf
+from pipeline import FramePacket, StagePipeline
+
+
+class PipelineWrapper:
+    def _stage_detections(self, packet: FramePacket) -> None:
+        self.profiler.frame(packet.index)
+        packet.results["ids"], packet.results["boxes"], packet.results["classes"], packet.results["scores"] = \
+            self._process_detections(packet.frame, packet)
+
+    def _stage_depth(self, packet: FramePacket) -> None:
+        self.profiler.frame(packet.index)
+        with self.profiler.stage("depth"):
+            packet.results["depth_frame"], packet.results["inv_rel_depth"] = \
+                self._process_depth(packet, packet.frame, packet.results["classes"], ids=packet.results["ids"])
+
+    def _stage_distances(self, packet: FramePacket) -> None:
+        self.profiler.frame(packet.index)
+        boxes, classes = packet.results["boxes"], packet.results["classes"]
+
+        with self.profiler.stage("distance"):
+            distances = self._process_distances(boxes, classes)
+            focal_v, focal_h = self.calculate_focals(boxes, classes, distances)
+
+        with self.profiler.stage("regression"):
+            fit_status = self._process_regression(packet.results["inv_rel_depth"], boxes, distances)
+
+        # regressor is refitted by the next frame before this one is written, so coefficients are captured here
+        coefs = self.distance_regressor.regression_model.get_coeffs() if fit_status else None
+
+        packet.results.update({"distances": distances, "focal_v": focal_v, "focal_h": focal_h,
+                               "fit_status": fit_status, "coefs": coefs})
+
+    def _process_video_pipelined(self, video, out) -> None:
+        """
+        Pipelined version of the main loop. Decoding, detection with tracking, depth estimation and distance estimation
+        are run in separate threads connected with bounded queues, annotating, writing and displaying is done
+        in the calling thread. Stages are executed in the same order as in sequential loop, so output is the same.
+
+            :param video: opened VideoReader
+            :param out: opened VideoRecorder
+        """
+        frame_number = itertools.count()
+
+        def read():
+            index = next(frame_number)
+            self.profiler.frame(index)
+            with self.profiler.stage("read"):
+                ret, raw, frame, frame_t = video.next_frame()
+                if ret:  # no valid frame is retrieved
+                    return None
+                packet = FramePacket(index, frame, raw, frame_t)
+                packet.frames.update(video.plan_frame(raw, frame))
+            return packet
+
+        stages = [self._stage_detections, self._stage_depth, self._stage_distances]
+        annotate = self.annotation_needed()
+
+        with StagePipeline(read, stages, self.config["pipeline_queue_size"],
+                           lambda: tf.device("/device:GPU:0")) as pipeline:
+            for packet in pipeline:
+                r = packet.results
+                video.load_packet(packet)
+                self.profiler.frame(packet.index)
+
+                if annotate:
+                    with self.profiler.stage("annotation"):
+                        video.annonate_image(video.get_frame("raw"), r["boxes"], r["classes"], r["distances"],
+                                             r["ids"], "")
+
+                with self.profiler.stage("write"):
+                    self._write(out, video, r["fit_status"], r["boxes"], r["classes"], r["scores"], r["distances"],
+                                r["focal_v"], r["focal_h"], "", r["coefs"], r["ids"])
+
+                if self.config["display_image"]:
+                    with self.profiler.stage("display"):
+                        if video.show_frame():  # break on user interrupt
+                            break
@@ -1,9 +1,13 @@
+import numpy as np
+
+
 # TODO - handle variables
 class WriterWrapper:
-    def _write(self, out, video, fit_status, boxes, classes, scores, distances, focal_v, focal_h, comment):
+    def _write(self, out, video, fit_status, boxes, classes, scores, distances, focal_v, focal_h, comment, coefs=None,
+               ids=None):
         ### Writing video
         if self.config["record_annotated"]:
-            if self.config["record_annotated"]:
+            if video.get_frame("annotated") is not None:
                 out.write(video.get_frame("annotated"))
             else:
                 out.write(video.get_frame("raw"))
@@ -15,8 +19,27 @@ class WriterWrapper:
 
         ### Writing log
         if fit_status:
-            coefs = self.distance_regressor.regression_model.get_coeffs()
+            if coefs is None:  # coefficients not captured by pipelined stage
+                coefs = self.distance_regressor.regression_model.get_coeffs()
         else:
             coefs = None
 
-        out.log(boxes, classes, scores, distances, focal_v, focal_h, coefs, comment)
\ No newline at end of file
+        out.log(boxes, classes, scores, distances, focal_v, focal_h, coefs, comment, video.get_info("depth_keyframe"),
+                video.get_info("detection_keyframe"), ids)
+
+        if out.depth_store is not None and video.get_frame("depth_record") is not None:
+            out.depth_store.append(video.get_frame("depth_record"), coefs)
+
+        if out.point_clouds is not None:
+            # lossless depth if recorded, otherwise the quantized alpha_record frame, both in regression units
+            depth = video.get_frame("depth_record")
+            if depth is None:
+                depth = video.get_frame("alpha_record")
+            metadata = {"fitted": bool(fit_status), "detections": len(boxes),
+                        "depth_keyframe": bool(video.get_info("depth_keyframe")),
+                        "detection_keyframe": bool(video.get_info("detection_keyframe"))}
+            arrays = {"boxes": np.asarray(boxes), "classes": np.asarray(classes), "scores": np.asarray(scores),
+                      "distances": np.asarray(distances, dtype=float)}
+            if ids is not None:
+                arrays["ids"] = np.asarray(ids)
+            out.export_point_cloud(video.get_frame("detection"), depth, coefs, metadata, arrays)
\ No newline at end of file